@@ -0,0 +1,86 @@
+"""
+Wall-clock scaling of chunked page analysis by worker count.
+
+Generates a synthetic text-heavy PDF and runs the same page-range extraction
+used by ``analyze_page_range_task`` in a process pool, which stands in for a
+pool of Celery workers without needing a broker.
+
+Usage (from backend/pdf_editor):
+    python -m benchmarks.analysis_scaling --pages 800 --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+from pdf_app import analysis
+
+
+def build_synthetic_pdf(path, pages, lines_per_page=45):
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        y = 50
+        for line_num in range(lines_per_page):
+            page.insert_text(
+                (50, y),
+                f"Page {page_num + 1} line {line_num + 1}: the quick brown fox jumps over the lazy dog",
+                fontsize=9,
+                fontname="helv" if line_num % 3 else "tiro",
+            )
+            y += 16
+    doc.save(path)
+    doc.close()
+
+
+def run(path, pages, chunk_size, workers):
+    ranges = analysis.page_ranges(pages, chunk_size)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(analysis.extract_page_range, path, start, end) for start, end in ranges]
+        results = [future.result() for future in futures]
+    merged = sorted((page for chunk in results for page in chunk), key=lambda page: page["page"])
+    elapsed = time.perf_counter() - started
+    assert len(merged) == pages
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=800)
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pdf", help="use an existing PDF instead of generating one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if not path:
+            path = os.path.join(tmp, "synthetic.pdf")
+            build_synthetic_pdf(path, args.pages)
+        with fitz.open(path) as doc:
+            pages = len(doc)
+
+        results = []
+        baseline = None
+        for workers in args.workers:
+            elapsed = run(path, pages, args.chunk_size, workers)
+            baseline = baseline or elapsed
+            results.append({
+                "workers": workers,
+                "seconds": round(elapsed, 3),
+                "pages_per_sec": round(pages / elapsed, 1),
+                "speedup": round(baseline / elapsed, 2),
+            })
+            print(f"workers={workers:<3} {elapsed:8.3f}s  {pages / elapsed:8.1f} pages/s  x{baseline / elapsed:.2f}")
+
+    print(json.dumps({"pages": pages, "chunk_size": args.chunk_size, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
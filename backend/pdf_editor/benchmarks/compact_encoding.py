@@ -0,0 +1,97 @@
+"""
+Size and speed of the compact columnar page encoding versus the legacy
+nested format.
+
+Pass real documents to measure them; without arguments a synthetic
+text-heavy PDF is generated.
+
+Usage (from backend/pdf_editor):
+    python -m benchmarks.compact_encoding path/to/a.pdf path/to/b.pdf
+"""
+
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+
+import fitz
+
+from pdf_app import analysis, encoding
+from benchmarks.analysis_scaling import build_synthetic_pdf
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _best_of(repeat, func, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def measure(path, repeat):
+    with fitz.open(path) as doc:
+        pages = analysis.extract_pages(doc)
+
+    encode_s, compact = _best_of(repeat, lambda: [encoding.encode_page(page) for page in pages])
+    decode_s, decoded = _best_of(repeat, lambda: [encoding.decode_page(page) for page in compact])
+    assert decoded == pages
+
+    legacy_bytes, compact_bytes = _dumps(pages), _dumps(compact)
+    legacy_json_s, _ = _best_of(repeat, _dumps, pages)
+    compact_json_s, _ = _best_of(repeat, _dumps, compact)
+    legacy_parse_s, _ = _best_of(repeat, json.loads, legacy_bytes)
+    compact_parse_s, _ = _best_of(repeat, json.loads, compact_bytes)
+    spans = sum(len(page["spans"]["text"]) for page in compact)
+
+    return {
+        "document": os.path.basename(path),
+        "pages": len(pages),
+        "spans": spans,
+        "legacy_bytes": len(legacy_bytes),
+        "compact_bytes": len(compact_bytes),
+        "size_ratio": round(len(compact_bytes) / max(1, len(legacy_bytes)), 3),
+        "legacy_gzip_bytes": len(gzip.compress(legacy_bytes)),
+        "compact_gzip_bytes": len(gzip.compress(compact_bytes)),
+        "encode_ms": round(encode_s * 1000, 2),
+        "decode_ms": round(decode_s * 1000, 2),
+        "legacy_dumps_ms": round(legacy_json_s * 1000, 2),
+        "compact_dumps_ms": round(compact_json_s * 1000, 2),
+        "legacy_loads_ms": round(legacy_parse_s * 1000, 2),
+        "compact_loads_ms": round(compact_parse_s * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--pages", type=int, default=100, help="pages of the synthetic PDF")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = args.pdfs
+        if not paths:
+            synthetic = os.path.join(tmp, "synthetic.pdf")
+            build_synthetic_pdf(synthetic, args.pages)
+            paths = [synthetic]
+        results = [measure(path, args.repeat) for path in paths]
+
+    for row in results:
+        print(
+            f"{row['document']}: {row['pages']} pages, {row['spans']} spans, "
+            f"{row['legacy_bytes']} -> {row['compact_bytes']} bytes (x{row['size_ratio']}), "
+            f"gzip {row['legacy_gzip_bytes']} -> {row['compact_gzip_bytes']}, "
+            f"encode {row['encode_ms']} ms, decode {row['decode_ms']} ms"
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
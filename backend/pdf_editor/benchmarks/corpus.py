@@ -0,0 +1,111 @@
+"""
+Deterministic synthetic PDFs for the benchmark suite.
+
+Every kind stresses a different part of the pipeline:
+
+- ``text``: dense pages of long single-style lines (few large spans)
+- ``spans``: every word in its own font/size/colour (many small spans, the
+  worst case for extraction and for the JSON payload)
+- ``images``: a full-page image and a caption per page (little text, large file)
+
+Output depends only on the kind, the page count and the seed, so the same
+corpus is benchmarked on every commit.
+
+Usage (from backend/pdf_editor):
+    python -m benchmarks.corpus --kind spans --pages 2000 out.pdf
+"""
+
+import argparse
+import random
+
+import fitz
+
+KINDS = ("text", "spans", "images")
+
+WORDS = (
+    "invoice total amount due customer account balance payment order shipped "
+    "quantity price tax discount reference number period statement summary"
+).split()
+
+FONTS = ("helv", "tiro", "cour", "hebo")
+COLORS = ((0, 0, 0), (0.6, 0, 0), (0, 0, 0.6), (0.2, 0.4, 0.2))
+
+
+def _text_page(page, rng, page_number, fonts, lines=45):
+    font = fonts[0]
+    writer = fitz.TextWriter(page.rect)
+    y = 50
+    for line_number in range(lines):
+        words = " ".join(rng.choice(WORDS) for _ in range(12))
+        writer.append((50, y), f"{page_number}.{line_number + 1} {words}", font=font, fontsize=9)
+        y += 16
+    writer.write_text(page)
+
+
+def _spans_page(page, rng, page_number, fonts, lines=30, words_per_line=10):
+    # One writer per colour: spans split on font, size and colour changes
+    writers = [fitz.TextWriter(page.rect, color=color) for color in COLORS]
+    y = 50
+    for _ in range(lines):
+        x = 40
+        for word_number in range(words_per_line):
+            style = rng.randrange(len(fonts))
+            size = 8 + style
+            word = rng.choice(WORDS) + (f" {page_number}" if word_number == 0 else "")
+            writers[rng.randrange(len(writers))].append((x, y), word + " ", font=fonts[style], fontsize=size)
+            x += fonts[style].text_length(word + " ", fontsize=size)
+        y += 22
+    for writer in writers:
+        writer.write_text(page)
+
+
+def _image_pool(rng, count=16, size=400):
+    return [
+        fitz.Pixmap(fitz.csRGB, size, size, rng.randbytes(size * size * 3), False)
+        for _ in range(count)
+    ]
+
+
+def build(path, kind, pages, seed=0):
+    """Write a ``pages``-page PDF of the given kind to ``path``."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown corpus kind {kind!r}, expected one of {KINDS}")
+    rng = random.Random(f"{kind}:{seed}")
+    doc = fitz.open()
+    fonts = [fitz.Font(name) for name in FONTS]
+    images = _image_pool(rng) if kind == "images" else []
+    image_xrefs = {}
+    for page_index in range(pages):
+        page = doc.new_page()
+        if kind == "text":
+            _text_page(page, rng, page_index + 1, fonts)
+        elif kind == "spans":
+            _spans_page(page, rng, page_index + 1, fonts)
+        else:
+            # A pool of distinct images shared by xref keeps 2000-page files manageable
+            slot = page_index % len(images)
+            rect = fitz.Rect(36, 80, page.rect.width - 36, page.rect.height - 36)
+            if slot in image_xrefs:
+                page.insert_image(rect, xref=image_xrefs[slot])
+            else:
+                image_xrefs[slot] = page.insert_image(rect, pixmap=images[slot])
+            page.insert_text((50, 60), f"Scanned page {page_index + 1}: {rng.choice(WORDS)}", fontsize=12)
+    # No dates or random file id, so the bytes (and content hash) are reproducible
+    doc.set_metadata({})
+    doc.save(path, garbage=1, deflate=True, no_new_id=True)
+    doc.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kind", choices=KINDS, default="text")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("output")
+    args = parser.parse_args()
+    build(args.output, args.kind, args.pages, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Document list latency at scale: OFFSET pagination loading every column
+versus keyset pagination with the analysis blob deferred.
+
+A throwaway SQLite database is migrated and filled with ``--documents``
+rows whose analysis_result is padded to ``--blob-bytes``. Pages are then
+fetched at the start, middle and end of the list both ways, and the query
+plan of the keyset query is printed to show the index it uses.
+
+Usage (from backend/pdf_editor):
+    python -m benchmarks.list_pagination --documents 100000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pdf_editor.settings")
+
+import django
+from django.conf import settings
+
+
+def setup_database(path):
+    settings.DATABASES["default"]["NAME"] = path
+    django.setup()
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+
+
+def populate(documents, blob_bytes):
+    from django.utils import timezone
+    from pdf_app.models import PDFDocument
+
+    started = timezone.now()
+    statuses = ["SUCCESS"] * 8 + ["PENDING", "FAILURE"]
+    padding = "x" * blob_bytes
+    batch = []
+    for number in range(documents):
+        batch.append(PDFDocument(
+            title=f"Report {number:06d}",
+            file=f"pdfs/{number}.pdf",
+            analysis_status=statuses[number % len(statuses)],
+            analysis_result={"id": str(number), "title": f"Report {number:06d}", "totalPages": 10, "padding": padding},
+        ))
+        if len(batch) == 5000:
+            PDFDocument.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        PDFDocument.objects.bulk_create(batch)
+    # Spread upload times out (bulk_create stamps them all alike), three documents per
+    # second so the id tiebreak is exercised
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE pdf_app_pdfdocument SET uploaded_at = datetime(%s, '+' || (id / 3) || ' seconds')",
+            [started.strftime("%Y-%m-%d %H:%M:%S")],
+        )
+        cursor.execute("ANALYZE")
+
+
+def _timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3), result
+
+
+def offset_page(offset, limit):
+    from pdf_app.models import PDFDocument
+    return list(PDFDocument.objects.order_by("-uploaded_at", "-id")[offset:offset + limit])
+
+
+def keyset_page(cursor, limit):
+    from pdf_app import pagination
+    from pdf_app.models import PDFDocument
+    params = {"limit": str(limit)}
+    if cursor:
+        params["cursor"] = cursor
+    return pagination.keyset_page(PDFDocument.objects.defer("analysis_result"), params, limit, limit)
+
+
+def cursor_at(offset, limit):
+    """The keyset cursor a client would hold after paging to ``offset``."""
+    if offset == 0:
+        return None
+    from pdf_app import pagination
+    from pdf_app.models import PDFDocument
+    row = PDFDocument.objects.order_by("-uploaded_at", "-id").only("uploaded_at")[offset - 1]
+    return pagination.encode_keyset_cursor(row.uploaded_at, row.pk)
+
+
+def query_plan(cursor, limit):
+    from pdf_app import pagination
+    from pdf_app.models import PDFDocument
+    queryset = PDFDocument.objects.defer("analysis_result").order_by("-uploaded_at", "-id")
+    return pagination.after_cursor(queryset, cursor)[:limit].explain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--blob-bytes", type=int, default=2000, help="size of each analysis_result")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_database(os.path.join(tmp, "bench.sqlite3"))
+        started = time.perf_counter()
+        populate(args.documents, args.blob_bytes)
+        results = {
+            "documents": args.documents,
+            "blob_bytes": args.blob_bytes,
+            "limit": args.limit,
+            "populate_s": round(time.perf_counter() - started, 2),
+            "positions": [],
+        }
+        for label, offset in (("first", 0), ("middle", args.documents // 2), ("last", args.documents - args.limit)):
+            cursor = cursor_at(offset, args.limit)
+            offset_ms, offset_rows = _timed(lambda: offset_page(offset, args.limit), args.repeat)
+            keyset_ms, (keyset_rows, _next) = _timed(lambda: keyset_page(cursor, args.limit), args.repeat)
+            assert [row.pk for row in offset_rows] == [row.pk for row in keyset_rows]
+            results["positions"].append({
+                "position": label,
+                "offset": offset,
+                "offset_full_rows_ms": offset_ms,
+                "keyset_deferred_ms": keyset_ms,
+            })
+        results["keyset_query_plan"] = query_plan(cursor_at(args.documents // 2, args.limit), args.limit)
+
+    for row in results["positions"]:
+        print(
+            f"{row['position']:<7} offset+all columns {row['offset_full_rows_ms']:>9} ms   "
+            f"keyset+defer {row['keyset_deferred_ms']:>9} ms"
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
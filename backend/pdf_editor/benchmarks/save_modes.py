@@ -0,0 +1,87 @@
+"""
+Save latency and bytes written for full rewrites versus incremental saves
+of an edited working copy, plus the cost of compacting it afterwards.
+
+A synthetic scanned-style PDF (one incompressible image per page) is
+generated so the file size is dominated by data the edits never touch.
+
+Usage (from backend/pdf_editor):
+    python -m benchmarks.save_modes --pages 50 --edits 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+
+import fitz
+
+from pdf_app import editing
+
+
+def build_scanned_pdf(path, pages, image_px=800):
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        pixmap = fitz.Pixmap(fitz.csRGB, image_px, image_px, os.urandom(image_px * image_px * 3), False)
+        page.insert_image(page.rect, pixmap=pixmap)
+        page.insert_text((50, 50 + page_num % 10), f"Invoice number {page_num + 1}", fontsize=12)
+    doc.save(path)
+    doc.close()
+
+
+def run(source, working, edits, incremental):
+    shutil.copyfile(source, working)
+    samples = []
+    for edit_num in range(edits):
+        doc = fitz.open(working)
+        can_increment = incremental and doc.can_save_incrementally()
+        page_number = edit_num % len(doc) + 1
+        editing.apply_edits(doc, [{"page": page_number, "oldText": "Invoice", "newText": f"Bill {edit_num}"}], [])
+        samples.append(editing.save_working_copy(doc, working, incremental=can_increment))
+        doc.close()
+    latencies = [sample["ms"] for sample in samples]
+    return {
+        "mode": "incremental" if incremental else "full",
+        "edits": edits,
+        "save_ms_p50": round(statistics.median(latencies), 2),
+        "save_ms_max": round(max(latencies), 2),
+        "bytes_written_total": sum(sample["bytes_written"] for sample in samples),
+        "bytes_written_per_save": round(statistics.mean(sample["bytes_written"] for sample in samples)),
+        "final_size": os.path.getsize(working),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--edits", type=int, default=10)
+    parser.add_argument("--pdf", help="use an existing PDF instead of generating one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.pdf
+        if not source:
+            source = os.path.join(tmp, "scanned.pdf")
+            build_scanned_pdf(source, args.pages)
+        working = os.path.join(tmp, "working.pdf")
+        results = {"source_size": os.path.getsize(source)}
+        results["full"] = run(source, working, args.edits, incremental=False)
+        results["incremental"] = run(source, working, args.edits, incremental=True)
+        results["compact_after_incremental"] = editing.compact_file(working)
+
+    for key in ("full", "incremental"):
+        row = results[key]
+        print(
+            f"{key:<12} p50 {row['save_ms_p50']:>8} ms  max {row['save_ms_max']:>8} ms  "
+            f"{row['bytes_written_per_save']:>10} bytes/save  final {row['final_size']} bytes"
+        )
+    compact = results["compact_after_incremental"]
+    print(f"compact      {compact['ms']:>8} ms  {compact['bytes_before']} -> {compact['bytes_written']} bytes")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
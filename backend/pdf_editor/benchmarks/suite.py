@@ -0,0 +1,294 @@
+"""
+End-to-end benchmark of the upload, analysis, extract-text and edit paths.
+
+Requests go through the DRF endpoints with the test client and Celery in
+eager mode, so every task runs inline and its cost is part of the request.
+Each (corpus kind, page count) case runs in a fresh process with its own
+throwaway database and media root, so peak RSS is per case. Per case:
+
+- upload: POST /pdf-documents/ (hashing, analysis and thumbnails), p50/p99 and pages/sec
+- analysis: analyze_pdf_task alone, pages/sec
+- extract: GET extract-text as full JSON, compact, a 10-page window and an
+  NDJSON stream, p50/p99 and payload bytes; repeats of the non-streamed
+  variants are served from the response cache, first_ms is the uncached request
+- edit: POST update-text touching up to 10 pages, and a bulk replace of one
+  word over the whole document, p50/p99
+
+The corpus (benchmarks/corpus.py) is deterministic, and the results are
+written as JSON along with the commit they were measured on, so runs can
+be compared with --compare.
+
+Usage (from backend/pdf_editor):
+    python -m benchmarks.suite --kinds text spans images --pages 1 100 2000 --output before.json
+    python -m benchmarks.suite --kinds text spans images --pages 1 100 2000 --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import fitz
+
+from benchmarks import corpus
+
+
+def setup_django(tmp):
+    """Django on a throwaway database and media root, Celery eager with in-memory results."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pdf_editor.settings")
+    import django
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = os.path.join(tmp, "bench.sqlite3")
+    settings.MEDIA_ROOT = os.path.join(tmp, "media")
+    settings.PDF_RENDER_CACHE_DIR = os.path.join(tmp, "media", "render_cache")
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+    settings.CELERY_TASK_ALWAYS_EAGER = True
+    settings.CELERY_TASK_EAGER_PROPAGATES = True
+    settings.CELERY_TASK_STORE_EAGER_RESULT = True
+    settings.CELERY_BROKER_URL = "memory://"
+    settings.CELERY_RESULT_BACKEND = "cache+memory://"
+    settings.PDF_EVENTS_BACKEND = "memory"
+    settings.PDF_METRICS_BACKEND = "memory"
+    settings.PDF_RESPONSE_CACHE_BACKEND = "memory"
+    django.setup()
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0)
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_stats(samples_ms):
+    return {
+        "n": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 0.50), 2),
+        "p99_ms": round(percentile(samples_ms, 0.99), 2),
+    }
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def _content(response):
+    if getattr(response, "streaming", False):
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+def measure_upload(client, content, pages, repeat):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    samples = []
+    document_id = None
+    for run in range(repeat):
+        # A different trailing comment per run defeats the duplicate-upload shortcut
+        upload = SimpleUploadedFile(f"bench{run}.pdf", content + f"\n% run {run}\n".encode(), "application/pdf")
+        elapsed, response = timed(lambda: client.post("/pdf-documents/", {"title": "bench", "file": upload}, format="multipart"))
+        assert response.status_code == 200, response.content
+        samples.append(elapsed)
+        document_id = response.data["document_id"]
+    stats = latency_stats(samples)
+    stats["pages_per_sec"] = round(pages / (stats["p50_ms"] / 1000), 1)
+    return document_id, stats
+
+
+def measure_analysis(document_id, pages, repeat):
+    from pdf_app.tasks import analyze_pdf_task
+
+    samples = [timed(lambda: analyze_pdf_task.apply(args=[document_id]).get())[0] for _ in range(repeat)]
+    stats = latency_stats(samples)
+    stats["pages_per_sec"] = round(pages / (stats["p50_ms"] / 1000), 1)
+    return stats
+
+
+def measure_extract(client, document_id, repeat):
+    variants = {
+        "full_json": "",
+        "compact": "?format=compact",
+        "window_10_pages": "?limit=10",
+        "stream_ndjson": "?stream=ndjson",
+    }
+    results = {}
+    for name, query in variants.items():
+        url = f"/pdf-documents/{document_id}/extract-text/{query}"
+        samples = []
+        size = 0
+        for _ in range(repeat):
+            elapsed, body = timed(lambda: _content(client.get(url)))
+            samples.append(elapsed)
+            size = len(body)
+        results[name] = {**latency_stats(samples), "first_ms": round(samples[0], 2), "payload_bytes": size}
+    return results
+
+
+def measure_edits(client, document_id, pages, repeat):
+    edit_pages = list(range(1, pages + 1, max(1, pages // 10)))[:10]
+    samples = []
+    for run in range(repeat):
+        edits = [{"page": page, "oldText": corpus.WORDS[run % len(corpus.WORDS)], "newText": "EDITED"} for page in edit_pages]
+        elapsed, response = timed(lambda: client.post(f"/pdf-documents/{document_id}/update-text/", {"edits": edits}, format="json"))
+        assert response.status_code == 200, response.content
+        samples.append(elapsed)
+    update_text = {**latency_stats(samples), "pages_edited": len(edit_pages)}
+
+    samples = []
+    matches = 0
+    for run in range(repeat):
+        replacements = [{"oldText": corpus.WORDS[(run + 7) % len(corpus.WORDS)], "newText": "REPLACED"}]
+        elapsed, response = timed(lambda: client.post(f"/pdf-documents/{document_id}/replace/", {"replacements": replacements}, format="json"))
+        assert response.status_code == 200, response.content
+        samples.append(elapsed)
+        status = client.get(f"/pdf-documents/{response.data['task_id']}/get_task_status/").data
+        matches += (status.get("result") or {}).get("matches", 0)
+    bulk_replace = {**latency_stats(samples), "matches": matches}
+    return {"update_text": update_text, "bulk_replace": bulk_replace}
+
+
+def run_case(kind, pages, pdf_path, options):
+    """One benchmark case, run in its own process."""
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(tmp)
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        with open(pdf_path, "rb") as handle:
+            content = handle.read()
+        rss_at_start = peak_rss_bytes()
+        # The app prints progress; keep it out of the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            document_id, upload = measure_upload(client, content, pages, options["upload_repeat"])
+            analysis = measure_analysis(document_id, pages, options["upload_repeat"])
+            extract = measure_extract(client, document_id, options["repeat"])
+            edit = measure_edits(client, document_id, pages, options["edit_repeat"])
+        return {
+            "kind": kind,
+            "pages": pages,
+            "file_bytes": len(content),
+            "upload": upload,
+            "analysis": analysis,
+            "extract": extract,
+            "edit": edit,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_rss_at_start_bytes": rss_at_start,
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def corpus_file(directory, kind, pages, seed):
+    path = os.path.join(directory, f"{kind}_{pages}_{seed}.pdf")
+    if not os.path.exists(path):
+        corpus.build(path, kind, pages, seed)
+    return path
+
+
+def _numbers(data, prefix=""):
+    """Flatten nested results into ``{"extract.compact.p50_ms": value}``."""
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from _numbers(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(previous, current):
+    """Print the relative change of every metric present in both runs."""
+    old_cases = {(case["kind"], case["pages"]): dict(_numbers(case)) for case in previous["cases"]}
+    print(f"\ncompared with {previous.get('commit') or 'unknown commit'} ({previous.get('created_at')})")
+    for case in current["cases"]:
+        old = old_cases.get((case["kind"], case["pages"]))
+        if old is None:
+            continue
+        print(f"{case['kind']} x {case['pages']} pages")
+        for metric, value in _numbers(case):
+            if metric in ("pages", "n") or metric.endswith(".n") or not old.get(metric):
+                continue
+            change = (value - old[metric]) / old[metric] * 100
+            print(f"  {metric:<40} {old[metric]:>14} -> {value:>14}  {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kinds", nargs="+", choices=corpus.KINDS, default=list(corpus.KINDS))
+    parser.add_argument("--pages", nargs="+", type=int, default=[1, 100])
+    parser.add_argument("--repeat", type=int, default=20, help="samples per extract-text variant")
+    parser.add_argument("--upload-repeat", type=int, default=3, help="uploads (and analysis runs) per case")
+    parser.add_argument("--edit-repeat", type=int, default=5, help="update-text and bulk replace runs per case")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus-dir", help="keep generated PDFs here and reuse them between runs")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    args = parser.parse_args()
+
+    options = {"repeat": args.repeat, "upload_repeat": args.upload_repeat, "edit_repeat": args.edit_repeat}
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {**options, "seed": args.seed},
+        "cases": [],
+    }
+    # A fresh interpreter per case: independent peak RSS and no state carried between cases
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_dir = args.corpus_dir or tmp
+        os.makedirs(corpus_dir, exist_ok=True)
+        for kind in args.kinds:
+            for pages in args.pages:
+                pdf_path = corpus_file(corpus_dir, kind, pages, args.seed)
+                with context.Pool(1) as pool:
+                    case = pool.apply(run_case, (kind, pages, pdf_path, options))
+                results["cases"].append(case)
+                print(
+                    f"{kind:<6} {pages:>5} pages  upload p50 {case['upload']['p50_ms']:>9} ms "
+                    f"({case['upload']['pages_per_sec']} pages/s)  "
+                    f"extract p50 {case['extract']['full_json']['p50_ms']:>8} ms "
+                    f"{case['extract']['full_json']['payload_bytes']} bytes  "
+                    f"peak RSS {case['peak_rss_bytes'] // (1024 * 1024)} MiB",
+                    file=sys.stderr,
+                )
+    results["pymupdf"] = fitz.VersionBind
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as handle:
+            compare(json.load(handle), results)
+
+
+if __name__ == "__main__":
+    main()
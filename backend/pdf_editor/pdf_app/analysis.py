@@ -0,0 +1,74 @@
+import fitz
+
+from . import metrics
+
+
+def extract_page_blocks(page):
+    """Return the text blocks -> lines -> spans structure for a single page."""
+    with metrics.timer("pdf_page_get_text_seconds"):
+        page_data = page.get_text("dict")
+    page_blocks = []
+    for block in page_data.get("blocks", []):
+        # We only want to process text blocks (type 0)
+        if block['type'] == 0:
+            block_lines = []
+            # Iterate through the lines within the current block
+            for line in block.get("lines", []):
+                line_spans = []
+                # A line is made of one or more spans with consistent styling
+                for span in line.get("spans", []):
+                    # Append the detailed span information
+                    line_spans.append({
+                        "text": span['text'],
+                        "font": span['font'],
+                        "size": round(span['size'], 2),
+                        "color": span['color'],
+                        "bbox": [round(c, 2) for c in span['bbox']]
+                    })
+
+                if line_spans:
+                    block_lines.append({
+                        "spans": line_spans,
+                        "bbox": [round(c, 2) for c in line['bbox']]
+                    })
+
+            if block_lines:
+                page_blocks.append({
+                    "lines": block_lines,
+                    "bbox": [round(c, 2) for c in block['bbox']]
+                })
+    return page_blocks
+
+
+def extract_pages(doc, start=0, end=None):
+    """Extract pages ``start`` (inclusive) to ``end`` (exclusive) of an open document."""
+    if end is None:
+        end = len(doc)
+    return [
+        {"page": page_num + 1, "blocks": extract_page_blocks(doc[page_num])}
+        for page_num in range(start, min(end, len(doc)))
+    ]
+
+
+def extract_page_numbers(doc, page_numbers):
+    """Extract specific 1-based page numbers, skipping any beyond the end of the document."""
+    return [
+        {"page": page_number, "blocks": extract_page_blocks(doc[page_number - 1])}
+        for page_number in sorted(set(page_numbers))
+        if 1 <= page_number <= len(doc)
+    ]
+
+
+def extract_page_range(path, start, end):
+    """Open ``path`` and extract a half-open range of zero-based page indexes."""
+    doc = fitz.open(path)
+    try:
+        return extract_pages(doc, start, end)
+    finally:
+        doc.close()
+
+
+def page_ranges(page_count, chunk_size):
+    """Split ``page_count`` pages into half-open ``(start, end)`` ranges of ``chunk_size``."""
+    chunk_size = max(1, int(chunk_size))
+    return [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
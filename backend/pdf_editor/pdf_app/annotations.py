@@ -0,0 +1,286 @@
+"""
+Per-document annotation log with delta sync.
+
+save-edits appends operations instead of storing (or echoing) the whole
+edit state:
+
+- ``{"op": "put", "page": 3, "id": "a1", "annotation": {...}}`` creates or
+  replaces annotation ``a1`` on page 3;
+- ``{"op": "delete", "page": 3, "id": "a1"}`` removes it.
+
+Every operation gets the next sequence number of its document
+(PDFDocument.annotation_seq), so a client that remembers the last ``seq`` it
+has seen fetches only what changed since with ``GET annotations/?since=``.
+Clients still posting a page's full annotation list are diffed against the
+stored page, so only the annotations that changed are logged.
+
+Once ``PDF_ANNOTATION_COMPACT_AFTER`` operations have accumulated,
+compaction folds them into one AnnotationSnapshot per page and deletes
+them. A client whose ``since`` predates the last compaction (or that sends
+none) gets the full state and the current ``seq`` to continue from.
+Concurrent writers are last-writer-wins per annotation, in ``seq`` order.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import AnnotationOperation, AnnotationSnapshot, PDFDocument
+
+
+class InvalidAnnotationOperation(ValueError):
+    """Raised for malformed operations or annotation lists."""
+
+
+def _annotation_id(value):
+    if not isinstance(value, (str, int)) or isinstance(value, bool) or not str(value) or len(str(value)) > 64:
+        raise InvalidAnnotationOperation(f"Invalid annotation id: {value!r}")
+    return str(value)
+
+
+def _page_number(value):
+    try:
+        page = int(value)
+    except (TypeError, ValueError):
+        raise InvalidAnnotationOperation(f"Invalid page: {value!r}")
+    if page < 1:
+        raise InvalidAnnotationOperation(f"Invalid page: {value!r}")
+    return page
+
+
+def parse_operations(operations):
+    """Validated ``(page, op, annotation_id, data)`` tuples from a request body."""
+    if not isinstance(operations, list) or not operations:
+        raise InvalidAnnotationOperation("operations must be a non-empty list")
+    parsed = []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise InvalidAnnotationOperation("Every operation must be an object")
+        op = operation.get("op")
+        page = _page_number(operation.get("page"))
+        annotation_id = _annotation_id(operation.get("id"))
+        if op == AnnotationOperation.PUT:
+            if not isinstance(operation.get("annotation"), dict):
+                raise InvalidAnnotationOperation(f"put of {annotation_id!r} needs an annotation object")
+            parsed.append((page, op, annotation_id, operation["annotation"]))
+        elif op == AnnotationOperation.DELETE:
+            parsed.append((page, op, annotation_id, None))
+        else:
+            raise InvalidAnnotationOperation(f"Unknown op: {op!r}")
+    return parsed
+
+
+def page_annotations(annotations):
+    """``{annotation_id: annotation}`` from a full page list (or dict) as the editor posts it."""
+    if isinstance(annotations, dict):
+        items = annotations.items()
+    elif isinstance(annotations, list):
+        # Annotations without an id are keyed by their position in the list
+        items = [(annotation.get("id", index) if isinstance(annotation, dict) else index, annotation)
+                 for index, annotation in enumerate(annotations)]
+    else:
+        raise InvalidAnnotationOperation("annotations must be a list or an object")
+    page = {}
+    for annotation_id, annotation in items:
+        if not isinstance(annotation, dict):
+            raise InvalidAnnotationOperation("Every annotation must be an object")
+        page[_annotation_id(annotation_id)] = annotation
+    return page
+
+
+def diff_page(page_number, current, wanted):
+    """The operations turning page state ``current`` into ``wanted``."""
+    operations = [
+        (page_number, AnnotationOperation.PUT, annotation_id, annotation)
+        for annotation_id, annotation in wanted.items()
+        if current.get(annotation_id) != annotation
+    ]
+    operations.extend(
+        (page_number, AnnotationOperation.DELETE, annotation_id, None)
+        for annotation_id in current
+        if annotation_id not in wanted
+    )
+    return operations
+
+
+def page_replacement(document_id, page_number, annotations):
+    """Operations replacing a page's stored annotations with the full list a client posted."""
+    page_number = _page_number(page_number)
+    wanted = page_annotations(annotations)
+    current = current_state(document_id, page_number).get(page_number, {})
+    return diff_page(page_number, current, wanted)
+
+
+def _apply(state, page_number, op, annotation_id, data):
+    page = state.setdefault(page_number, {})
+    if op == AnnotationOperation.PUT:
+        page[annotation_id] = data
+    else:
+        page.pop(annotation_id, None)
+
+
+def current_state(document_id, page_number=None):
+    """
+    ``{page_number: {annotation_id: annotation}}`` for the whole document (or
+    one page), as of the newest logged operation.
+    """
+    operations = AnnotationOperation.objects.filter(document_id=document_id)
+    snapshots = AnnotationSnapshot.objects.filter(document_id=document_id)
+    if page_number is not None:
+        operations = operations.filter(page_number=page_number)
+        snapshots = snapshots.filter(page_number=page_number)
+    # The log is read before the snapshots: if a compaction commits in
+    # between, operations it already merged are skipped by the seq check
+    logged = list(operations.order_by("seq").values_list("seq", "page_number", "op", "annotation_id", "data"))
+    state = {}
+    merged_through = {}
+    for page, seq, annotations in snapshots.values_list("page_number", "seq", "annotations"):
+        state[page] = dict(annotations)
+        merged_through[page] = seq
+    for seq, page, op, annotation_id, data in logged:
+        if seq > merged_through.get(page, 0):
+            _apply(state, page, op, annotation_id, data)
+    return {page: annotations for page, annotations in state.items() if annotations}
+
+
+def append(document_id, operations):
+    """
+    Log ``(page, op, annotation_id, data)`` operations in order and return
+    ``(first_seq, last_seq, pending)``, ``pending`` being the number of
+    operations not yet compacted.
+    """
+    with transaction.atomic():
+        # The update locks the document row until commit, so concurrent
+        # appends get consecutive, non-overlapping ranges
+        PDFDocument.objects.filter(pk=document_id).update(annotation_seq=F("annotation_seq") + len(operations))
+        last_seq, compacted_seq = PDFDocument.objects.filter(pk=document_id).values_list(
+            "annotation_seq", "annotation_compacted_seq",
+        ).get()
+        first_seq = last_seq - len(operations) + 1
+        AnnotationOperation.objects.bulk_create(
+            [
+                AnnotationOperation(
+                    document_id=document_id, seq=seq, page_number=page, op=op, annotation_id=annotation_id, data=data,
+                )
+                for seq, (page, op, annotation_id, data) in enumerate(operations, start=first_seq)
+            ],
+            batch_size=500,
+        )
+    return first_seq, last_seq, last_seq - compacted_seq
+
+
+def changes_since(document_id, since, limit):
+    """
+    The delta-sync response body: operations after ``since`` (at most
+    ``limit``, oldest first), or the full state when ``since`` is missing or
+    older than the last compaction.
+    """
+    operations = []
+    if since is not None:
+        operations = list(
+            AnnotationOperation.objects.filter(document_id=document_id, seq__gt=since).order_by("seq")[: limit + 1]
+        )
+    seq, compacted_seq = PDFDocument.objects.filter(pk=document_id).values_list(
+        "annotation_seq", "annotation_compacted_seq",
+    ).get()
+    if since is None or since < compacted_seq or since > seq:
+        # Read after the log, so a compaction that removed part of it is noticed
+        return {
+            "document_id": document_id,
+            "seq": seq,
+            "reset": True,
+            "annotations": {str(page): annotations for page, annotations in sorted(current_state(document_id).items())},
+        }
+    more = len(operations) > limit
+    operations = operations[:limit]
+    return {
+        "document_id": document_id,
+        "seq": operations[-1].seq if more else seq,
+        "reset": False,
+        "operations": [operation.as_dict() for operation in operations],
+        "more": more,
+    }
+
+
+def compact(document_id):
+    """
+    Fold every logged operation into the per-page snapshots and delete them.
+    Returns the number of operations merged.
+    """
+    with transaction.atomic():
+        # Waits for in-flight appends; later ones get higher seqs and are left alone
+        upto = PDFDocument.objects.select_for_update().filter(pk=document_id).values_list(
+            "annotation_seq", flat=True,
+        ).first()
+        if upto is None:
+            return 0
+        logged = AnnotationOperation.objects.filter(document_id=document_id, seq__lte=upto)
+        operations = defaultdict(list)
+        for seq, page, op, annotation_id, data in logged.order_by("seq").values_list(
+            "seq", "page_number", "op", "annotation_id", "data",
+        ).iterator(chunk_size=1000):
+            operations[page].append((seq, op, annotation_id, data))
+        snapshots = {
+            snapshot.page_number: snapshot
+            for snapshot in AnnotationSnapshot.objects.filter(document_id=document_id, page_number__in=list(operations))
+        }
+        merged = 0
+        for page, page_operations in operations.items():
+            snapshot = snapshots.get(page) or AnnotationSnapshot(document_id=document_id, page_number=page)
+            state = {page: dict(snapshot.annotations)}
+            for seq, op, annotation_id, data in page_operations:
+                if seq > snapshot.seq:
+                    _apply(state, page, op, annotation_id, data)
+            snapshot.annotations = state[page]
+            snapshot.seq = upto
+            snapshot.save()
+            merged += len(page_operations)
+        logged.delete()
+        PDFDocument.objects.filter(pk=document_id).update(annotation_compacted_seq=upto)
+    return merged
+
+
+def replace_state(document_id, state):
+    """
+    Replace the whole log with snapshots of ``state`` (``{page_number:
+    {annotation_id: annotation}}``) under a new sequence number, so every
+    delta-sync client (any ``since`` before it) gets the full state again.
+    """
+    with transaction.atomic():
+        PDFDocument.objects.filter(pk=document_id).update(annotation_seq=F("annotation_seq") + 1)
+        seq = PDFDocument.objects.filter(pk=document_id).values_list("annotation_seq", flat=True).get()
+        AnnotationOperation.objects.filter(document_id=document_id).delete()
+        AnnotationSnapshot.objects.filter(document_id=document_id).delete()
+        AnnotationSnapshot.objects.bulk_create(
+            [
+                AnnotationSnapshot(document_id=document_id, page_number=page, seq=seq, annotations=annotations)
+                for page, annotations in state.items()
+                if annotations
+            ],
+            batch_size=500,
+        )
+        PDFDocument.objects.filter(pk=document_id).update(annotation_compacted_seq=seq)
+    return seq
+
+
+def assemble(target_id, page_map):
+    """
+    Give ``target_id`` the annotations of the pages in ``page_map`` (the
+    ``(document_id, page_number)`` each target page comes from), the
+    annotation counterpart of PDFPageManager.assemble_pages. Pages left out
+    lose their annotations. The sources are read first, so the target may
+    be one of them (reordering in place).
+    """
+    sources = {document_id: current_state(document_id) for document_id in {source for source, _ in page_map}}
+    state = {
+        target_page: dict(sources[source_id][source_page])
+        for target_page, (source_id, source_page) in enumerate(page_map, start=1)
+        if sources[source_id].get(source_page)
+    }
+    return replace_state(target_id, state)
+
+
+def reset(document_id):
+    """Drop every annotation of a document whose content was replaced."""
+    return replace_state(document_id, {})
@@ -0,0 +1,124 @@
+"""
+gzip / brotli compression of the API's JSON and text responses.
+
+Django's GZipMiddleware compresses everything and only knows gzip. This
+one picks the coding from ``Accept-Encoding`` (q-values honoured, brotli
+preferred when the ``brotli`` package is installed and the client accepts
+it), and only touches the content types in ``PDF_COMPRESS_CONTENT_TYPES``
+above ``PDF_COMPRESS_MIN_BYTES``: extract-text JSON, compact and NDJSON
+pages, document lists, /metrics. Rendered pages and thumbnails are already
+compressed images, and the SSE event stream must not be buffered, so both
+pass through untouched. Streamed responses are compressed as they stream.
+
+As in GZipMiddleware, a random-length filename in the gzip header (and
+``Vary: Accept-Encoding``) protects against BREACH-style length attacks, and
+strong ETags are weakened on compressed responses (conditional.py compares
+weakly, so revalidation still gets a 304).
+"""
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # gzip only without the brotli package
+    brotli = None
+
+
+def accepted_codings(header):
+    """``{"gzip": 1.0, "br": 0.5, ...}`` from an ``Accept-Encoding`` header."""
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_coding(header):
+    """``"br"``, ``"gzip"`` or None for the given ``Accept-Encoding``."""
+    codings = accepted_codings(header)
+    wildcard = codings.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    scored = [(codings.get(coding, wildcard), coding) for coding in candidates]
+    # Ties go to the first candidate (brotli)
+    quality, coding = max(scored, key=lambda item: item[0])
+    return coding if quality > 0 else None
+
+
+def _brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _abrotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    async for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Compresses large JSON and text responses (see module docstring)."""
+
+    def process_response(self, request, response):
+        if not settings.PDF_COMPRESS_ENABLED or response.has_header("Content-Encoding"):
+            return response
+        content_type = response.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        if content_type not in settings.PDF_COMPRESS_CONTENT_TYPES:
+            return response
+        if not response.streaming and len(response.content) < settings.PDF_COMPRESS_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = choose_coding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            original = response.streaming_content
+            if coding == "br":
+                stream = _abrotli_sequence if response.is_async else _brotli_sequence
+                response.streaming_content = stream(original, settings.PDF_BROTLI_QUALITY)
+            elif response.is_async:
+                async def gzip_wrapper():
+                    async for chunk in original:
+                        yield compress_string(chunk, max_random_bytes=self.max_random_bytes)
+
+                response.streaming_content = gzip_wrapper()
+            else:
+                response.streaming_content = compress_sequence(original, max_random_bytes=self.max_random_bytes)
+            del response.headers["Content-Length"]
+        else:
+            if coding == "br":
+                compressed = brotli.compress(response.content, quality=settings.PDF_BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = coding
+        return response
@@ -0,0 +1,146 @@
+"""
+Per-process cache of open PyMuPDF documents for read-only work.
+
+Opening a PDF parses its xref table; workers that analyze, render and
+thumbnail the same hot document keep it open here instead. Entries are
+keyed by path and validated against the file's mtime and size, so a new
+save (the edit working copy) transparently reopens the file. At most
+``PDF_DOCUMENT_CACHE_SIZE`` documents stay open; the least recently used
+one is closed when another is added.
+
+Only use :func:`open_document` for reads. Code that modifies and saves a
+document (update-text, compaction) must open its own handle.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import fitz
+from django.conf import settings
+
+from . import metrics
+
+
+class _Entry:
+    def __init__(self, doc, signature):
+        self.doc = doc
+        self.signature = signature
+        # PyMuPDF documents are not thread-safe; one user at a time
+        self.lock = threading.Lock()
+
+    def close(self):
+        with self.lock:
+            self.doc.close()
+
+
+class DocumentCache:
+    def __init__(self, max_documents):
+        self.max_documents = max_documents
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _entry(self, path):
+        signature = self._signature(path)
+        stale = None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                metrics.inc("pdf_document_cache_total", result="hit")
+                return entry
+            self.misses += 1
+            metrics.inc("pdf_document_cache_total", result="miss")
+            stale = self._entries.pop(path, None)
+        if stale is not None:
+            stale.close()
+
+        with metrics.timer("pdf_fitz_open_seconds", caller="document_cache"):
+            entry = _Entry(fitz.open(path), signature)
+        evicted = []
+        with self._lock:
+            self._entries[path] = entry
+            while len(self._entries) > self.max_documents:
+                evicted.append(self._entries.popitem(last=False)[1])
+                self.evictions += 1
+                metrics.inc("pdf_document_cache_total", result="eviction")
+        for old in evicted:
+            old.close()
+        return entry
+
+    @contextmanager
+    def open(self, path):
+        if self.max_documents < 1:
+            doc = fitz.open(path)
+            try:
+                yield doc
+            finally:
+                doc.close()
+            return
+        entry = self._entry(path)
+        with entry.lock:
+            if entry.doc.is_closed:
+                # Evicted by another thread between lookup and use
+                entry = _Entry(fitz.open(path), entry.signature)
+                try:
+                    yield entry.doc
+                finally:
+                    entry.doc.close()
+                return
+            yield entry.doc
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.close()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "open_documents": len(self._entries),
+                "max_documents": self.max_documents,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DocumentCache(settings.PDF_DOCUMENT_CACHE_SIZE)
+    return _cache
+
+
+def open_document(path):
+    """``with open_document(path) as doc:`` -- a cached, read-only ``fitz.Document``."""
+    return get_cache().open(path)
+
+
+def reset():
+    """Close every cached document, e.g. in a freshly forked worker process."""
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.clear()
+        _cache = None
@@ -0,0 +1,302 @@
+"""
+Batch text edit engine.
+
+Edits are grouped by page so that every page gets all of its redaction
+annotations first, a single ``apply_redactions()`` call (which rewrites the
+page content stream) and only then the replacement text.
+"""
+
+import bisect
+import os
+import re
+import shutil
+import time
+from collections import defaultdict
+
+import fitz
+
+from . import metrics
+
+WHITE = (1, 1, 1)
+BLACK = (0, 0, 0)
+
+
+def parse_color(color):
+    """Accept ``"#rrggbb"``, an sRGB int as produced by extraction, or an RGB tuple (0-1 or 0-255)."""
+    if color is None:
+        return BLACK
+    if isinstance(color, str):
+        color = color.lstrip("#")
+        if len(color) != 6:
+            return BLACK
+        try:
+            return tuple(int(color[i:i + 2], 16) / 255.0 for i in (0, 2, 4))
+        except ValueError:
+            return BLACK
+    if isinstance(color, int):
+        return tuple(c / 255.0 for c in fitz.sRGB_to_rgb(color))
+    color = tuple(color)[:3]
+    if any(c > 1 for c in color):
+        return tuple(c / 255.0 for c in color)
+    return color
+
+
+def font_name(name):
+    """Map a requested font family onto a Base-14 font PyMuPDF can insert, defaulting to Helvetica."""
+    name = (name or "").lower()
+    return name if name in fitz.Base14_fontdict else "helv"
+
+
+def group_by_page(edits, new_texts):
+    """``{page_number: {"edits": [...], "new_texts": [...]}}`` for 1-based page numbers."""
+    pages = defaultdict(lambda: {"edits": [], "new_texts": []})
+    for edit in edits:
+        pages[int(edit.get("page", 1))]["edits"].append(edit)
+    for new_text in new_texts:
+        pages[int(new_text.get("page", 1))]["new_texts"].append(new_text)
+    return pages
+
+
+def _plan_page(page, edits, new_texts):
+    """Add the page's redaction annotations and return the text insertions to run afterwards."""
+    redactions = 0
+    inserts = []
+    for edit in edits:
+        new_text = edit.get("newText", "")
+        font_size = edit.get("fontSize", 12)
+        options = {
+            "fontsize": font_size,
+            "fontname": font_name(edit.get("fontFamily")),
+            "color": parse_color(edit.get("color")),
+        }
+        if edit.get("bbox"):
+            # More precise text replacement using bbox
+            rects = [fitz.Rect(edit["bbox"])]
+        elif edit.get("oldText") and new_text:
+            # Fallback to search-based replacement
+            rects = page.search_for(edit["oldText"])
+        else:
+            continue
+        for rect in rects:
+            # Remove old text by adding a white rectangle
+            page.add_redact_annot(rect, fill=WHITE)
+            redactions += 1
+            if new_text:
+                inserts.append(((rect.x0, rect.y0 + font_size), new_text, options))
+
+    for new_text in new_texts:
+        text_content = new_text.get("text", "")
+        if not text_content.strip():
+            continue
+        font_size = new_text.get("fontSize", 12)
+        inserts.append((
+            # Adjust y position for baseline
+            (new_text.get("x", 0), new_text.get("y", 0) + font_size),
+            text_content,
+            {
+                "fontsize": font_size,
+                "fontname": font_name(new_text.get("fontFamily")),
+                "color": parse_color(new_text.get("color")),
+            },
+        ))
+    return redactions, inserts
+
+
+_glyph_advances = {}
+
+
+def _text_width(text, fontname):
+    """Width of ``text`` at font size 1; glyph advances are cached per Base-14 font."""
+    if fontname not in _glyph_advances:
+        _glyph_advances[fontname] = (fitz.Font(fontname), {})
+    font, advances = _glyph_advances[fontname]
+    width = 0.0
+    for char in text:
+        if char not in advances:
+            advances[char] = font.glyph_advance(ord(char))
+        width += advances[char]
+    return width
+
+
+class _SpanMeasure:
+    """x coordinate of any character offset in a stored span."""
+
+    def __init__(self, span):
+        self.x0, _, x1, _ = span["bbox"]
+        self.text = span["text"]
+        # Character positions are not stored; measure with the closest Base-14
+        # font and scale the result onto the span's real width
+        self.fontname = font_name(span.get("font"))
+        natural = _text_width(self.text, self.fontname)
+        self.scale = (x1 - self.x0) / natural if natural else 0
+
+    def x(self, offset):
+        return self.x0 + _text_width(self.text[:offset], self.fontname) * self.scale
+
+
+def _line_matches(line, pattern):
+    """``(start_span, rect)`` for every match of ``pattern`` in a stored line, spans joined."""
+    spans = line["spans"]
+    text = "".join(span["text"] for span in spans)
+    matches = list(pattern.finditer(text))
+    if not matches:
+        return []
+    # Where each span starts in the joined line; only match boundaries get measured
+    starts = []
+    position = 0
+    for span in spans:
+        starts.append(position)
+        position += len(span["text"])
+    measures = {}
+
+    def locate(offset, end=False):
+        # The span holding character ``offset`` (the one before it for an end offset)
+        index = bisect.bisect_right(starts, offset - 1 if end else offset) - 1
+        if index not in measures:
+            measures[index] = _SpanMeasure(spans[index])
+        return index, measures[index].x(offset - starts[index])
+
+    found = []
+    for match in matches:
+        first, x0 = locate(match.start())
+        last, x1 = locate(match.end(), end=True)
+        covered = spans[first:last + 1]
+        y0 = min(span["bbox"][1] for span in covered)
+        y1 = max(span["bbox"][3] for span in covered)
+        found.append((spans[first], [x0, y0, x1, y1]))
+    return found
+
+
+def locate_replacements(pages, replacements):
+    """
+    Resolve ``{"oldText", "newText"}`` replacements against stored page blocks
+    (``(page_number, blocks)`` pairs) in one pass, without re-reading the PDF.
+    Matching is case-insensitive like ``page.search_for``, and may cross
+    spans but not lines. Returns bbox edits in the update-text format, and
+    ``{page_number: {oldText: count}}``.
+    """
+    patterns = [
+        (re.compile(re.escape(replacement["oldText"]), re.IGNORECASE), replacement)
+        for replacement in replacements
+    ]
+    edits = []
+    counts = defaultdict(lambda: defaultdict(int))
+    for page_number, blocks in pages:
+        for block in blocks:
+            for line in block.get("lines", []):
+                for pattern, replacement in patterns:
+                    for span, bbox in _line_matches(line, pattern):
+                        counts[page_number][replacement["oldText"]] += 1
+                        edits.append({
+                            "page": page_number,
+                            "bbox": bbox,
+                            "newText": replacement.get("newText", ""),
+                            "fontSize": span.get("size", 12),
+                            "fontFamily": span.get("font"),
+                            "color": span.get("color"),
+                        })
+    return edits, {page: dict(page_counts) for page, page_counts in counts.items()}
+
+
+def apply_edits(doc, edits, new_texts, progress=None):
+    """
+    Apply text replacements (``edits``) and additions (``new_texts``) to an open
+    document, one page at a time. ``progress(pages_done, pages_total)`` is
+    called after each page. Returns a summary with per-page timings.
+    """
+    grouped = group_by_page(edits, new_texts)
+    page_numbers = [number for number in sorted(grouped) if 1 <= number <= len(doc)]
+    page_stats = []
+    for done, page_number in enumerate(page_numbers, start=1):
+        started = time.perf_counter()
+        page = doc[page_number - 1]
+        redactions, inserts = _plan_page(page, grouped[page_number]["edits"], grouped[page_number]["new_texts"])
+        if redactions:
+            # One content stream rewrite per page, however many edits it has
+            page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+        for point, text, options in inserts:
+            page.insert_text(point, text, **options)
+        page_stats.append({
+            "page": page_number,
+            "redactions": redactions,
+            "insertions": len(inserts),
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+        })
+        if progress:
+            progress(done, len(page_numbers))
+
+    return {
+        "changed_pages": [stats["page"] for stats in page_stats if stats["redactions"] or stats["insertions"]],
+        "edits_applied": sum(len(grouped[number]["edits"]) for number in page_numbers),
+        "redactions": sum(stats["redactions"] for stats in page_stats),
+        "new_texts_added": sum(len(grouped[number]["new_texts"]) for number in page_numbers),
+        "pages": page_stats,
+    }
+
+
+def prepare_working_copy(source_path, working_path):
+    """Create the editable working copy from the original upload the first time a document is edited."""
+    if not os.path.exists(working_path):
+        shutil.copyfile(source_path, working_path)
+
+
+def _full_save(doc, path, **options):
+    # Write a sibling temp file and swap it in, ``path`` may be the file ``doc`` was opened from
+    doc.save(path + ".tmp", **options)
+    os.replace(path + ".tmp", path)
+
+
+def save_working_copy(doc, path, incremental=True, redacted=False):
+    """
+    Save an edited document opened from ``path`` back to ``path``.
+
+    Incremental saves append only the changed objects to the end of the file,
+    so their cost is proportional to the edit rather than the document size.
+    Callers decide with ``incremental`` (checked before editing); anything
+    PyMuPDF refuses falls back to a full rewrite. A ``redacted`` document is
+    always rewritten with garbage collection: the replaced text survives in
+    the earlier revision of an incremental save, and in the orphaned content
+    stream of a plain full save.
+    Returns the save mode, the bytes written and the elapsed time.
+    """
+    size_before = os.path.getsize(path) if os.path.exists(path) else 0
+    started = time.perf_counter()
+    mode = "full"
+    if incremental and not redacted and doc.name == path:
+        try:
+            doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+            mode = "incremental"
+        except (RuntimeError, ValueError):
+            pass
+    if mode == "incremental":
+        bytes_written = os.path.getsize(path) - size_before
+    else:
+        _full_save(doc, path, garbage=3 if redacted else 0)
+        bytes_written = os.path.getsize(path)
+    metrics.observe("pdf_doc_save_seconds", time.perf_counter() - started, mode=mode)
+    return {
+        "mode": mode,
+        "bytes_written": bytes_written,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def compact_file(path):
+    """
+    Rewrite a working copy from scratch: drop unused and superseded objects
+    left behind by incremental saves and deflate the streams.
+    """
+    size_before = os.path.getsize(path)
+    started = time.perf_counter()
+    doc = fitz.open(path)
+    try:
+        _full_save(doc, path, garbage=4, deflate=True, clean=True)
+    finally:
+        doc.close()
+    metrics.observe("pdf_doc_save_seconds", time.perf_counter() - started, mode="compact")
+    return {
+        "mode": "compact",
+        "bytes_before": size_before,
+        "bytes_written": os.path.getsize(path),
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,105 @@
+"""
+Compact columnar encoding for extracted page data.
+
+The legacy format nests blocks -> lines -> spans and repeats the
+``text/font/size/color/bbox`` keys on every span. The compact format keeps
+the same information per page as:
+
+    {
+        "page": 1,
+        "fonts": ["Helvetica", ...],          # interned font names
+        "colors": [0, 16711680, ...],         # interned sRGB ints
+        "blocks": {"bbox": [x0, y0, x1, y1, ...], "lineCount": [...]},
+        "lines": {"bbox": [...], "spanCount": [...]},
+        "spans": {"text": [...], "font": [...], "size": [...], "color": [...], "bbox": [...]},
+    }
+
+Boxes are flattened into one float array per level (4 numbers per entry),
+``lineCount``/``spanCount`` say how many consecutive lines/spans belong to
+each block/line, and ``spans.font``/``spans.color`` index into the page
+dictionaries.
+"""
+
+LEGACY = "legacy"
+COMPACT = "compact"
+COMPACT_MEDIA_TYPE = "application/vnd.pdfeditor.compact+json"
+
+
+def _intern(table, index, value):
+    position = index.get(value)
+    if position is None:
+        position = index[value] = len(table)
+        table.append(value)
+    return position
+
+
+def encode_page(page):
+    """Encode one legacy ``{"page", "blocks"}`` dict into the compact layout."""
+    fonts, font_index = [], {}
+    colors, color_index = [], {}
+    blocks = {"bbox": [], "lineCount": []}
+    lines = {"bbox": [], "spanCount": []}
+    spans = {"text": [], "font": [], "size": [], "color": [], "bbox": []}
+
+    for block in page["blocks"]:
+        blocks["bbox"].extend(block["bbox"])
+        blocks["lineCount"].append(len(block["lines"]))
+        for line in block["lines"]:
+            lines["bbox"].extend(line["bbox"])
+            lines["spanCount"].append(len(line["spans"]))
+            for span in line["spans"]:
+                spans["text"].append(span["text"])
+                spans["font"].append(_intern(fonts, font_index, span["font"]))
+                spans["size"].append(span["size"])
+                spans["color"].append(_intern(colors, color_index, span["color"]))
+                spans["bbox"].extend(span["bbox"])
+
+    return {
+        "page": page["page"],
+        "fonts": fonts,
+        "colors": colors,
+        "blocks": blocks,
+        "lines": lines,
+        "spans": spans,
+    }
+
+
+def decode_page(compact):
+    """Inverse of :func:`encode_page`."""
+    fonts, colors = compact["fonts"], compact["colors"]
+    block_bbox, line_counts = compact["blocks"]["bbox"], compact["blocks"]["lineCount"]
+    line_bbox, span_counts = compact["lines"]["bbox"], compact["lines"]["spanCount"]
+    spans = compact["spans"]
+
+    blocks = []
+    line_no = span_no = 0
+    for block_no, line_count in enumerate(line_counts):
+        block_lines = []
+        for _ in range(line_count):
+            line_spans = []
+            for _ in range(span_counts[line_no]):
+                line_spans.append({
+                    "text": spans["text"][span_no],
+                    "font": fonts[spans["font"][span_no]],
+                    "size": spans["size"][span_no],
+                    "color": colors[spans["color"][span_no]],
+                    "bbox": spans["bbox"][4 * span_no:4 * span_no + 4],
+                })
+                span_no += 1
+            block_lines.append({"spans": line_spans, "bbox": line_bbox[4 * line_no:4 * line_no + 4]})
+            line_no += 1
+        blocks.append({"lines": block_lines, "bbox": block_bbox[4 * block_no:4 * block_no + 4]})
+    return {"page": compact["page"], "blocks": blocks}
+
+
+def requested_format(request):
+    """Compact when content negotiation picked CompactJSONRenderer, legacy otherwise."""
+    renderer = getattr(request, "accepted_renderer", None)
+    return COMPACT if getattr(renderer, "format", None) == COMPACT else LEGACY
+
+
+def page_encoder(fmt):
+    """Return a callable turning a PDFPage row into its wire representation."""
+    if fmt == COMPACT:
+        return lambda page: encode_page(page.as_dict())
+    return lambda page: page.as_dict()
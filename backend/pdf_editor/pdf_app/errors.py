@@ -5,4 +5,19 @@ OPERATION_FAILED = "Operation failed"
 PDF_UPDATED_SUCCESSFULLY = "PDF updated successfully"
 PDF_DELETED_SUCCESSFULLY="PDF deleted Successfully"
 ANALYSIS_NOT_COMPLETED="Analysis not completed yet"
-PDF_NOT_FOUND="PDF document with this pk not found"
\ No newline at end of file
+PDF_NOT_FOUND="PDF document with this pk not found"
+PAGE_OUT_OF_RANGE="Page number out of range"
+INVALID_RENDER_PARAMETERS="Invalid render parameters"
+RENDER_PENDING="Rendering in progress, retry shortly"
+ANALYSIS_FAILED="Analysis failed"
+UPLOAD_NOT_ACTIVE="Upload session is no longer accepting chunks"
+INVALID_UPLOAD_CHUNK="Invalid chunk offset or length"
+UPLOAD_CHUNK_TOO_LARGE="Chunk larger than the allowed chunk size"
+INVALID_SEARCH_QUERY="Search query must contain at least one word"
+INVALID_REPLACEMENTS="replacements must be a non-empty list of {oldText, newText} with a valid page range"
+INVALID_PAGE_OPERATION="documents must be a non-empty list of document ids or {id, pages}"
+TOO_MANY_PAGES="Too many pages for one operation"
+TOO_MANY_OUTPUTS="Too many output documents for one split"
+INVALID_ANNOTATION_SINCE="since must be a sequence number"
+TOO_MANY_ANNOTATION_OPERATIONS="Too many annotation operations in one request"
+INVALID_EDITS="edits and newTexts must be lists of objects with a valid page, text and position"
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Task state events pushed to clients over Server-Sent Events.
+
+Celery signal handlers and the tasks' progress reports call :func:`publish`;
+``GET /pdf-documents/<task_id>/events/`` subscribes to the task's channel and
+streams every event until the task finishes, replacing get_task_status
+polling. The backend is chosen by ``PDF_EVENTS_BACKEND``:
+
+- ``"redis"``: Redis pub/sub on ``PDF_EVENTS_REDIS_URL``, so events published
+  by worker processes reach whichever ASGI process holds the connection.
+- ``"memory"``: an in-process fan-out, for tests and eager Celery in development.
+  Also used, with a warning, when the redis package is not installed.
+
+The endpoint is an async view; serve the project through ``pdf_editor.asgi``
+(uvicorn, daphne) so open streams do not pin a worker each.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from celery.result import AsyncResult
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import StreamingHttpResponse
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # only needed for the redis backend
+    redis = None
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+
+def status_payload(task_id, state, info):
+    """The get_task_status response body for a task state and its result/meta."""
+    payload = {"task_id": task_id, "status": state}
+    if state in ("FAILURE", "REVOKED"):
+        payload["error"] = str(info)
+    elif state == "PROGRESS":
+        payload["progress"] = info
+    elif state == "SUCCESS":
+        payload["result"] = info
+    return payload
+
+
+def result_payload(task_result):
+    return status_payload(task_result.id, task_result.status, task_result.result)
+
+
+class _MemorySubscription:
+    def __init__(self, backend, task_id):
+        self.backend = backend
+        self.task_id = task_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self):
+        self.backend._unsubscribe(self)
+
+
+class InMemoryEventBackend:
+    """Fan-out to asyncio queues of subscribers in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, task_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for subscription in subscribers:
+            # Publishers run in worker/request threads, the queues belong to the ASGI loop
+            subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, payload)
+
+    async def subscribe(self, task_id):
+        subscription = _MemorySubscription(self, task_id)
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.task_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.task_id, None)
+
+
+class _RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self):
+        while True:
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            if message is not None:
+                return json.loads(message["data"])
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisEventBackend:
+    """Redis pub/sub, one channel per task."""
+
+    def __init__(self, url):
+        if redis is None:
+            raise ImproperlyConfigured("PDF_EVENTS_BACKEND = 'redis' requires the redis package")
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    @staticmethod
+    def channel(task_id):
+        return f"pdf_editor:task-events:{task_id}"
+
+    def publish(self, task_id, payload):
+        self._client.publish(self.channel(task_id), json.dumps(payload, default=str))
+
+    async def subscribe(self, task_id):
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel(task_id))
+        return _RedisSubscription(client, pubsub)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.PDF_EVENTS_BACKEND == "memory":
+                    _backend = InMemoryEventBackend()
+                elif settings.PDF_EVENTS_BACKEND == "redis" and redis is None:
+                    logger.warning("PDF_EVENTS_BACKEND is 'redis' but the redis package is not installed; "
+                                   "events only reach streams in the publishing process")
+                    _backend = InMemoryEventBackend()
+                elif settings.PDF_EVENTS_BACKEND == "redis":
+                    _backend = RedisEventBackend(settings.PDF_EVENTS_REDIS_URL)
+                else:
+                    raise ImproperlyConfigured(f"Unknown PDF_EVENTS_BACKEND {settings.PDF_EVENTS_BACKEND!r}")
+    return _backend
+
+
+def publish(task_id, state, info=None):
+    """Push a task state to its subscribers. Never fails the task that reports it."""
+    if not task_id:
+        return
+    try:
+        get_backend().publish(task_id, status_payload(task_id, state, info))
+    except Exception as e:
+        logger.warning("Could not publish %s event for task %s: %s", state, task_id, e)
+
+
+def _sse(payload, event_id):
+    return f"id: {event_id}\nevent: {payload['status'].lower()}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+async def task_event_stream(task_id):
+    """SSE frames for one task: its current state, then every event until it finishes."""
+    # Subscribe before reading the current state so nothing published in between is lost
+    subscription = await get_backend().subscribe(task_id)
+    pending = None
+    try:
+        current = await sync_to_async(lambda: result_payload(AsyncResult(task_id)))()
+        event_id = 1
+        yield f"retry: {settings.PDF_EVENTS_RETRY_MS}\n" + _sse(current, event_id)
+        if current["status"] in TERMINAL_STATES:
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.PDF_EVENTS_MAX_SECONDS
+        pending = asyncio.ensure_future(subscription.get())
+        while loop.time() < deadline:
+            done, _ = await asyncio.wait({pending}, timeout=settings.PDF_EVENTS_HEARTBEAT_SECONDS)
+            if not done:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            payload = pending.result()
+            event_id += 1
+            yield _sse(payload, event_id)
+            if payload["status"] in TERMINAL_STATES:
+                return
+            pending = asyncio.ensure_future(subscription.get())
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+        await subscription.close()
+
+
+def task_event_response(task_id):
+    response = StreamingHttpResponse(task_event_stream(task_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
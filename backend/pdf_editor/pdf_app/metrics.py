@@ -0,0 +1,321 @@
+"""
+Timings and counters for the hot paths, exposed at ``GET /metrics`` in the
+Prometheus text format.
+
+Code records into a per-process registry with :func:`inc`, :func:`observe`
+or the :func:`timer` context manager; every metric is declared in
+``METRICS``. Where the numbers end up depends on ``PDF_METRICS_BACKEND``:
+
+- ``"redis"``: each process flushes its pending increments to one Redis
+  hash on ``PDF_METRICS_REDIS_URL`` (one pipeline): web processes from a
+  background thread every ``PDF_METRICS_FLUSH_SECONDS``, Celery workers
+  after every task. The analysis, save and queue-wait timings of the
+  workers thus appear in the web process's /metrics.
+- ``"memory"``: no flushing; /metrics shows the answering process only.
+  Also used, with a warning, when the redis package is not installed.
+
+:class:`MetricsMiddleware` times every request, labelled by endpoint and
+by the page-count bucket of the document it addresses (which the view
+reports with :func:`set_document_pages`), and times the rendering (JSON
+serialization) of DRF responses.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import redis
+except ImportError:  # only needed for the redis backend
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+PAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    "pdf_http_request_seconds": (
+        "histogram", "API request latency by endpoint, method, status class and document size", BUCKETS,
+    ),
+    "pdf_response_render_seconds": (
+        "histogram", "Time DRF spends rendering (serializing) a response body, by endpoint and format", BUCKETS,
+    ),
+    "pdf_fitz_open_seconds": ("histogram", "fitz.open time, by caller", BUCKETS),
+    "pdf_page_get_text_seconds": ("histogram", "page.get_text('dict') time per page", PAGE_BUCKETS),
+    "pdf_doc_save_seconds": ("histogram", "PDF save time by mode (incremental, full, compact, new)", BUCKETS),
+    "pdf_task_queue_wait_seconds": ("histogram", "Time a Celery task waited in the queue before starting", BUCKETS),
+    "pdf_task_run_seconds": ("histogram", "Celery task run time by task and final state", BUCKETS),
+    "pdf_document_cache_total": ("counter", "Per-process document cache lookups by result (hit, miss, eviction)", None),
+    "pdf_response_cache_total": (
+        "counter", "Encoded extract-text response cache events (hit, miss, store, eviction, invalidation)", None,
+    ),
+}
+
+
+def size_bucket(pages):
+    """Coarse document size label for histograms."""
+    if not pages:
+        return "unknown"
+    for limit in (10, 100, 1000):
+        if pages <= limit:
+            return f"<={limit}"
+    return ">1000"
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    rendered = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in sorted(labels.items())
+    )
+    return f"{name}{{{rendered}}}"
+
+
+class Registry:
+    """Samples keyed by their rendered series (``name{label="value"}``)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def inc(self, name, amount=1, **labels):
+        if METRICS[name][0] != "counter":
+            raise ValueError(f"{name} is not a counter")
+        with self._lock:
+            self._values[_series(name, labels)] += amount
+
+    def observe(self, name, value, **labels):
+        kind, _, buckets = METRICS[name]
+        if kind != "histogram":
+            raise ValueError(f"{name} is not a histogram")
+        with self._lock:
+            # Buckets are cumulative: every bucket at least as large as the value counts it
+            for bound in buckets:
+                if value <= bound:
+                    self._values[_series(f"{name}_bucket", {**labels, "le": bound})] += 1
+            self._values[_series(f"{name}_bucket", {**labels, "le": "+Inf"})] += 1
+            self._values[_series(f"{name}_sum", labels)] += value
+            self._values[_series(f"{name}_count", labels)] += 1
+
+    def drain(self):
+        """Pending samples, leaving the registry empty."""
+        with self._lock:
+            values, self._values = self._values, defaultdict(float)
+        return values
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class InMemoryMetricsBackend:
+    """Keeps everything in this process's registry."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def flush(self):
+        pass
+
+    def collect(self):
+        return self.registry.snapshot()
+
+
+class RedisMetricsBackend:
+    """Accumulates every process's samples in one Redis hash."""
+
+    key = "pdf_editor:metrics"
+
+    def __init__(self, registry, url):
+        if redis is None:
+            raise ImproperlyConfigured("PDF_METRICS_BACKEND = 'redis' requires the redis package")
+        self.registry = registry
+        self._client = redis.Redis.from_url(url)
+
+    def flush(self):
+        pending = self.registry.drain()
+        if not pending:
+            return
+        pipeline = self._client.pipeline(transaction=False)
+        for series, amount in pending.items():
+            pipeline.hincrbyfloat(self.key, series, amount)
+        pipeline.execute()
+
+    def collect(self):
+        self.flush()
+        return {series.decode(): float(value) for series, value in self._client.hgetall(self.key).items()}
+
+
+registry = Registry()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.PDF_METRICS_BACKEND == "memory":
+                    _backend = InMemoryMetricsBackend(registry)
+                elif settings.PDF_METRICS_BACKEND == "redis" and redis is None:
+                    logger.warning("PDF_METRICS_BACKEND is 'redis' but the redis package is not installed; "
+                                   "metrics stay in this process")
+                    _backend = InMemoryMetricsBackend(registry)
+                elif settings.PDF_METRICS_BACKEND == "redis":
+                    _backend = RedisMetricsBackend(registry, settings.PDF_METRICS_REDIS_URL)
+                else:
+                    raise ImproperlyConfigured(f"Unknown PDF_METRICS_BACKEND {settings.PDF_METRICS_BACKEND!r}")
+    return _backend
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    """``with timer("pdf_doc_save_seconds", mode="full"):`` observes the block's duration."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - started, **labels)
+
+
+def flush():
+    """Push this process's pending samples to the shared backend. Never raises."""
+    if not settings.PDF_METRICS_ENABLED:
+        return
+    try:
+        get_backend().flush()
+    except Exception as e:
+        logger.warning("Could not flush metrics: %s", e)
+
+
+_flusher = None
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.PDF_METRICS_FLUSH_SECONDS)
+        flush()
+
+
+def _start_flusher():
+    """Start this process's background flush thread, once; the memory backend needs none."""
+    global _flusher
+    if _flusher is not None or isinstance(get_backend(), InMemoryMetricsBackend):
+        return
+    with _backend_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_periodically, name="metrics-flush", daemon=True)
+            _flusher.start()
+            # Ship what the last interval collected when the process stops
+            atexit.register(flush)
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render():
+    """Every collected sample in the Prometheus text exposition format."""
+    values = get_backend().collect()
+    by_metric = defaultdict(list)
+    for series, value in values.items():
+        base = series.split("{", 1)[0]
+        for suffix in ("_bucket", "_sum", "_count"):
+            if base.endswith(suffix) and base[: -len(suffix)] in METRICS:
+                base = base[: -len(suffix)]
+                break
+        by_metric[base].append((series, value))
+    lines = []
+    for name in sorted(by_metric):
+        kind, help_text, _ = METRICS.get(name, ("untyped", "", None))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{series} {_number(value)}" for series, value in sorted(by_metric[name]))
+    return "\n".join(lines) + "\n"
+
+
+def set_document_pages(request, pages):
+    """Tell MetricsMiddleware the page count of the document a request addresses."""
+    # DRF views get a Request wrapping the HttpRequest the middleware sees
+    getattr(request, "_request", request).pdf_document_pages = pages
+
+
+class MetricsMiddleware:
+    """Request latency and response render time histograms (see module docstring)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    def _record(self, request, response, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        if not settings.PDF_METRICS_ENABLED or match is None or match.url_name == "metrics":
+            return
+        registry.observe(
+            "pdf_http_request_seconds",
+            elapsed,
+            endpoint=match.url_name or match.route,
+            method=request.method,
+            status=f"{response.status_code // 100}xx",
+            size=size_bucket(getattr(request, "pdf_document_pages", None)),
+        )
+        _start_flusher()
+
+    def process_template_response(self, request, response):
+        # DRF Responses render after the view returns; time that step too
+        if settings.PDF_METRICS_ENABLED:
+            started = time.perf_counter()
+            endpoint = request.resolver_match.url_name if request.resolver_match else "unknown"
+            renderer = getattr(response, "accepted_renderer", None)
+
+            def rendered(response):
+                registry.observe(
+                    "pdf_response_render_seconds",
+                    time.perf_counter() - started,
+                    endpoint=endpoint,
+                    format=getattr(renderer, "format", "unknown"),
+                )
+
+            response.add_post_render_callback(rendered)
+        return response
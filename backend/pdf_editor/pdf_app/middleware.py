@@ -1,37 +1,81 @@
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import PDFDocument
-from .serializers import PDFDocumentSerializer
-from .tasks import analyze_pdf_task
+from .models import PDFDocument, PDFPage, UploadSession
+from .serializers import PDFDocumentSerializer, UploadSessionSerializer
+from .tasks import (
+    analyze_pdf_task, update_text_task, bulk_replace_task, compact_pdf_task, render_page_task,
+    merge_documents_task, split_document_task, extract_pages_task, reorder_pages_task,
+    compact_annotations_task,
+)
 from celery.result import AsyncResult 
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.conf import settings
+from rest_framework import status
 from . import errors
+from . import pagination
+from . import streaming
+from . import storage
+from . import encoding
+from . import rendering
+from . import render_cache
+from . import events
+from . import uploads
+from . import search
+from . import page_ops
+from . import metrics
+from . import conditional
+from . import response_cache
+from . import annotations
 import fitz
 
 
 def pdf_document_list_middleware(request):
     """
-    List all PDF documents or create a new one and start analysis.
+    List PDF documents or create a new one and start analysis.
+    Uploads whose content was already analyzed reuse that analysis.
+
+    The list is newest first and keyset paginated (?limit=, ?cursor= from
+    the previous page's next_cursor); ?status= and ?title= (prefix) filter it.
     """
     if request.method == "GET":
-        pdf_documents = PDFDocument.objects.all()
-        serializer = PDFDocumentSerializer(pdf_documents, many=True, context={"request": request})
-        return Response({errors.SUCCESS: errors.OPERATION_SUCCESS, "data": serializer.data})
+        # The list never shows the analysis header, don't load it
+        pdf_documents = PDFDocument.objects.defer("analysis_result")
+        if request.query_params.get("status"):
+            pdf_documents = pdf_documents.filter(analysis_status=request.query_params["status"].upper())
+        if request.query_params.get("title"):
+            pdf_documents = pdf_documents.filter(title__istartswith=request.query_params["title"])
+        try:
+            page, next_cursor = pagination.keyset_page(
+                pdf_documents,
+                request.query_params,
+                settings.PDF_LIST_PAGE_LIMIT,
+                settings.PDF_LIST_MAX_PAGE_LIMIT,
+            )
+        except pagination.InvalidPageRequest as e:
+            return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = PDFDocumentSerializer(page, many=True, context={"request": request})
+        return Response({
+            errors.SUCCESS: errors.OPERATION_SUCCESS,
+            "data": serializer.data,
+            "next_cursor": next_cursor,
+            "next": pagination.cursor_url(request, next_cursor),
+        })
 
     elif request.method == "POST":
         serializer = PDFDocumentSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
-            # Save the new document instance
-            instance = serializer.save()
+            upload = serializer.validated_data["file"]
+            content_hash = storage.uploaded_sha256(request, "file", upload)
+            duplicate = storage.find_duplicate(content_hash)
+            if duplicate:
+                # Same bytes already stored: point at the existing file instead of writing a copy
+                instance = serializer.save(file=duplicate.file.name, content_hash=content_hash)
+            else:
+                # Save the new document instance
+                instance = serializer.save(content_hash=content_hash)
             print("instance is: ", instance)
-            # Start the background analysis task from tasks.py
-            task = analyze_pdf_task.delay(instance.id)
-            print('task is: ', task)
-            # Immediately respond with the document ID and the task ID
-            # The frontend will use these to poll for the result.
-            return Response({
-                "document_id": instance.id,
-                "task_id": task.id
-            })
+            return _start_analysis(instance, duplicate)
 
 
         return Response({
@@ -40,56 +84,196 @@ def pdf_document_list_middleware(request):
         })
 
 
+def _get_document(request, pk, queryset=PDFDocument):
+    """get_object_or_404, reporting the document's page count to the request metrics."""
+    pdf_doc = get_object_or_404(queryset, pk=pk)
+    metrics.set_document_pages(request, pdf_doc.pages_total)
+    return pdf_doc
+
+
+def _start_analysis(instance, duplicate):
+    """
+    Reuse the finished analysis of an unedited duplicate, or start the
+    background analysis task from tasks.py. Returns the upload response.
+    """
+    if duplicate and duplicate.analysis_status == 'SUCCESS' and not duplicate.edited_file:
+        storage.reuse_analysis(duplicate, instance)
+        return Response({
+            "document_id": instance.id,
+            "task_id": None,
+            "analysis_status": instance.analysis_status,
+            "deduplicated": True,
+        })
+    task = analyze_pdf_task.delay(instance.id)
+    print('task is: ', task)
+    # Immediately respond with the document ID and the task ID
+    # The frontend will use these to poll for the result.
+    return Response({
+        "document_id": instance.id,
+        "task_id": task.id
+    })
+
+
 def get_task_status_middleware(request, task_id):
     """
     Checks the status of a Celery background task.
     Your frontend will call this repeatedly (poll).
+    Long-running tasks report PROGRESS with pages_done / pages_total.
+    Clients that can hold a connection open should use task_events instead.
     """
     task_result = AsyncResult(task_id)
-    response_data = {'task_id': task_id, 'status': task_result.status}
-    
-    if task_result.failed():
-        response_data['error'] = str(task_result.result)
-    
-    return Response(response_data)
+    return Response(events.result_payload(task_result))
 
 
 def pdf_document_detail_middleware(request, pk):
     """
     Retrieve, update or delete a PDF document.
     """
-    # This view remains the same.
-    pdf_doc = get_object_or_404(PDFDocument, pk=pk)
+    if request.method == "GET":
+        etag = conditional.document_etag(pk, conditional.DETAIL_FIELDS, request=request)
+        if conditional.matches(request, etag):
+            return conditional.not_modified(etag)
+    # The serializer never shows analysis_result; leave the JSON column unread
+    pdf_doc = _get_document(request, pk, PDFDocument.objects.defer("analysis_result"))
     if request.method == "GET":
         serializer = PDFDocumentSerializer(pdf_doc, context={"request": request})
-        return Response(serializer.data)
+        etag = conditional.instance_etag(pdf_doc, conditional.DETAIL_FIELDS)
+        return conditional.set_validators(Response(serializer.data), etag)
     # ... (rest of the PUT and DELETE logic is unchanged)
     elif request.method == "PUT":
         serializer = PDFDocumentSerializer(pdf_doc, data=request.data, context={"request": request})
         if serializer.is_valid():
+            if "file" in serializer.validated_data:
+                return _replace_file(request, pdf_doc, serializer)
             serializer.save()
             return Response(serializer.data)
         return Response({errors.OPERATION_FAILED: serializer.errors})
     elif request.method == "DELETE":
+        file_name = pdf_doc.file.name
+        if pdf_doc.edited_file:
+            # The edited copy always belongs to this document alone
+            pdf_doc.edited_file.delete(save=False)
+        storage.delete_thumbnails(pdf_doc)
         pdf_doc.delete()
+        response_cache.invalidate(pk)
+        # The file may be shared with other uploads of the same content
+        storage.release_file(file_name)
         return Response({errors.OPERATION_SUCCESS: errors.PDF_DELETED_SUCCESSFULLY })
 
 
+def _replace_file(request, pdf_doc, serializer):
+    """
+    PUT with a new ``file``: the document gets the new content (deduplicated
+    like an upload), loses the analysis, edits and annotations of the old
+    one and is analyzed again. The old file is deleted once unreferenced.
+    """
+    upload = serializer.validated_data["file"]
+    content_hash = storage.uploaded_sha256(request, "file", upload)
+    if content_hash == pdf_doc.content_hash:
+        # Same bytes as stored: only the other fields change
+        serializer.save(file=pdf_doc.file.name)
+        return Response(serializer.data)
+    old_name = pdf_doc.file.name
+    storage.discard_analysis(pdf_doc)
+    annotations.reset(pdf_doc.id)
+    duplicate = storage.find_duplicate(content_hash)
+    if duplicate:
+        instance = serializer.save(file=duplicate.file.name, content_hash=content_hash)
+    else:
+        instance = serializer.save(content_hash=content_hash)
+    instance.refresh_from_db(fields=["edit_version", "analysis_version"])
+    response_cache.invalidate(instance.id)
+    storage.release_file(old_name)
+    started = _start_analysis(instance, duplicate)
+    return Response({**serializer.data, **started.data})
+
+
 def extract_text_middleware(request, pk):
     """
     Retrieve the COMPLETED analysis result for a PDF document.
     This view is now called AFTER polling confirms the task is done.
+
+    Supports ?page=N, ?pages=A-B and cursor pagination (?limit=&cursor=)
+    so clients can fetch only the pages they are about to display.
+    ?stream=ndjson|json (or Accept: application/x-ndjson) streams the pages
+    one at a time instead of rendering the whole document in memory.
+    ?format=compact (or the compact Accept media type) returns pages in the
+    columnar layout described in encoding.py.
+
+    Successful responses carry an ETag (see conditional.py); a request whose
+    If-None-Match still matches gets a 304 without the result being loaded.
+    Non-streamed bodies are served from the encoded response cache
+    (response_cache.py) once a first request has rendered them.
     """
     print('inside extract text middleware')
+    page_format = encoding.requested_format(request)
+    stream_mode = streaming.wants_stream(request)
+    etag_fields = (*conditional.VERSION_FIELDS, "analysis_status")
+    # The host is part of the absolute next link in the body
+    representation = (request.get_host(), conditional.canonical_query(request), page_format, stream_mode)
+    etag = conditional.document_etag(pk, etag_fields, *representation, request=request)
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag)
+    cache_key = None
+    if etag and not stream_mode and response_cache.cacheable(request):
+        cache_key = response_cache.cache_key(pk, etag)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            content_type, body = cached
+            response = HttpResponse(body, content_type=content_type)
+            patch_vary_headers(response, ("Accept",))
+            return conditional.set_validators(response, etag)
     pdf_doc = PDFDocument.objects.filter(pk=pk).first()
     if pdf_doc:
         # We now fetch the pre-computed result from the database model
         if pdf_doc.analysis_status == 'SUCCESS' and pdf_doc.analysis_result:
-            print('before returning response: ', pdf_doc.analysis_result)
-            return Response(pdf_doc.analysis_result)
+            # The document may have moved on since the tag was computed; tag what is sent
+            etag = conditional.instance_etag(pdf_doc, etag_fields, *representation)
+            if cache_key is not None:
+                cache_key = response_cache.cache_key(pk, etag)
+            total_pages = pdf_doc.analysis_result.get("totalPages", 0)
+            try:
+                window = pagination.page_window(
+                    request.query_params,
+                    total_pages,
+                    settings.PDF_EXTRACT_PAGE_LIMIT,
+                    settings.PDF_EXTRACT_MAX_PAGE_LIMIT,
+                )
+            except pagination.InvalidPageRequest as e:
+                return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            # Page blocks are stored per page in PDFPage rows
+            pages = PDFPage.objects.filter(
+                document=pdf_doc,
+                page_number__gte=window.first,
+                page_number__lte=window.last,
+            ).order_by("page_number")
+            encode_page = encoding.page_encoder(page_format)
+            header = {**pdf_doc.analysis_result, "format": page_format}
+            if stream_mode:
+                response = streaming.stream_pages_response(request, stream_mode, header, pages, encode_page)
+            else:
+                response_data = {
+                    **header,
+                    "pages": [encode_page(page) for page in pages],
+                }
+                if window.paginated:
+                    response_data["next"] = pagination.next_page_url(request, window)
+                if cache_key is not None:
+                    body, content_type = response_cache.render(request, response_data)
+                    response_cache.put(cache_key, content_type, body)
+                    response = HttpResponse(body, content_type=content_type)
+                else:
+                    response = Response(response_data)
+            # The format and stream mode can come from the Accept header
+            patch_vary_headers(response, ("Accept",))
+            return conditional.set_validators(response, etag)
         else:
             # If the frontend calls this too early, let it know the task is still running
-            return Response({errors.ERROR: errors.ANALYSIS_NOT_COMPLETED, "status": pdf_doc.analysis_status})
+            response_data = {errors.ERROR: errors.ANALYSIS_NOT_COMPLETED, "status": pdf_doc.analysis_status}
+            if pdf_doc.analysis_status == 'FAILURE':
+                response_data[errors.ERROR] = errors.ANALYSIS_FAILED
+                response_data["error"] = pdf_doc.analysis_error
+            return Response(response_data)
     else:
         return Response({
             errors.ERROR: errors.PDF_NOT_FOUND
@@ -97,29 +281,499 @@ def extract_text_middleware(request, pk):
 
 
 def save_edits_middleware(request, pk):
-    pdf_doc = get_object_or_404(PDFDocument, pk=pk)
-    annotations = request.data.get("annotations", {})
-    page_number = request.data.get("pageNumber", 1)
+    """
+    Append annotation ``operations`` (see annotations.py) to the document's
+    log, or replace page ``pageNumber`` with the posted ``annotations`` list;
+    only the annotations that differ from the stored page are logged. The
+    response has the document's latest ``seq`` for ?since= delta syncs.
+    """
+    pdf_doc = get_object_or_404(PDFDocument.objects.only("id"), pk=pk)
+    try:
+        if "operations" in request.data:
+            operations = annotations.parse_operations(request.data["operations"])
+            message = "Annotation operations saved"
+        else:
+            page_number = request.data.get("pageNumber", 1)
+            operations = annotations.page_replacement(pdf_doc.id, page_number, request.data.get("annotations", []))
+            message = f"Edits saved for page {page_number}"
+    except annotations.InvalidAnnotationOperation as e:
+        return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if len(operations) > settings.PDF_ANNOTATION_MAX_OPERATIONS:
+        return Response({errors.ERROR: errors.TOO_MANY_ANNOTATION_OPERATIONS}, status=status.HTTP_400_BAD_REQUEST)
+    if operations:
+        _, seq, pending = annotations.append(pdf_doc.id, operations)
+        if pending >= settings.PDF_ANNOTATION_COMPACT_AFTER:
+            compact_annotations_task.delay(pdf_doc.id)
+    else:
+        seq = PDFDocument.objects.filter(pk=pdf_doc.id).values_list("annotation_seq", flat=True).get()
     return Response({
         errors.SUCCESS: errors.OPERATION_SUCCESS,
-        "message": f"Edits saved for page {page_number}",
-        "annotations": annotations,
-    })  
+        "message": message,
+        "saved": len(operations),
+        "seq": seq,
+    })
+
+
+def annotations_middleware(request, pk):
+    """
+    Annotation operations logged after ``?since=<seq>`` (at most ?limit=,
+    ``more`` set when there are further pages), or the document's full
+    annotation state with ``reset`` when since is missing or predates the
+    last compaction.
+    """
+    get_object_or_404(PDFDocument.objects.only("id"), pk=pk)
+    since = request.query_params.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({errors.ERROR: errors.INVALID_ANNOTATION_SINCE}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0:
+            return Response({errors.ERROR: errors.INVALID_ANNOTATION_SINCE}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = pagination.parse_limit(
+            request.query_params,
+            settings.PDF_ANNOTATION_DELTA_LIMIT,
+            settings.PDF_ANNOTATION_MAX_DELTA_LIMIT,
+        )
+    except pagination.InvalidPageRequest as e:
+        return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(annotations.changes_since(int(pk), since, limit))
+
+
+def _number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError
+    return value
+
+
+def _parse_edits(data, total_pages):
+    """Check the shape of update-text ``edits`` / ``newTexts`` before they are queued."""
+    edits = data.get("edits", [])
+    new_texts = data.get("newTexts", [])
+    if not isinstance(edits, list) or not isinstance(new_texts, list) or not (edits or new_texts):
+        raise ValueError
+    for item in edits + new_texts:
+        if not isinstance(item, dict):
+            raise ValueError
+        page = item.get("page", 1)
+        if isinstance(page, bool) or (isinstance(page, float) and not page.is_integer()):
+            raise ValueError
+        page = int(page)
+        if page < 1 or (total_pages and page > total_pages):
+            raise ValueError
+        for key in ("fontSize", "x", "y"):
+            if key in item:
+                _number(item[key])
+        if item.get("bbox") is not None:
+            if not isinstance(item["bbox"], list) or len(item["bbox"]) != 4:
+                raise ValueError
+            for value in item["bbox"]:
+                _number(value)
+        for key in ("oldText", "newText", "text"):
+            if item.get(key) is not None and not isinstance(item[key], str):
+                raise ValueError
+    return edits, new_texts
 
 
 def update_text_middleware(request, pk):
     """
     Update text in PDF: replace or add new text.
+    The edits run in update_text_task; poll get_task_status with the returned
+    task id for progress and, on completion, the edited file.
+    """
+    pdf_doc = _get_document(request, pk)
+    try:
+        edits, new_texts = _parse_edits(request.data, (pdf_doc.analysis_result or {}).get("totalPages"))
+    except (TypeError, ValueError):
+        return Response({errors.ERROR: errors.INVALID_EDITS}, status=status.HTTP_400_BAD_REQUEST)
+    task = update_text_task.delay(pdf_doc.id, edits, new_texts)
+    return Response({
+        errors.SUCCESS: errors.OPERATION_SUCCESS,
+        "document_id": pdf_doc.id,
+        "task_id": task.id,
+    })
+
+
+def _parse_replacements(data):
+    replacements = data.get("replacements")
+    if not isinstance(replacements, list) or not replacements:
+        raise ValueError
+    for replacement in replacements:
+        if not isinstance(replacement, dict) or not replacement.get("oldText"):
+            raise ValueError
+    first_page = int(data["pageStart"]) if data.get("pageStart") else None
+    last_page = int(data["pageEnd"]) if data.get("pageEnd") else None
+    if (first_page is not None and first_page < 1) or (first_page and last_page and last_page < first_page):
+        raise ValueError
+    return [
+        {"oldText": str(replacement["oldText"]), "newText": str(replacement.get("newText", ""))}
+        for replacement in replacements
+    ], first_page, last_page
+
+
+def bulk_replace_middleware(request, pk):
+    """
+    Find and replace ``replacements`` (a list of {oldText, newText}) across
+    the document, or pages pageStart-pageEnd. Matches are located from the
+    analyzed spans, so the document must have finished analysis. The task
+    result has per-page match counts and timings.
+    """
+    pdf_doc = _get_document(request, pk)
+    try:
+        replacements, first_page, last_page = _parse_replacements(request.data)
+    except (TypeError, ValueError):
+        return Response({errors.ERROR: errors.INVALID_REPLACEMENTS}, status=status.HTTP_400_BAD_REQUEST)
+    if pdf_doc.analysis_status != 'SUCCESS':
+        return Response(
+            {errors.ERROR: errors.ANALYSIS_NOT_COMPLETED, "status": pdf_doc.analysis_status},
+            status=status.HTTP_409_CONFLICT,
+        )
+    task = bulk_replace_task.delay(pdf_doc.id, replacements, first_page, last_page)
+    return Response({
+        errors.SUCCESS: errors.OPERATION_SUCCESS,
+        "document_id": pdf_doc.id,
+        "task_id": task.id,
+    })
+
+
+def _task_started(pdf_doc, task):
+    return Response({
+        errors.SUCCESS: errors.OPERATION_SUCCESS,
+        "document_id": pdf_doc.id if pdf_doc else None,
+        "task_id": task.id,
+    })
+
+
+def _not_analyzed(pdf_doc):
+    """Page operations copy the stored analysis and need the page count, so they wait for it."""
+    if pdf_doc.analysis_status == 'SUCCESS' and pdf_doc.analysis_result:
+        return None
+    return Response(
+        {errors.ERROR: errors.ANALYSIS_NOT_COMPLETED, "document_id": pdf_doc.id, "status": pdf_doc.analysis_status},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def merge_documents_middleware(request):
+    """
+    Merge documents into a new one: ``documents`` is a list of ids or
+    ``{id, pages}`` entries (pages as "1-3,5" or a list), merged in order.
+    """
+    entries = request.data.get("documents")
+    if not isinstance(entries, list) or not entries:
+        return Response({errors.ERROR: errors.INVALID_PAGE_OPERATION}, status=status.HTTP_400_BAD_REQUEST)
+    entries = [entry if isinstance(entry, dict) else {"id": entry} for entry in entries]
+    try:
+        ids = [int(entry.get("id")) for entry in entries]
+    except (TypeError, ValueError):
+        return Response({errors.ERROR: errors.INVALID_PAGE_OPERATION}, status=status.HTTP_400_BAD_REQUEST)
+    documents = PDFDocument.objects.in_bulk(ids)
+    sources = []
+    for doc_id, entry in zip(ids, entries):
+        pdf_doc = documents.get(doc_id)
+        if pdf_doc is None:
+            return Response({errors.ERROR: errors.PDF_NOT_FOUND, "document_id": doc_id}, status=status.HTTP_404_NOT_FOUND)
+        pending = _not_analyzed(pdf_doc)
+        if pending:
+            return pending
+        total_pages = pdf_doc.analysis_result.get("totalPages", 0)
+        try:
+            pages = page_ops.parse_page_list(entry.get("pages") or f"1-{total_pages}", total_pages)
+        except pagination.InvalidPageRequest as e:
+            return Response({errors.ERROR: str(e), "document_id": doc_id}, status=status.HTTP_400_BAD_REQUEST)
+        sources.append([doc_id, pages])
+    if sum(len(pages) for _, pages in sources) > settings.PDF_PAGE_OPS_MAX_PAGES:
+        return Response({errors.ERROR: errors.TOO_MANY_PAGES}, status=status.HTTP_400_BAD_REQUEST)
+    title = request.data.get("title") or " + ".join(documents[doc_id].title for doc_id in dict.fromkeys(ids))
+    task = merge_documents_task.delay(sources, title[:255])
+    return _task_started(None, task)
+
+
+def split_document_middleware(request, pk):
+    """
+    Split a document into new documents, one per entry of ``ranges``
+    ("1-100", "101-") or one per ``every`` pages. The original is unchanged.
+    """
+    pdf_doc = _get_document(request, pk)
+    pending = _not_analyzed(pdf_doc)
+    if pending:
+        return pending
+    total_pages = pdf_doc.analysis_result.get("totalPages", 0)
+    try:
+        ranges = page_ops.split_ranges(total_pages, request.data.get("ranges"), request.data.get("every"))
+    except pagination.InvalidPageRequest as e:
+        return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ranges) > settings.PDF_PAGE_OPS_MAX_OUTPUTS:
+        return Response({errors.ERROR: errors.TOO_MANY_OUTPUTS}, status=status.HTTP_400_BAD_REQUEST)
+    task = split_document_task.delay(pdf_doc.id, ranges)
+    return _task_started(pdf_doc, task)
+
+
+def extract_pages_middleware(request, pk):
+    """Copy ``pages`` ("1,3,5-7" or a list, in that order) of a document into a new document."""
+    pdf_doc = _get_document(request, pk)
+    pending = _not_analyzed(pdf_doc)
+    if pending:
+        return pending
+    total_pages = pdf_doc.analysis_result.get("totalPages", 0)
+    try:
+        pages = page_ops.parse_page_list(request.data.get("pages"), total_pages)
+    except pagination.InvalidPageRequest as e:
+        return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if len(pages) > settings.PDF_PAGE_OPS_MAX_PAGES:
+        return Response({errors.ERROR: errors.TOO_MANY_PAGES}, status=status.HTTP_400_BAD_REQUEST)
+    title = request.data.get("title") or f"{pdf_doc.title} (extract)"
+    task = extract_pages_task.delay(pdf_doc.id, pages, title[:255])
+    return _task_started(pdf_doc, task)
+
+
+def reorder_pages_middleware(request, pk):
+    """
+    Reorder the document's pages in place to ``order`` (a list or "3,1-2");
+    pages left out are removed. Applies to the working copy like update-text.
+    """
+    pdf_doc = _get_document(request, pk)
+    pending = _not_analyzed(pdf_doc)
+    if pending:
+        return pending
+    total_pages = pdf_doc.analysis_result.get("totalPages", 0)
+    try:
+        order = page_ops.parse_page_list(request.data.get("order"), total_pages)
+    except pagination.InvalidPageRequest as e:
+        return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if len(order) > settings.PDF_PAGE_OPS_MAX_PAGES:
+        return Response({errors.ERROR: errors.TOO_MANY_PAGES}, status=status.HTTP_400_BAD_REQUEST)
+    task = reorder_pages_task.delay(pdf_doc.id, order)
+    return _task_started(pdf_doc, task)
+
+
+def compact_middleware(request, pk):
+    """
+    Queue a full rewrite of the document's working copy, dropping the history
+    that incremental edit saves leave behind.
+    """
+    pdf_doc = _get_document(request, pk)
+    task = compact_pdf_task.delay(pdf_doc.id)
+    return Response({
+        errors.SUCCESS: errors.OPERATION_SUCCESS,
+        "document_id": pdf_doc.id,
+        "task_id": task.id,
+    })
+
+
+def render_page_middleware(request, pk, page_number):
     """
-    # This view remains the same for now.
-    # In the future, this slow process could also become a Celery task.
+    Serve a rasterized page (?dpi=, ?tile=col,row, ?type=png|jpeg|webp) from
+    the render cache. On a miss the rendering is queued on the Celery workers
+    and a 202 with the task id is returned; the client retries the same URL.
+    The PDF is only opened by the worker, which also rejects tiles outside
+    the page; retries then get its error as a 400.
+    """
+    pdf_doc = _get_document(request, pk)
+    try:
+        dpi = int(request.query_params.get("dpi", settings.PDF_RENDER_DEFAULT_DPI))
+        tile = rendering.parse_tile(request.query_params.get("tile"))
+    except ValueError:
+        return Response({errors.ERROR: errors.INVALID_RENDER_PARAMETERS}, status=status.HTTP_400_BAD_REQUEST)
+    image_type = request.query_params.get("type", "png")
+    if not 18 <= dpi <= settings.PDF_RENDER_MAX_DPI or image_type not in rendering.available_types():
+        return Response({errors.ERROR: errors.INVALID_RENDER_PARAMETERS}, status=status.HTTP_400_BAD_REQUEST)
+    total_pages = (pdf_doc.analysis_result or {}).get("totalPages")
+    if page_number < 1 or (total_pages and page_number > total_pages):
+        return Response({errors.ERROR: errors.PAGE_OUT_OF_RANGE}, status=status.HTTP_404_NOT_FOUND)
+
+    key = render_cache.cache_key(pdf_doc, page_number, dpi, tile, image_type)
+    etag = f'"{key}"'
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag)
+    path = render_cache.get(key, image_type)
+    if path is None:
+        # The worker checks the tile against the page; once it has rejected
+        # one, retries get the error rather than another 202
+        rejected = render_cache.rejection(key, image_type)
+        if rejected is not None:
+            return Response({errors.ERROR: rejected}, status=status.HTTP_400_BAD_REQUEST)
+        task = render_page_task.delay(pdf_doc.id, page_number, dpi, tile, image_type)
+        # Fast workers (or eager mode) may already have filled the cache
+        path = render_cache.get(key, image_type)
+        if path is None and task.failed():
+            return Response({errors.ERROR: str(task.result)}, status=status.HTTP_400_BAD_REQUEST)
+        if path is None:
+            return Response(
+                {errors.ERROR: errors.RENDER_PENDING, "task_id": task.id},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Retry-After": "1"},
+            )
+    content_type = rendering.CONTENT_TYPES[image_type]
+    if streaming.is_asgi(request):
+        # Under ASGI Django reads a FileResponse into memory anyway (and warns);
+        # an image is at most one PDF_RENDER_MAX_DPI page, send it as one body
+        with open(path, "rb") as f:
+            response = HttpResponse(f.read(), content_type=content_type)
+    else:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    return conditional.set_validators(response, etag)
+
+
+def task_events_middleware(request, task_id):
+    """
+    Server-Sent Events stream of a task's state: the current state first,
+    then every STARTED / PROGRESS / SUCCESS / FAILURE event as it happens.
+    """
+    return events.task_event_response(task_id)
+
+
+def metrics_middleware(request):
+    """Collected timings and counters in the Prometheus text format (see metrics.py)."""
+    if not settings.PDF_METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def document_status_middleware(request, pk):
+    """
+    Analysis status straight from the document row: no Celery result backend
+    lookup, so it is cheap to poll. FAILURE comes with the recorded error.
+    """
+    row = PDFDocument.objects.filter(pk=pk).values(
+        "analysis_status", "pages_done", "pages_total", "analysis_error", "analysis_version", "edit_version",
+    ).first()
+    if row is None:
+        return Response({errors.ERROR: errors.PDF_NOT_FOUND}, status=status.HTTP_404_NOT_FOUND)
+    metrics.set_document_pages(request, row["pages_total"])
+    response_data = {
+        "document_id": pk,
+        "analysis_status": row["analysis_status"],
+        "pages_done": row["pages_done"],
+        "pages_total": row["pages_total"],
+        "analysis_version": row["analysis_version"],
+        "edit_version": row["edit_version"],
+    }
+    if row["analysis_status"] == 'FAILURE':
+        response_data["error"] = row["analysis_error"]
+    return Response(response_data)
+
+
+def _search_response(request, document_id=None):
+    try:
+        limit = pagination.parse_limit(
+            request.query_params, settings.PDF_SEARCH_RESULT_LIMIT, settings.PDF_SEARCH_MAX_RESULT_LIMIT,
+        )
+        results = search.search(request.query_params.get("q"), document_id=document_id, limit=limit)
+    except search.InvalidSearchQuery:
+        return Response({errors.ERROR: errors.INVALID_SEARCH_QUERY}, status=status.HTTP_400_BAD_REQUEST)
+    except pagination.InvalidPageRequest as e:
+        return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    response_data = {"q": request.query_params["q"], "results": results}
+    if document_id is not None:
+        response_data["document_id"] = document_id
+    return Response(response_data)
+
+
+def search_middleware(request):
+    """
+    Full-text search over every document's extracted lines (?q=, ?limit=),
+    best match first. Each hit has the document, page and line bbox.
+    """
+    return _search_response(request)
+
+
+def document_search_middleware(request, pk):
+    """Full-text search within one document, hits in reading order."""
+    if not PDFDocument.objects.filter(pk=pk).exists():
+        return Response({errors.ERROR: errors.PDF_NOT_FOUND}, status=status.HTTP_404_NOT_FOUND)
+    return _search_response(request, document_id=pk)
+
+
+def upload_session_list_middleware(request):
+    """
+    Start a resumable chunked upload: {"title", "filename", "total_size"}.
+    The response carries the session id and the maximum chunk size.
+    """
+    serializer = UploadSessionSerializer(data=request.data)
+    if serializer.is_valid():
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    return Response({errors.ERROR: errors.OPERATION_FAILED, "Error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def upload_session_detail_middleware(request, upload_id):
+    """GET the session (received_bytes tells a client where to resume) or DELETE it to abort."""
+    session = get_object_or_404(UploadSession, pk=upload_id)
+    if request.method == "GET":
+        return Response(UploadSessionSerializer(session).data)
+    elif request.method == "DELETE":
+        uploads.abort(session)
+        return Response({errors.SUCCESS: errors.OPERATION_SUCCESS})
+
+
+def _chunk_offset(request):
+    """Chunk start from ``Content-Range: bytes start-end/total`` or ``?offset=``."""
+    content_range = request.META.get("HTTP_CONTENT_RANGE")
+    if content_range:
+        unit, _, byte_range = content_range.partition(" ")
+        if unit != "bytes":
+            raise ValueError(content_range)
+        return int(byte_range.split("-", 1)[0])
+    return int(request.query_params.get("offset", 0))
+
+
+def upload_chunk_middleware(request, upload_id):
+    """
+    PUT one chunk as the raw request body (application/octet-stream). It is
+    streamed to disk, never parsed into request.data.
+    """
+    session = get_object_or_404(UploadSession, pk=upload_id)
+    if session.status != 'ACTIVE':
+        return Response({errors.ERROR: errors.UPLOAD_NOT_ACTIVE}, status=status.HTTP_409_CONFLICT)
+    try:
+        offset = _chunk_offset(request)
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return Response({errors.ERROR: errors.INVALID_UPLOAD_CHUNK}, status=status.HTTP_400_BAD_REQUEST)
+    if length > settings.PDF_UPLOAD_CHUNK_SIZE:
+        return Response(
+            {errors.ERROR: errors.UPLOAD_CHUNK_TOO_LARGE, "chunk_size": settings.PDF_UPLOAD_CHUNK_SIZE},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+    if offset < 0 or length <= 0:
+        return Response({errors.ERROR: errors.INVALID_UPLOAD_CHUNK}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        written = uploads.write_chunk(session, offset, request.stream, length)
+    except uploads.UploadConflict as e:
+        return Response(
+            {errors.ERROR: str(e), "received_bytes": session.received_bytes},
+            status=status.HTTP_409_CONFLICT,
+        )
+    except ValueError as e:
+        return Response({errors.ERROR: str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        "id": str(session.id),
+        "written": written,
+        "received_bytes": session.received_bytes,
+        "total_size": session.total_size,
+    })
+
+
+def upload_complete_middleware(request, upload_id):
+    """
+    Finish a fully received upload: create the PDFDocument and start its
+    analysis. Responds like a single-request upload to pdf-documents/.
+    """
+    session = get_object_or_404(UploadSession, pk=upload_id)
+    if session.status == 'COMPLETE' and session.document_id:
+        # Repeated complete (e.g. the first response was lost)
+        return Response({
+            "document_id": session.document_id,
+            "task_id": None,
+            "analysis_status": session.document.analysis_status,
+        })
     try:
-        pdf_doc = get_object_or_404(PDFDocument, pk=pk)
-        edits = request.data.get("edits", [])
-        doc = fitz.open(pdf_doc.file.path)
-        # ... (rest of your update_text logic is unchanged)
-        new_path = pdf_doc.file.path.replace(".pdf", "_edited.pdf")
-        doc.save(new_path)
-        return Response({"message": "PDF updated."})
-    except Exception as e:
-        return Response({errors.OPERATION_FAILED: str(e)})
\ No newline at end of file
+        instance, duplicate = uploads.complete(session)
+    except uploads.UploadConflict as e:
+        return Response(
+            {errors.ERROR: str(e), "received_bytes": session.received_bytes},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return _start_analysis(instance, duplicate)
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def split_analysis_results(apps, schema_editor):
+    """Move the pages of existing analysis_result blobs into PDFPage rows."""
+    PDFDocument = apps.get_model("pdf_app", "PDFDocument")
+    PDFPage = apps.get_model("pdf_app", "PDFPage")
+    for pdf_doc in PDFDocument.objects.filter(analysis_result__isnull=False).iterator():
+        result = pdf_doc.analysis_result
+        pages = result.pop("pages", None) if isinstance(result, dict) else None
+        if pages is None:
+            continue
+        PDFPage.objects.bulk_create(
+            [PDFPage(document=pdf_doc, page_number=page["page"], blocks=page["blocks"]) for page in pages],
+            batch_size=500,
+        )
+        result["totalPages"] = len(pages)
+        pdf_doc.analysis_result = result
+        pdf_doc.save(update_fields=["analysis_result"])
+
+
+def merge_analysis_results(apps, schema_editor):
+    PDFDocument = apps.get_model("pdf_app", "PDFDocument")
+    PDFPage = apps.get_model("pdf_app", "PDFPage")
+    for pdf_doc in PDFDocument.objects.filter(analysis_result__isnull=False).iterator():
+        pages = PDFPage.objects.filter(document=pdf_doc).order_by("page_number")
+        pdf_doc.analysis_result["pages"] = [{"page": page.page_number, "blocks": page.blocks} for page in pages]
+        pdf_doc.save(update_fields=["analysis_result"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_app', '0002_pdfdocument_analysis_result_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('blocks', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='pdf_app.pdfdocument')),
+            ],
+            options={
+                'ordering': ['document', 'page_number'],
+                'constraints': [models.UniqueConstraint(fields=('document', 'page_number'), name='unique_pdf_page_number')],
+            },
+        ),
+        migrations.RunPython(split_analysis_results, merge_analysis_results),
+    ]
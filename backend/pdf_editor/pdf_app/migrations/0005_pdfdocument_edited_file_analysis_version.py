@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:01
+
+import pdf_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_app', '0004_pdfdocument_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='analysis_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='edited_file',
+            field=models.FileField(blank=True, upload_to=pdf_app.models.pdf_upload_path),
+        ),
+    ]
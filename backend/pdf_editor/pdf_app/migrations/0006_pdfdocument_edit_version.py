@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_app', '0005_pdfdocument_edited_file_analysis_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='edit_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
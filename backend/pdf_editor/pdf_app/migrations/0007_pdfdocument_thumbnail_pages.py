@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_app', '0006_pdfdocument_edit_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='thumbnail_pages',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
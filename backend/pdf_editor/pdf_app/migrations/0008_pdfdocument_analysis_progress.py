@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+def backfill_page_counts(apps, schema_editor):
+    """Documents analyzed before progress tracking are complete: pages_done = pages_total."""
+    PDFDocument = apps.get_model("pdf_app", "PDFDocument")
+    for pdf_doc in PDFDocument.objects.filter(analysis_status="SUCCESS", analysis_result__isnull=False).iterator():
+        total = (pdf_doc.analysis_result or {}).get("totalPages", 0)
+        PDFDocument.objects.filter(pk=pdf_doc.pk).update(pages_done=total, pages_total=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_app', '0007_pdfdocument_thumbnail_pages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='analysis_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='pages_done',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='pages_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='pdfdocument',
+            name='analysis_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('SUCCESS', 'Success'), ('FAILURE', 'Failure')], default='PENDING', max_length=10),
+        ),
+        migrations.RunPython(backfill_page_counts, migrations.RunPython.noop),
+    ]
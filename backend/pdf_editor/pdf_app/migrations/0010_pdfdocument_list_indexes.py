@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_app', '0009_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pdfdocument',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='pdfdoc_uploaded_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pdfdocument',
+            index=models.Index(fields=['analysis_status', '-uploaded_at', '-id'], name='pdfdoc_status_uploaded_idx'),
+        ),
+    ]
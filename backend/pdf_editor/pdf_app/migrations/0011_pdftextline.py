@@ -0,0 +1,110 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    # External-content FTS5 table: the text lives once, in pdf_app_pdftextline
+    """CREATE VIRTUAL TABLE pdf_app_pdftextline_fts USING fts5(
+        text, content='pdf_app_pdftextline', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER pdf_app_pdftextline_fts_insert AFTER INSERT ON pdf_app_pdftextline BEGIN
+        INSERT INTO pdf_app_pdftextline_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER pdf_app_pdftextline_fts_delete AFTER DELETE ON pdf_app_pdftextline BEGIN
+        INSERT INTO pdf_app_pdftextline_fts(pdf_app_pdftextline_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER pdf_app_pdftextline_fts_update AFTER UPDATE ON pdf_app_pdftextline BEGIN
+        INSERT INTO pdf_app_pdftextline_fts(pdf_app_pdftextline_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO pdf_app_pdftextline_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS pdf_app_pdftextline_fts_insert",
+    "DROP TRIGGER IF EXISTS pdf_app_pdftextline_fts_delete",
+    "DROP TRIGGER IF EXISTS pdf_app_pdftextline_fts_update",
+    "DROP TABLE IF EXISTS pdf_app_pdftextline_fts",
+]
+POSTGRES_FORWARD = [
+    """ALTER TABLE pdf_app_pdftextline ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', text)) STORED""",
+    "CREATE INDEX pdf_app_pdftextline_search_idx ON pdf_app_pdftextline USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS pdf_app_pdftextline_search_idx",
+    "ALTER TABLE pdf_app_pdftextline DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any("FTS5" in row[0] for row in cursor.fetchall())
+
+
+def create_search_index(apps, schema_editor):
+    """Database-specific full-text index; other databases fall back to a LIKE scan in search.py."""
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite" and _sqlite_has_fts5(connection):
+        statements = SQLITE_FORWARD
+    elif connection.vendor == "postgresql":
+        statements = POSTGRES_FORWARD
+    else:
+        statements = []
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    statements = {"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}.get(connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def index_existing_pages(apps, schema_editor):
+    PDFPage = apps.get_model("pdf_app", "PDFPage")
+    PDFTextLine = apps.get_model("pdf_app", "PDFTextLine")
+    lines = []
+    for document_id, page_number, blocks in PDFPage.objects.values_list("document_id", "page_number", "blocks").iterator():
+        for block in blocks or []:
+            for line in block.get("lines", []):
+                text = "".join(span.get("text", "") for span in line.get("spans", [])).strip()
+                if text:
+                    x0, y0, x1, y1 = line["bbox"]
+                    lines.append(PDFTextLine(
+                        document_id=document_id, page_number=page_number,
+                        x0=x0, y0=y0, x1=x1, y1=y1, text=text,
+                    ))
+        if len(lines) >= 1000:
+            PDFTextLine.objects.bulk_create(lines)
+            lines = []
+    PDFTextLine.objects.bulk_create(lines)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_app', '0010_pdfdocument_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFTextLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('x0', models.FloatField()),
+                ('y0', models.FloatField()),
+                ('x1', models.FloatField()),
+                ('y1', models.FloatField()),
+                ('text', models.TextField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='text_lines', to='pdf_app.pdfdocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['document', 'page_number'], name='pdftextline_doc_page_idx')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing_pages, migrations.RunPython.noop),
+    ]
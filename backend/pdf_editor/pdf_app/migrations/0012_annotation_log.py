@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pdf_app', '0011_pdftextline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='annotation_compacted_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pdfdocument',
+            name='annotation_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='AnnotationOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveBigIntegerField()),
+                ('page_number', models.PositiveIntegerField()),
+                ('op', models.CharField(choices=[('put', 'Put'), ('delete', 'Delete')], max_length=6)),
+                ('annotation_id', models.CharField(max_length=64)),
+                ('data', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='annotation_operations', to='pdf_app.pdfdocument')),
+            ],
+            options={
+                'ordering': ['document', 'seq'],
+                'constraints': [models.UniqueConstraint(fields=('document', 'seq'), name='unique_annotation_seq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AnnotationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('seq', models.PositiveBigIntegerField(default=0)),
+                ('annotations', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='annotation_snapshots', to='pdf_app.pdfdocument')),
+            ],
+            options={
+                'ordering': ['document', 'page_number'],
+                'constraints': [models.UniqueConstraint(fields=('document', 'page_number'), name='unique_annotation_snapshot_page')],
+            },
+        ),
+    ]
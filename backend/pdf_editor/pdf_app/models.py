@@ -1,4 +1,7 @@
-from django.db import models
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
 import os
 import uuid
 
@@ -14,6 +17,7 @@ class PDFDocument(models.Model):
     """Model for storing PDF documents"""
     ANALYSIS_STATUS_CHOICES=[
         ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
         ('SUCCESS','Success'),
         ('FAILURE', 'Failure'), 
     ]
@@ -23,8 +27,27 @@ class PDFDocument(models.Model):
         default='PENDING'
     )
     analysis_result = models.JSONField(null=True, blank=True)
+    # Analysis progress, updated once per batch of pages rather than per page
+    pages_done = models.PositiveIntegerField(default=0)
+    pages_total = models.PositiveIntegerField(default=0)
+    # Why the last analysis failed, when analysis_status is FAILURE
+    analysis_error = models.TextField(blank=True)
     title = models.CharField(max_length=255)
     file = models.FileField(upload_to=pdf_upload_path)
+    # SHA-256 of the uploaded file; identical uploads share one stored file
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # Working copy written by update-text; the original upload is never modified
+    edited_file = models.FileField(upload_to=pdf_upload_path, blank=True)
+    # Number of saves made to the working copy (edits and compactions)
+    edit_version = models.PositiveIntegerField(default=0)
+    # Bumped whenever stored page analysis changes
+    analysis_version = models.PositiveIntegerField(default=0)
+    # Number of leading pages with a pre-rendered thumbnail (see thumbnail_name)
+    thumbnail_pages = models.PositiveSmallIntegerField(default=0)
+    # Last sequence number handed to an annotation operation, and the last one
+    # merged into the per-page snapshots by compaction (see annotations.py)
+    annotation_seq = models.PositiveBigIntegerField(default=0)
+    annotation_compacted_seq = models.PositiveBigIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -34,5 +57,275 @@ class PDFDocument(models.Model):
     def filename(self):
         return os.path.basename(self.file.name)
 
+    def current_file_path(self):
+        """Path of the latest version of the document (the edited copy once it has been edited)."""
+        if self.edited_file:
+            return self.edited_file.path
+        return self.file.path
+
+    def edited_file_name(self):
+        """Storage name of this document's edited copy; unique per document even for shared uploads."""
+        if self.edited_file:
+            return self.edited_file.name
+        stem = os.path.splitext(self.filename())[0]
+        return os.path.join("pdfs", f"{stem}_edited_{self.id}.pdf")
+
+    def thumbnail_dir(self):
+        return os.path.join("thumbnails", str(self.id))
+
+    def thumbnail_name(self, page_number):
+        """Storage name of the thumbnail of a 1-based page."""
+        return os.path.join(self.thumbnail_dir(), f"page_{page_number}.jpeg")
+
     class Meta:
         ordering = ["-uploaded_at"]
+        indexes = [
+            # Keyset pagination of the document list, optionally filtered by status
+            models.Index(fields=["-uploaded_at", "-id"], name="pdfdoc_uploaded_id_idx"),
+            models.Index(fields=["analysis_status", "-uploaded_at", "-id"], name="pdfdoc_status_uploaded_idx"),
+        ]
+
+
+class PDFPageManager(models.Manager):
+    """
+    All writes to analyzed pages go through here so the full-text search
+    lines (PDFTextLine) are replaced in the same transaction as their pages.
+    """
+
+    def replace_pages(self, document_id, pages):
+        """Store extracted ``{"page", "blocks"}`` dicts, replacing existing rows for those pages."""
+        page_numbers = [page["page"] for page in pages]
+        with transaction.atomic():
+            self.filter(document_id=document_id, page_number__in=page_numbers).delete()
+            self.bulk_create(
+                [self.model(document_id=document_id, page_number=page["page"], blocks=page["blocks"]) for page in pages],
+                batch_size=500,
+            )
+            if settings.PDF_SEARCH_INDEX:
+                PDFTextLine.objects.filter(document_id=document_id, page_number__in=page_numbers).delete()
+                PDFTextLine.objects.bulk_create(
+                    (line for page in pages for line in PDFTextLine.objects.lines_for_page(document_id, page["page"], page["blocks"])),
+                    batch_size=1000,
+                )
+        return len(pages)
+
+    def copy_pages(self, source_id, target_id):
+        """Copy every analyzed page (and its search lines) of one document onto another."""
+        with transaction.atomic():
+            self.filter(document_id=target_id).delete()
+            rows = self.filter(document_id=source_id).values_list("page_number", "blocks").iterator(chunk_size=500)
+            self.bulk_create(
+                (self.model(document_id=target_id, page_number=page_number, blocks=blocks) for page_number, blocks in rows),
+                batch_size=500,
+            )
+            PDFTextLine.objects.filter(document_id=target_id).delete()
+            lines = PDFTextLine.objects.filter(document_id=source_id).values_list(
+                "page_number", "x0", "y0", "x1", "y1", "text",
+            ).iterator(chunk_size=1000)
+            PDFTextLine.objects.bulk_create(
+                (
+                    PDFTextLine(document_id=target_id, page_number=page_number, x0=x0, y0=y0, x1=x1, y1=y1, text=text)
+                    for page_number, x0, y0, x1, y1, text in lines
+                ),
+                batch_size=1000,
+            )
+
+    def assemble_pages(self, target_id, page_map):
+        """
+        Give ``target_id`` the analyzed pages listed in ``page_map`` (the
+        ``(document_id, page_number)`` each target page comes from, in
+        order) by copying their rows and search lines. Pages keep their
+        content when moved, so nothing is re-extracted. The source rows are
+        read before the target's are replaced, so ``target_id`` may be one of
+        the sources (reordering in place). Returns the target page numbers
+        whose source had no analyzed row.
+        """
+        destinations = defaultdict(list)
+        for target_page, (source_id, source_page) in enumerate(page_map, start=1):
+            destinations[(source_id, source_page)].append(target_page)
+        source_pages = defaultdict(list)
+        for source_id, source_page in destinations:
+            source_pages[source_id].append(source_page)
+
+        pages = []
+        lines = []
+        for source_id, numbers in source_pages.items():
+            # A range scan (the unique index) instead of a huge IN list; unwanted pages are skipped
+            in_range = {"document_id": source_id, "page_number__gte": min(numbers), "page_number__lte": max(numbers)}
+            for page_number, blocks in self.filter(**in_range).values_list("page_number", "blocks").iterator(chunk_size=500):
+                for target_page in destinations.get((source_id, page_number), []):
+                    pages.append(self.model(document_id=target_id, page_number=target_page, blocks=blocks))
+            rows = PDFTextLine.objects.filter(**in_range).values_list(
+                "page_number", "x0", "y0", "x1", "y1", "text",
+            ).iterator(chunk_size=1000)
+            for page_number, x0, y0, x1, y1, text in rows:
+                for target_page in destinations.get((source_id, page_number), []):
+                    lines.append(PDFTextLine(
+                        document_id=target_id, page_number=target_page, x0=x0, y0=y0, x1=x1, y1=y1, text=text,
+                    ))
+
+        with transaction.atomic():
+            self.filter(document_id=target_id).delete()
+            PDFTextLine.objects.filter(document_id=target_id).delete()
+            self.bulk_create(pages, batch_size=500)
+            PDFTextLine.objects.bulk_create(lines, batch_size=1000)
+        copied = {page.page_number for page in pages}
+        return [number for number in range(1, len(page_map) + 1) if number not in copied]
+
+    def trim_pages(self, document_id, page_count):
+        """Drop pages (and search lines) past the end of a document that got shorter."""
+        with transaction.atomic():
+            self.filter(document_id=document_id, page_number__gt=page_count).delete()
+            PDFTextLine.objects.filter(document_id=document_id, page_number__gt=page_count).delete()
+
+
+class PDFPage(models.Model):
+    """Extracted text blocks for a single page of a PDFDocument"""
+    document = models.ForeignKey(PDFDocument, related_name="pages", on_delete=models.CASCADE)
+    page_number = models.PositiveIntegerField()
+    blocks = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PDFPageManager()
+
+    def __str__(self):
+        return f"{self.document_id} page {self.page_number}"
+
+    def as_dict(self):
+        return {"page": self.page_number, "blocks": self.blocks}
+
+    class Meta:
+        ordering = ["document", "page_number"]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "page_number"], name="unique_pdf_page_number"),
+        ]
+
+
+class PDFTextLineManager(models.Manager):
+    def lines_for_page(self, document_id, page_number, blocks):
+        """Unsaved rows for every non-blank text line in a page's extracted blocks."""
+        for block in blocks:
+            for line in block.get("lines", []):
+                text = "".join(span.get("text", "") for span in line.get("spans", [])).strip()
+                if text:
+                    x0, y0, x1, y1 = line["bbox"]
+                    yield self.model(
+                        document_id=document_id,
+                        page_number=page_number,
+                        x0=x0, y0=y0, x1=x1, y1=y1,
+                        text=text,
+                    )
+
+
+class PDFTextLine(models.Model):
+    """
+    One extracted line of text with its position, the unit of full-text search.
+    The database-specific index (SQLite FTS5 table or Postgres tsvector) is
+    created in migration 0011 and queried by search.py.
+    """
+    document = models.ForeignKey(PDFDocument, related_name="text_lines", on_delete=models.CASCADE)
+    page_number = models.PositiveIntegerField()
+    x0 = models.FloatField()
+    y0 = models.FloatField()
+    x1 = models.FloatField()
+    y1 = models.FloatField()
+    text = models.TextField()
+
+    objects = PDFTextLineManager()
+
+    def __str__(self):
+        return f"{self.document_id} page {self.page_number}: {self.text[:40]}"
+
+    def bbox(self):
+        return [self.x0, self.y0, self.x1, self.y1]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["document", "page_number"], name="pdftextline_doc_page_idx"),
+        ]
+
+
+class AnnotationOperation(models.Model):
+    """
+    One entry of a document's append-only annotation log: an annotation put
+    (created or replaced) or deleted on a page. ``seq`` is allocated from
+    PDFDocument.annotation_seq, so it is unique and increasing per document.
+    """
+    PUT = "put"
+    DELETE = "delete"
+    OP_CHOICES = [
+        (PUT, 'Put'),
+        (DELETE, 'Delete'),
+    ]
+    document = models.ForeignKey(PDFDocument, related_name="annotation_operations", on_delete=models.CASCADE)
+    seq = models.PositiveBigIntegerField()
+    page_number = models.PositiveIntegerField()
+    op = models.CharField(max_length=6, choices=OP_CHOICES)
+    annotation_id = models.CharField(max_length=64)
+    # The whole annotation for puts, null for deletes
+    data = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.document_id} #{self.seq} {self.op} {self.annotation_id} on page {self.page_number}"
+
+    def as_dict(self):
+        return {
+            "seq": self.seq,
+            "page": self.page_number,
+            "op": self.op,
+            "id": self.annotation_id,
+            "annotation": self.data,
+        }
+
+    class Meta:
+        ordering = ["document", "seq"]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "seq"], name="unique_annotation_seq"),
+        ]
+
+
+class AnnotationSnapshot(models.Model):
+    """A page's annotations (``{annotation_id: annotation}``) as of operation ``seq``, written by compaction."""
+    document = models.ForeignKey(PDFDocument, related_name="annotation_snapshots", on_delete=models.CASCADE)
+    page_number = models.PositiveIntegerField()
+    seq = models.PositiveBigIntegerField(default=0)
+    annotations = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.document_id} page {self.page_number} annotations @{self.seq}"
+
+    class Meta:
+        ordering = ["document", "page_number"]
+        constraints = [
+            models.UniqueConstraint(fields=["document", "page_number"], name="unique_annotation_snapshot_page"),
+        ]
+
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload. Chunks are written straight into ``file_name``
+    (the PDF's final storage location); the PDFDocument is only created once
+    every byte has arrived.
+    """
+    STATUS_CHOICES = [
+        ('ACTIVE', 'Active'),
+        ('COMPLETE', 'Complete'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    title = models.CharField(max_length=255)
+    file_name = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    # Bytes received contiguously from the start of the file; clients resume from here
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ACTIVE')
+    document = models.ForeignKey(PDFDocument, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.title} ({self.received_bytes}/{self.total_size})"
+
+    def is_complete(self):
+        return self.received_bytes >= self.total_size
@@ -0,0 +1,112 @@
+"""
+Page-level document operations: merge, split, extract and reorder.
+
+Every operation is described by a page map, the ``(document_id, page_number)``
+each output page comes from. Pages are copied with ``insert_pdf`` in runs of
+consecutive source pages (one call per run, not per page) and every output is
+saved and closed before the next one is built, so splitting a 1000-page scan
+holds one part in memory at a time. The moved pages' analysis is copied from
+their PDFPage rows (PDFPageManager.assemble_pages) rather than re-extracted.
+"""
+
+import os
+
+import fitz
+
+from . import doc_cache
+from . import metrics
+from .pagination import InvalidPageRequest
+
+
+def parse_page_list(spec, total_pages):
+    """
+    1-based page numbers from ``"1-3,7,9-"`` or a list of ints, in the order
+    given; pages may repeat. Every page must exist in the document.
+    """
+    if isinstance(spec, str):
+        pages = []
+        for part in spec.split(","):
+            part = part.strip()
+            try:
+                if "-" in part:
+                    first, last = part.split("-", 1)
+                    first = int(first) if first.strip() else 1
+                    last = int(last) if last.strip() else total_pages
+                else:
+                    first = last = int(part)
+            except ValueError:
+                raise InvalidPageRequest(f"Invalid page range: {part!r}")
+            if last < first:
+                raise InvalidPageRequest(f"Invalid page range: {part!r}")
+            pages.extend(range(first, last + 1))
+    elif isinstance(spec, list):
+        try:
+            pages = [int(page) for page in spec]
+        except (TypeError, ValueError):
+            raise InvalidPageRequest("Pages must be page numbers")
+    else:
+        raise InvalidPageRequest("Pages must be a list or a range string")
+    if not pages:
+        raise InvalidPageRequest("No pages selected")
+    for page in pages:
+        if not 1 <= page <= total_pages:
+            raise InvalidPageRequest(f"Page {page} out of range (1-{total_pages})")
+    return pages
+
+
+def split_ranges(total_pages, ranges=None, every=None):
+    """``(first, last)`` page ranges for a split, either given explicitly or every ``every`` pages."""
+    if every:
+        try:
+            every = int(every)
+        except (TypeError, ValueError):
+            raise InvalidPageRequest("every must be a page count")
+        if every < 1:
+            raise InvalidPageRequest("every must be at least 1")
+        return [(first, min(first + every - 1, total_pages)) for first in range(1, total_pages + 1, every)]
+    if not isinstance(ranges, list) or not ranges:
+        raise InvalidPageRequest("Give ranges or every")
+    parts = []
+    for value in ranges:
+        pages = parse_page_list(str(value), total_pages)
+        if pages != list(range(pages[0], pages[-1] + 1)):
+            raise InvalidPageRequest(f"Split ranges must be contiguous: {value!r}")
+        parts.append((pages[0], pages[-1]))
+    return parts
+
+
+def runs(page_map):
+    """Collapse a page map into ``(document_id, first, last)`` runs of consecutive pages."""
+    collapsed = []
+    for document_id, page_number in page_map:
+        if collapsed and collapsed[-1][0] == document_id and collapsed[-1][2] == page_number - 1:
+            collapsed[-1][2] = page_number
+        else:
+            collapsed.append([document_id, page_number, page_number])
+    return [tuple(run) for run in collapsed]
+
+
+def write_pages(page_map, paths, out_path):
+    """
+    Build a new PDF at ``out_path`` from ``page_map``; ``paths`` maps each
+    source document id to its current file. Returns the number of
+    ``insert_pdf`` calls made.
+    """
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    out = fitz.open()
+    try:
+        page_runs = runs(page_map)
+        for document_id, first, last in page_runs:
+            # Read-only, so sources come from (and stay in) the per-process document cache
+            with doc_cache.open_document(paths[document_id]) as source:
+                out.insert_pdf(source, from_page=first - 1, to_page=last - 1)
+        with metrics.timer("pdf_doc_save_seconds", mode="new"):
+            out.save(out_path, garbage=1, deflate=True)
+    finally:
+        out.close()
+    return len(page_runs)
+
+
+def reorder(doc, order):
+    """Rearrange an open document to the 1-based page ``order`` (pages left out are removed)."""
+    doc.select([page - 1 for page in order])
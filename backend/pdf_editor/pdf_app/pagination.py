@@ -0,0 +1,145 @@
+import base64
+from collections import namedtuple
+from datetime import datetime
+
+
+class InvalidPageRequest(ValueError):
+    """Raised when page selection query parameters cannot be parsed."""
+
+
+# first/last: inclusive pages to return now; end: last page of the requested range
+PageWindow = namedtuple("PageWindow", ["first", "last", "end", "paginated"])
+
+
+def parse_page_range(value, total_pages):
+    """
+    Parse ``"N"`` or ``"A-B"`` (1-based, inclusive) into a ``(first, last)`` tuple
+    clamped to the document. An open end (``"5-"``) runs to the last page; a
+    range starting past the last page is rejected.
+    """
+    value = (value or "").strip()
+    try:
+        if "-" in value:
+            first, last = value.split("-", 1)
+            first = int(first) if first.strip() else 1
+            last = int(last) if last.strip() else total_pages
+        else:
+            first = last = int(value)
+    except ValueError:
+        raise InvalidPageRequest(f"Invalid page range: {value!r}")
+    if first < 1 or last < first:
+        raise InvalidPageRequest(f"Invalid page range: {value!r}")
+    if first > total_pages:
+        raise InvalidPageRequest(f"Page {first} out of range (1-{total_pages})")
+    return first, min(last, total_pages)
+
+
+def parse_limit(query_params, default_limit, max_limit):
+    try:
+        limit = int(query_params.get("limit") or default_limit)
+    except ValueError:
+        raise InvalidPageRequest("Invalid limit")
+    if limit < 1:
+        raise InvalidPageRequest("Invalid limit")
+    return min(limit, max_limit)
+
+
+def encode_cursor(page_number):
+    return base64.urlsafe_b64encode(f"p={page_number}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, value = base64.urlsafe_b64decode(padded.encode()).decode().split("=", 1)
+        if key != "p":
+            raise ValueError
+        return int(value)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidPageRequest("Invalid cursor")
+
+
+def page_window(query_params, total_pages, default_limit, max_limit):
+    """
+    Work out which pages an extract-text request wants.
+
+    ``?page=N`` and ``?pages=A-B`` narrow the range; ``?cursor=`` / ``?limit=``
+    switch to cursor pagination inside that range. Without any of these
+    parameters the whole document is returned.
+    """
+    first, last = 1, total_pages
+    if query_params.get("page"):
+        if "-" in query_params["page"]:
+            raise InvalidPageRequest("Use ?pages= for page ranges")
+        first, last = parse_page_range(query_params["page"], total_pages)
+    elif query_params.get("pages"):
+        first, last = parse_page_range(query_params["pages"], total_pages)
+
+    if "cursor" in query_params or "limit" in query_params:
+        limit = parse_limit(query_params, default_limit, max_limit)
+        if query_params.get("cursor"):
+            first = max(first, decode_cursor(query_params["cursor"]) + 1)
+        return PageWindow(first, min(last, first + limit - 1), last, True)
+    return PageWindow(first, last, last, False)
+
+
+def next_page_url(request, window):
+    """Absolute URL for the next cursor page, or ``None`` once the range is exhausted."""
+    if not window.paginated or window.last >= window.end:
+        return None
+    params = request.query_params.copy()
+    params["cursor"] = encode_cursor(window.last)
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+def encode_keyset_cursor(timestamp, pk):
+    raw = f"t={timestamp.isoformat()}&id={pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_keyset_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, pk = base64.urlsafe_b64decode(padded.encode()).decode().split("&", 1)
+        if not timestamp.startswith("t=") or not pk.startswith("id="):
+            raise ValueError
+        return datetime.fromisoformat(timestamp[2:]), int(pk[3:])
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidPageRequest("Invalid cursor")
+
+
+def after_cursor(queryset, cursor, field="uploaded_at"):
+    """Rows strictly after ``cursor`` in ``(field, id)`` descending order."""
+    timestamp, pk = decode_keyset_cursor(cursor)
+    # "field <= t AND NOT (field = t AND id >= pk)" rather than an OR of the two
+    # cases, so every database can answer it with one range scan of the index
+    return queryset.filter(**{f"{field}__lte": timestamp}).exclude(**{field: timestamp, "id__gte": pk})
+
+
+def keyset_page(queryset, query_params, default_limit, max_limit, field="uploaded_at"):
+    """
+    One page of ``queryset``, newest first, ordered by ``(field, id)``.
+
+    The cursor holds the last row's ``(field, id)``, so the next page is a
+    ``WHERE (field, id) < cursor`` range scan on the matching index instead
+    of an OFFSET that reads and discards every earlier row. Returns the rows
+    and the cursor of the following page (``None`` on the last page).
+    """
+    limit = parse_limit(query_params, default_limit, max_limit)
+    queryset = queryset.order_by(f"-{field}", "-id")
+    if query_params.get("cursor"):
+        queryset = after_cursor(queryset, query_params["cursor"], field)
+    # One extra row tells whether another page exists without a COUNT(*)
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_keyset_cursor(getattr(rows[-1], field), rows[-1].pk)
+
+
+def cursor_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.query_params.copy()
+    params["cursor"] = cursor
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
@@ -0,0 +1,81 @@
+"""
+Opt-in cProfile of a single request.
+
+When ``PDF_PROFILE_ENABLED`` is on, a request carrying the
+``PDF_PROFILE_HEADER`` header (``X-PDF-Profile: 1`` by default) runs under
+cProfile. The top ``PDF_PROFILE_TOP`` functions by cumulative time are
+printed and written to ``PDF_PROFILE_DIR`` next to the raw ``.prof`` stats
+(for snakeviz / pstats), and the response names the file in the same header.
+Send the header on the one slow request to look at; everything else runs
+unprofiled. Eager Celery tasks run inside the request and are included.
+Streaming responses produce their body after the view returns, so they
+get no report.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+
+def _wants_profile(request):
+    return settings.PDF_PROFILE_ENABLED and request.headers.get(settings.PDF_PROFILE_HEADER)
+
+
+def _write_report(request, profile, elapsed):
+    os.makedirs(settings.PDF_PROFILE_DIR, exist_ok=True)
+    slug = request.path.strip("/").replace("/", "_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method.lower()}-{slug}"
+    path = os.path.join(settings.PDF_PROFILE_DIR, name)
+    profile.dump_stats(path + ".prof")
+    summary = io.StringIO()
+    summary.write(f"{request.method} {request.get_full_path()} took {elapsed * 1000:.1f} ms\n")
+    pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(settings.PDF_PROFILE_TOP)
+    with open(path + ".txt", "w") as handle:
+        handle.write(summary.getvalue())
+    print(summary.getvalue())
+    return name + ".txt"
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it (see module docstring)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not _wants_profile(request):
+            return self.get_response(request)
+        return self._profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        if not _wants_profile(request):
+            return await self.get_response(request)
+        # cProfile follows one thread. Run the rest of the chain from a
+        # thread-sensitive worker: the sync views below it are then called in
+        # that same thread (asgiref reuses it) and show up in the profile
+        return await sync_to_async(self._profile)(request, async_to_sync(self.get_response))
+
+    def _profile(self, request, get_response):
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profile.disable()
+        if not response.streaming:
+            response[settings.PDF_PROFILE_HEADER] = _write_report(request, profile, time.perf_counter() - started)
+        return response
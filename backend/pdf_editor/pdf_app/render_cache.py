@@ -0,0 +1,122 @@
+"""
+On-disk cache of rendered page images.
+
+Entries live under ``PDF_RENDER_CACHE_DIR`` and are keyed by the document
+content (hash + edit version), page, dpi, tile and image type. A hit bumps
+the file's mtime, so eviction can drop the least recently used files until
+the cache is back under ``PDF_RENDER_CACHE_MAX_BYTES``.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+
+_evict_lock = threading.Lock()
+_last_evict = float("-inf")
+
+
+def cache_key(pdf_doc, page_number, dpi, tile, image_type):
+    if pdf_doc.edited_file:
+        # Working copies are per document; the edit version changes with every save
+        content = f"document-{pdf_doc.id}:{pdf_doc.edit_version}"
+    else:
+        # Unedited uploads of the same content share their renders
+        content = pdf_doc.content_hash or f"document-{pdf_doc.id}"
+    tile_part = "page" if tile is None else f"{tile[0]},{tile[1]}"
+    raw = f"{content}:{page_number}:{dpi}:{tile_part}:{image_type}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def entry_path(key, image_type):
+    return os.path.join(settings.PDF_RENDER_CACHE_DIR, key[:2], f"{key}.{image_type}")
+
+
+def get(key, image_type):
+    """Path of a cached image, or ``None``. Hits are marked as recently used."""
+    path = entry_path(key, image_type)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def put(key, image_type, data):
+    path = entry_path(key, image_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(data)
+    os.replace(tmp_path, path)
+    maybe_evict()
+    return path
+
+
+def _rejection_path(key, image_type):
+    return entry_path(key, image_type) + ".rejected"
+
+
+def reject(key, image_type, message):
+    """
+    Record why ``key`` cannot be rendered (a tile outside the page, a page
+    past the end), so a client retrying the URL gets the error instead of
+    queueing the same failing render again. Evicted like any other entry.
+    """
+    path = _rejection_path(key, image_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as handle:
+        handle.write(message)
+
+
+def rejection(key, image_type):
+    """The message :func:`reject` recorded for ``key``, or ``None``."""
+    try:
+        with open(_rejection_path(key, image_type)) as handle:
+            return handle.read()
+    except FileNotFoundError:
+        return None
+
+
+def evict(max_bytes):
+    """Delete least recently used entries until the cache uses at most 90% of ``max_bytes``."""
+    entries = []
+    total = 0
+    for root, _dirs, files in os.walk(settings.PDF_RENDER_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    target = max_bytes * 0.9
+    for _mtime, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def maybe_evict():
+    """Run :func:`evict` at most once per ``PDF_RENDER_CACHE_EVICT_INTERVAL`` seconds per process."""
+    global _last_evict
+    now = time.monotonic()
+    if now - _last_evict < settings.PDF_RENDER_CACHE_EVICT_INTERVAL:
+        return
+    with _evict_lock:
+        if now - _last_evict < settings.PDF_RENDER_CACHE_EVICT_INTERVAL:
+            return
+        _last_evict = now
+        evict(settings.PDF_RENDER_CACHE_MAX_BYTES)
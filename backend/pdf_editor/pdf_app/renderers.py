@@ -0,0 +1,28 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .encoding import COMPACT, COMPACT_MEDIA_TYPE
+from .streaming import NDJSON_CONTENT_TYPE, dumps
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Lets DRF content negotiation accept ``Accept: application/x-ndjson``.
+    Regular (non-streamed) responses such as errors render as a single line.
+    """
+    media_type = NDJSON_CONTENT_TYPE
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return (dumps(data) + "\n").encode()
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    Selected with ``?format=compact`` or ``Accept: application/vnd.pdfeditor.compact+json``.
+    Output is plain JSON; extract-text encodes pages compactly when this renderer is chosen.
+    """
+    media_type = COMPACT_MEDIA_TYPE
+    format = COMPACT
@@ -0,0 +1,69 @@
+import io
+
+import fitz
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed for WebP output
+    Image = None
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+def available_types():
+    return [image_type for image_type in CONTENT_TYPES if image_type != "webp" or Image is not None]
+
+
+def parse_tile(value):
+    """``"col,row"`` -> ``(col, row)``; ``None`` or ``""`` means the whole page."""
+    if not value:
+        return None
+    col, row = value.split(",")
+    col, row = int(col), int(row)
+    if col < 0 or row < 0:
+        raise ValueError("tile indexes must be >= 0")
+    return col, row
+
+
+def tile_clip(page_rect, dpi, tile, tile_size):
+    """The area of the page, in PDF points, covered by tile ``(col, row)`` of ``tile_size`` pixels."""
+    if tile is None:
+        return page_rect
+    points = tile_size * 72.0 / dpi
+    col, row = tile
+    clip = fitz.Rect(col * points, row * points, (col + 1) * points, (row + 1) * points) & page_rect
+    if clip.is_empty:
+        raise ValueError(f"tile {col},{row} is outside the page")
+    return clip
+
+
+def encode_pixmap(pixmap, image_type):
+    if image_type == "png":
+        return pixmap.tobytes("png")
+    if image_type == "jpeg":
+        return pixmap.tobytes("jpeg", jpg_quality=85)
+    if image_type == "webp" and Image is not None:
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples).save(buffer, "WEBP", quality=85)
+        return buffer.getvalue()
+    raise ValueError(f"Unsupported image type: {image_type}")
+
+
+def render_page(doc, page_number, dpi, tile=None, tile_size=512, image_type="png"):
+    """Rasterize one 1-based page (or one tile of it) of an open document to image bytes."""
+    page = doc[page_number - 1]
+    clip = tile_clip(page.rect, dpi, tile, tile_size)
+    pixmap = page.get_pixmap(dpi=dpi, clip=clip, alpha=False)
+    return encode_pixmap(pixmap, image_type)
+
+
+def render_thumbnail(doc, page_number, width, image_type="jpeg"):
+    """Rasterize one 1-based page scaled to ``width`` pixels, whatever its size in points."""
+    page = doc[page_number - 1]
+    scale = width / page.rect.width
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+    return encode_pixmap(pixmap, image_type)
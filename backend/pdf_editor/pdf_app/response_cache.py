@@ -0,0 +1,240 @@
+"""
+Shared cache of encoded extract-text responses.
+
+A finished analysis only changes when the document is edited or re-analyzed,
+yet every extract-text request read ``analysis_result`` and the page rows and
+re-encoded them. This cache keeps the encoded body instead, keyed by the
+document and its extract-text ETag (conditional.py). The tag already covers
+everything that selects the body (analysis and edit versions, page window
+query, negotiated format, host of the ``next`` link), so a stale entry can
+never be served. The edit and re-analysis tasks additionally drop a
+document's entries with :func:`invalidate` so they do not sit in the cache
+until evicted.
+
+Only whole (non-streamed) JSON and compact bodies up to
+``PDF_RESPONSE_CACHE_MAX_ENTRY_BYTES`` are stored. The least recently used
+entries are evicted once the cache holds more than
+``PDF_RESPONSE_CACHE_MAX_BYTES``. The backend is chosen by
+``PDF_RESPONSE_CACHE_BACKEND``:
+
+- ``"redis"``: one cache on ``PDF_RESPONSE_CACHE_REDIS_URL`` shared by every
+  web process.
+- ``"memory"``: a per-process LRU, for tests and development. Also used,
+  with a warning, when the redis package is not installed.
+
+Lookups are counted in ``pdf_response_cache_total`` (hit, miss, store,
+eviction, invalidation); the hit ratio is hit / (hit + miss).
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from . import encoding
+from . import metrics
+
+try:
+    import redis
+except ImportError:  # only needed for the redis backend
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Renderer formats whose output is stored
+FORMATS = ("json", encoding.COMPACT)
+
+
+def cache_key(document_id, etag):
+    return "{}:{}".format(document_id, etag.strip('"'))
+
+
+def cacheable(request):
+    renderer = getattr(request, "accepted_renderer", None)
+    return settings.PDF_RESPONSE_CACHE_ENABLED and getattr(renderer, "format", None) in FORMATS
+
+
+def render(request, data):
+    """``(body, content_type)`` of ``data`` as the negotiated renderer would write it."""
+    renderer = request.accepted_renderer
+    # Bypasses the DRF Response that MetricsMiddleware would otherwise time
+    endpoint = request.resolver_match.url_name if request.resolver_match else "unknown"
+    with metrics.timer("pdf_response_render_seconds", endpoint=endpoint, format=renderer.format):
+        body = renderer.render(data, request.accepted_media_type, {"request": request})
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f"{content_type}; charset={renderer.charset}"
+    return body, content_type
+
+
+class InMemoryResponseCache:
+    """Per-process LRU bounded by the total size of the stored bodies."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, content_type, body):
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = (content_type, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_body) = self._entries.popitem(last=False)
+                self._bytes -= len(old_body)
+                evicted += 1
+        return evicted
+
+    def invalidate(self, document_id):
+        prefix = f"{document_id}:"
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                self._bytes -= len(self._entries.pop(key)[1])
+        return len(keys)
+
+
+class RedisResponseCache:
+    """
+    Entries are plain Redis strings; a sorted set orders them by last use, a
+    hash records their sizes and a set per document lists its keys.
+    """
+
+    prefix = "pdf_editor:response-cache"
+
+    def __init__(self, url, max_bytes):
+        if redis is None:
+            raise ImproperlyConfigured("PDF_RESPONSE_CACHE_BACKEND = 'redis' requires the redis package")
+        self.max_bytes = max_bytes
+        self._client = redis.Redis.from_url(url)
+        self._lru = f"{self.prefix}:lru"
+        self._sizes = f"{self.prefix}:sizes"
+        self._total = f"{self.prefix}:bytes"
+
+    def _entry(self, key):
+        return f"{self.prefix}:entry:{key}"
+
+    def _document(self, document_id):
+        return f"{self.prefix}:document:{document_id}"
+
+    def get(self, key):
+        value = self._client.get(self._entry(key))
+        if value is None:
+            return None
+        self._client.zadd(self._lru, {key: time.time()})
+        content_type, _, body = value.partition(b"\n")
+        return content_type.decode(), body
+
+    def put(self, key, content_type, body):
+        pipeline = self._client.pipeline()
+        pipeline.set(self._entry(key), content_type.encode() + b"\n" + body)
+        pipeline.zadd(self._lru, {key: time.time()})
+        pipeline.hget(self._sizes, key)
+        pipeline.hset(self._sizes, key, len(body))
+        pipeline.sadd(self._document(key.split(":", 1)[0]), key)
+        previous = pipeline.execute()[2]
+        total = self._client.incrby(self._total, len(body) - int(previous or 0))
+        evicted = 0
+        while total > self.max_bytes:
+            oldest = self._client.zrange(self._lru, 0, 15)
+            if len(oldest) <= 1:
+                break
+            for old_key in oldest[:-1]:
+                total = self._remove(old_key.decode())
+                evicted += 1
+                if total <= self.max_bytes:
+                    break
+        return evicted
+
+    def _remove(self, key):
+        pipeline = self._client.pipeline()
+        pipeline.hget(self._sizes, key)
+        pipeline.delete(self._entry(key))
+        pipeline.zrem(self._lru, key)
+        pipeline.hdel(self._sizes, key)
+        pipeline.srem(self._document(key.split(":", 1)[0]), key)
+        size = pipeline.execute()[0]
+        return self._client.decrby(self._total, int(size or 0))
+
+    def invalidate(self, document_id):
+        keys = [key.decode() for key in self._client.smembers(self._document(document_id))]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                max_bytes = settings.PDF_RESPONSE_CACHE_MAX_BYTES
+                if settings.PDF_RESPONSE_CACHE_BACKEND == "memory":
+                    _backend = InMemoryResponseCache(max_bytes)
+                elif settings.PDF_RESPONSE_CACHE_BACKEND == "redis" and redis is None:
+                    logger.warning("PDF_RESPONSE_CACHE_BACKEND is 'redis' but the redis package is not installed; "
+                                   "caching responses per process")
+                    _backend = InMemoryResponseCache(max_bytes)
+                elif settings.PDF_RESPONSE_CACHE_BACKEND == "redis":
+                    _backend = RedisResponseCache(settings.PDF_RESPONSE_CACHE_REDIS_URL, max_bytes)
+                else:
+                    raise ImproperlyConfigured(
+                        f"Unknown PDF_RESPONSE_CACHE_BACKEND {settings.PDF_RESPONSE_CACHE_BACKEND!r}"
+                    )
+    return _backend
+
+
+def get(key):
+    """``(content_type, body)`` of a cached response, or None. Never raises."""
+    try:
+        entry = get_backend().get(key)
+    except Exception as e:
+        logger.warning("Could not read response cache: %s", e)
+        return None
+    metrics.inc("pdf_response_cache_total", result="hit" if entry is not None else "miss")
+    return entry
+
+
+def put(key, content_type, body):
+    if len(body) > settings.PDF_RESPONSE_CACHE_MAX_ENTRY_BYTES:
+        return
+    try:
+        evicted = get_backend().put(key, content_type, body)
+    except Exception as e:
+        logger.warning("Could not write response cache: %s", e)
+        return
+    metrics.inc("pdf_response_cache_total", result="store")
+    if evicted:
+        metrics.inc("pdf_response_cache_total", evicted, result="eviction")
+
+
+def invalidate(document_id):
+    """Drop every cached response of a document. Never fails the task that calls it."""
+    if not settings.PDF_RESPONSE_CACHE_ENABLED:
+        return
+    try:
+        removed = get_backend().invalidate(document_id)
+    except Exception as e:
+        logger.warning("Could not invalidate cached responses of document %s: %s", document_id, e)
+        return
+    if removed:
+        metrics.inc("pdf_response_cache_total", removed, result="invalidation")
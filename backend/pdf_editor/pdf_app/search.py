@@ -0,0 +1,118 @@
+"""
+Full-text search over extracted lines (PDFTextLine).
+
+Each database gets its own index, created in migration 0011:
+
+- SQLite: an external-content FTS5 table kept in sync by triggers, ranked with bm25.
+- PostgreSQL: a generated ``tsvector`` column with a GIN index, ranked with ts_rank.
+- Anything else (or SQLite built without FTS5): a case-insensitive LIKE scan.
+
+The rows themselves are written by PDFPageManager whenever pages are
+(re-)analyzed, so re-analyzing a page only re-indexes that page.
+"""
+
+import re
+
+from django.db import connection
+
+from .models import PDFTextLine
+
+_fts5_available = None
+
+
+class InvalidSearchQuery(ValueError):
+    """Raised when ?q= has no searchable terms."""
+
+
+def terms(query):
+    """The words of a user query; punctuation is ignored like the indexes' tokenizers do."""
+    return re.findall(r"\w+", query or "")
+
+
+def _fts5_match(words):
+    # Quote every word so FTS5 operators in user input are searched literally;
+    # the last word also matches as a prefix for search-as-you-type.
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _has_fts5():
+    global _fts5_available
+    if _fts5_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pdf_app_pdftextline_fts'")
+            _fts5_available = cursor.fetchone() is not None
+    return _fts5_available
+
+
+def _hit(row):
+    line_id, document_id, title, page_number, x0, y0, x1, y1, text = row
+    return {
+        "document_id": document_id,
+        "title": title,
+        "page": page_number,
+        "bbox": [x0, y0, x1, y1],
+        "text": text,
+    }
+
+
+_COLUMNS = """
+    l.id, l.document_id, d.title, l.page_number, l.x0, l.y0, l.x1, l.y1, l.text
+"""
+
+
+def _like_search(words, document_id, limit):
+    lines = PDFTextLine.objects.select_related("document")
+    for word in words:
+        lines = lines.filter(text__icontains=word)
+    if document_id is not None:
+        lines = lines.filter(document_id=document_id).order_by("page_number", "y0", "x0")
+    return [
+        _hit((line.id, line.document_id, line.document.title, line.page_number,
+              line.x0, line.y0, line.x1, line.y1, line.text))
+        for line in lines[:limit]
+    ]
+
+
+def search(query, document_id=None, limit=50):
+    """
+    Lines matching every word of ``query`` (the last one as a prefix), best
+    match first across all documents, or in page order within one document.
+    """
+    words = terms(query)
+    if not words:
+        raise InvalidSearchQuery("Search query has no words")
+    in_document = document_id is not None
+    document_filter = "AND l.document_id = %s" if in_document else ""
+    page_order = "l.page_number, l.y0, l.x0"
+
+    if connection.vendor == "sqlite" and _has_fts5():
+        match = _fts5_match(words)
+        sql = f"""
+            SELECT {_COLUMNS}
+            FROM pdf_app_pdftextline_fts
+            JOIN pdf_app_pdftextline l ON l.id = pdf_app_pdftextline_fts.rowid
+            JOIN pdf_app_pdfdocument d ON d.id = l.document_id
+            WHERE pdf_app_pdftextline_fts MATCH %s {document_filter}
+            ORDER BY {page_order if in_document else "bm25(pdf_app_pdftextline_fts)"}
+            LIMIT %s
+        """
+        params = [match, document_id, limit] if in_document else [match, limit]
+    elif connection.vendor == "postgresql":
+        tsquery = " & ".join(words) + ":*"
+        sql = f"""
+            SELECT {_COLUMNS}
+            FROM pdf_app_pdftextline l
+            JOIN pdf_app_pdfdocument d ON d.id = l.document_id
+            WHERE l.search_vector @@ to_tsquery('simple', %s) {document_filter}
+            ORDER BY {page_order if in_document else "ts_rank(l.search_vector, to_tsquery('simple', %s)) DESC"}
+            LIMIT %s
+        """
+        params = [tsquery, document_id, limit] if in_document else [tsquery, tsquery, limit]
+    else:
+        return _like_search(words, document_id, limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [_hit(row) for row in cursor.fetchall()]
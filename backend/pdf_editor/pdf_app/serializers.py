@@ -1,5 +1,8 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import PDFDocument
+from django.conf import settings
+from .models import PDFDocument, UploadSession
+from . import uploads
 
 
 class PDFDocumentSerializer(serializers.ModelSerializer):
@@ -7,6 +10,8 @@ class PDFDocumentSerializer(serializers.ModelSerializer):
 
     file_url = serializers.SerializerMethodField()
     filename = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = PDFDocument
@@ -16,10 +21,38 @@ class PDFDocumentSerializer(serializers.ModelSerializer):
             "file",
             "file_url",
             "filename",
+            "content_hash",
+            "analysis_status",
+            "pages_done",
+            "pages_total",
+            "analysis_error",
+            "thumbnail_url",
+            "preview_urls",
             "uploaded_at",
             "updated_at",
         ]
-        read_only_fields = ["id", "uploaded_at", "updated_at"]
+        read_only_fields = [
+            "id",
+            "content_hash",
+            "analysis_status",
+            "pages_done",
+            "pages_total",
+            "analysis_error",
+            "uploaded_at",
+            "updated_at",
+        ]
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # The annotation counters only move through annotations.py; saving the
+        # values loaded with the instance would roll back a reset or an
+        # operation logged since
+        instance.save(update_fields=[
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in ("annotation_seq", "annotation_compacted_seq")
+        ])
+        return instance
 
     def get_file_url(self, obj):
         if obj.file:
@@ -28,3 +61,54 @@ class PDFDocumentSerializer(serializers.ModelSerializer):
 
     def get_filename(self, obj):
         return obj.filename()
+
+    def _thumbnail_url(self, obj, page_number):
+        # The edit version changes whenever the thumbnails are re-rendered after an edit
+        url = f"{default_storage.url(obj.thumbnail_name(page_number))}?v={obj.edit_version}"
+        return self.context["request"].build_absolute_uri(url)
+
+    def get_thumbnail_url(self, obj):
+        if obj.thumbnail_pages:
+            return self._thumbnail_url(obj, 1)
+        return None
+
+    def get_preview_urls(self, obj):
+        return [self._thumbnail_url(obj, number) for number in range(1, obj.thumbnail_pages + 1)]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for resumable chunked UploadSessions"""
+
+    filename = serializers.CharField(write_only=True, max_length=255)
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "title",
+            "filename",
+            "total_size",
+            "received_bytes",
+            "chunk_size",
+            "status",
+            "document",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["id", "received_bytes", "status", "document", "created_at", "updated_at"]
+
+    def get_chunk_size(self, obj):
+        return settings.PDF_UPLOAD_CHUNK_SIZE
+
+    def validate_total_size(self, value):
+        if not 0 < value <= settings.PDF_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f"Uploads must be between 1 and {settings.PDF_UPLOAD_MAX_BYTES} bytes")
+        return value
+
+    def create(self, validated_data):
+        return uploads.create_session(
+            validated_data["title"],
+            validated_data["filename"],
+            validated_data["total_size"],
+        )
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import shutil
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db.models import F
+
+from .models import PDFDocument, PDFPage
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """
+    Computes the SHA-256 of every uploaded file while Django streams it to
+    memory/disk. It sits first in FILE_UPLOAD_HANDLERS and passes each chunk
+    through unchanged; the digests end up in ``request.upload_sha256``.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, "upload_sha256"):
+            self.request.upload_sha256 = {}
+        self.request.upload_sha256[self.field_name] = self.sha256.hexdigest()
+        return None
+
+
+def file_sha256(file):
+    """Hash a File/UploadedFile in chunks without reading it into memory at once."""
+    sha256 = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+def uploaded_sha256(request, field_name, file):
+    """SHA-256 recorded by HashingUploadHandler, falling back to hashing the file."""
+    content_hash = getattr(request, "upload_sha256", {}).get(field_name)
+    return content_hash or file_sha256(file)
+
+
+def find_duplicate(content_hash):
+    """
+    An existing document with the same content whose file is still stored,
+    preferring unedited ones with a finished analysis that can be reused.
+    """
+    candidates = PDFDocument.objects.filter(content_hash=content_hash).defer("analysis_result")
+    reusable = candidates.filter(analysis_status='SUCCESS', edited_file="")
+    for pdf_doc in (reusable.first(), candidates.first()):
+        if pdf_doc and default_storage.exists(pdf_doc.file.name):
+            return pdf_doc
+    return None
+
+
+def reuse_analysis(source, target):
+    """Copy a finished analysis from ``source`` onto ``target`` instead of re-running PyMuPDF."""
+    PDFPage.objects.copy_pages(source.id, target.id)
+    target.analysis_result = {
+        **source.analysis_result,
+        "id": str(target.id),
+        "title": target.title,
+    }
+    target.analysis_status = 'SUCCESS'
+    target.pages_done = source.pages_done
+    target.pages_total = source.pages_total
+    target.analysis_version = F("analysis_version") + 1
+    target.thumbnail_pages = copy_thumbnails(source, target)
+    target.save(update_fields=[
+        "analysis_result", "analysis_status", "pages_done", "pages_total",
+        "analysis_version", "thumbnail_pages", "updated_at",
+    ])
+    target.refresh_from_db(fields=["analysis_version"])
+
+
+def release_file(name):
+    """
+    Delete a stored PDF once no document references it any more. Deduplicated
+    uploads share one file, so the row count is the file's reference count.
+    """
+    if name and not PDFDocument.objects.filter(file=name).exists():
+        default_storage.delete(name)
+        return True
+    return False
+
+
+def discard_analysis(pdf_doc):
+    """
+    Drop everything derived from a document's file (pages, search lines,
+    working copy, thumbnails) and reset its analysis fields, before the file
+    is replaced. The caller saves the document.
+    """
+    PDFPage.objects.trim_pages(pdf_doc.id, 0)
+    if pdf_doc.edited_file:
+        # The edited copy always belongs to this document alone
+        pdf_doc.edited_file.delete(save=False)
+    delete_thumbnails(pdf_doc)
+    pdf_doc.analysis_result = None
+    pdf_doc.analysis_status = 'PENDING'
+    pdf_doc.analysis_error = ""
+    pdf_doc.pages_done = 0
+    pdf_doc.pages_total = 0
+    pdf_doc.thumbnail_pages = 0
+    pdf_doc.edit_version = F("edit_version") + 1
+    pdf_doc.analysis_version = F("analysis_version") + 1
+
+
+def copy_thumbnails(source, target):
+    """Copy the (few KB) thumbnails of an unedited document onto a duplicate; returns the page count."""
+    if not source.thumbnail_pages:
+        return 0
+    source_dir = default_storage.path(source.thumbnail_dir())
+    if not os.path.isdir(source_dir):
+        return 0
+    shutil.copytree(source_dir, default_storage.path(target.thumbnail_dir()), dirs_exist_ok=True)
+    return source.thumbnail_pages
+
+
+def delete_thumbnails(pdf_doc):
+    shutil.rmtree(default_storage.path(pdf_doc.thumbnail_dir()), ignore_errors=True)
@@ -0,0 +1,101 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def dumps(data):
+    return json.dumps(data, separators=(",", ":"))
+
+
+def wants_stream(request):
+    """Return ``"ndjson"``, ``"json"`` or ``None`` for the requested streaming mode."""
+    mode = request.query_params.get("stream")
+    if mode in ("ndjson", "json"):
+        return mode
+    if NDJSON_CONTENT_TYPE in request.META.get("HTTP_ACCEPT", ""):
+        return "ndjson"
+    return None
+
+
+def is_asgi(request):
+    """Whether a (DRF or Django) request is being served by the ASGI handler."""
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def iter_ndjson(header, pages, encode_page):
+    """Header object on the first line, then one page object per line."""
+    yield dumps(header) + "\n"
+    for page in pages:
+        yield dumps(encode_page(page)) + "\n"
+
+
+def iter_json(header, pages, encode_page):
+    """The regular extract-text document, emitted one page at a time."""
+    head = dumps({**header, "pages": []})
+    # Open the (empty) pages array and fill it in as rows come off the cursor
+    yield head[:-len("[]}")] + "["
+    separator = ""
+    for page in pages:
+        yield separator + dumps(encode_page(page))
+        separator = ","
+    yield "]}"
+
+
+async def aiter_chunks(pages, chunk_size):
+    """
+    Lists of up to ``chunk_size`` rows of a queryset ordered by page_number,
+    each fetched in a worker thread with a keyset query (page_number > last).
+    """
+    last = 0
+    while True:
+        chunk = await sync_to_async(list)(pages.filter(page_number__gt=last)[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1].page_number
+
+
+async def aiter_ndjson(header, chunks, encode_page):
+    """Async :func:`iter_ndjson`, one write per chunk of pages."""
+    yield dumps(header) + "\n"
+    async for chunk in chunks:
+        yield "".join(dumps(encode_page(page)) + "\n" for page in chunk)
+
+
+async def aiter_json(header, chunks, encode_page):
+    """Async :func:`iter_json`, one write per chunk of pages."""
+    head = dumps({**header, "pages": []})
+    yield head[:-len("[]}")] + "["
+    separator = ""
+    async for chunk in chunks:
+        yield separator + ",".join(dumps(encode_page(page)) for page in chunk)
+        separator = ","
+    yield "]}"
+
+
+def stream_pages_response(request, mode, header, pages, encode_page):
+    """
+    Build a StreamingHttpResponse over a PDFPage queryset ordered by
+    page_number, holding only one chunk of pages in memory at a time.
+
+    Django buffers a sync iterator in full under ASGI (and an async one
+    under WSGI), so the body is an async iterator for ASGI requests and a
+    server-side ``iterator()`` cursor otherwise.
+    """
+    chunk_size = settings.PDF_STREAM_CHUNK_PAGES
+    if is_asgi(request):
+        rows = aiter_chunks(pages, chunk_size)
+        body = (aiter_ndjson if mode == "ndjson" else aiter_json)(header, rows, encode_page)
+    else:
+        rows = pages.iterator(chunk_size=chunk_size)
+        body = (iter_ndjson if mode == "ndjson" else iter_json)(header, rows, encode_page)
+    content_type = NDJSON_CONTENT_TYPE if mode == "ndjson" else "application/json"
+    response = StreamingHttpResponse(body, content_type=content_type)
+    response["X-Accel-Buffering"] = "no"
+    return response
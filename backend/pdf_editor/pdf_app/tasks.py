@@ -1,59 +1,529 @@
-from celery import shared_task
-from .models import PDFDocument
+from celery import shared_task, chord
+from celery.result import allow_join_result
+from celery.signals import before_task_publish, worker_process_init, task_prerun, task_postrun, task_success, task_failure
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import InterfaceError, OperationalError, transaction
+from django.db.models import F
+from .models import PDFDocument, PDFPage, pdf_upload_path
+from . import analysis
+from . import editing
+from . import rendering
+from . import render_cache
+from . import doc_cache
+from . import events
+from . import metrics
+from . import uploads
+from . import page_ops
+from . import response_cache
+from . import annotations
+from . import storage
 import fitz
+import logging
+import os
 import time
-from rest_framework.response import Response
-from . import errors
-@shared_task
-def analyze_pdf_task(doc_id):
+
+logger = logging.getLogger(__name__)
+
+
+@worker_process_init.connect
+def _reset_document_cache(**kwargs):
+    # Never share MuPDF handles inherited from the parent across forked workers
+    doc_cache.reset()
+
+
+@task_prerun.connect
+def _publish_started(task_id=None, **kwargs):
+    events.publish(task_id, "STARTED")
+
+
+# Stamped on every message so the worker can tell how long it sat in the queue
+PUBLISHED_AT_HEADER = "pdf_published_at"
+_task_started_at = {}
+
+
+@before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def _start_task_timer(task_id=None, task=None, **kwargs):
+    published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+    if published_at:
+        metrics.observe("pdf_task_queue_wait_seconds", max(0.0, time.time() - published_at), task=task.name)
+    _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _stop_task_timer(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started_at.pop(task_id, None)
+    if started is not None:
+        metrics.observe("pdf_task_run_seconds", time.perf_counter() - started, task=task.name, state=state or "UNKNOWN")
+    # Workers have no request cycle; ship their samples after every task
+    metrics.flush()
+
+
+@task_success.connect
+def _publish_success(sender=None, result=None, **kwargs):
+    events.publish(sender.request.id, "SUCCESS", result)
+
+
+@task_failure.connect
+def _publish_failure(task_id=None, exception=None, **kwargs):
+    events.publish(task_id, "FAILURE", exception)
+
+
+def _report_progress(task, meta):
+    """Record PROGRESS in the result backend and push it to /events/ subscribers."""
+    task.update_state(state="PROGRESS", meta=meta)
+    events.publish(task.request.id, "PROGRESS", meta)
+
+
+# Errors worth retrying: the database or the file store being briefly unavailable.
+# Anything else (a corrupt PDF, a bug) fails the analysis straight away.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, ConnectionError, TimeoutError)
+
+
+def _start_analysis(pdf_doc, page_count):
+    pdf_doc.analysis_status = 'PROCESSING'
+    pdf_doc.pages_done = 0
+    pdf_doc.pages_total = page_count
+    pdf_doc.analysis_error = ""
+    pdf_doc.save(update_fields=["analysis_status", "pages_done", "pages_total", "analysis_error", "updated_at"])
+
+
+def _record_pages_done(task_id, doc_id, pages):
+    """Add a finished batch to the document's pages_done and push the new count to subscribers."""
+    PDFDocument.objects.filter(id=doc_id).update(pages_done=F("pages_done") + pages)
+    pages_done, pages_total = PDFDocument.objects.filter(id=doc_id).values_list("pages_done", "pages_total").first() or (0, 0)
+    events.publish(task_id, "PROGRESS", {
+        "document_id": doc_id,
+        "stage": "analyzing",
+        "pages_done": pages_done,
+        "pages_total": pages_total,
+    })
+
+
+def _retry_or_fail(task, doc_id, exc):
+    """
+    Retry transient errors with exponential backoff (raises Retry). Otherwise,
+    or once the retries are used up, record the analysis as FAILURE; the
+    caller re-raises so Celery reports the failure too.
+    """
+    retries = task.request.retries
+    if isinstance(exc, TRANSIENT_ERRORS) and retries < settings.PDF_ANALYSIS_MAX_RETRIES:
+        countdown = min(settings.PDF_ANALYSIS_RETRY_BACKOFF * 2 ** retries, settings.PDF_ANALYSIS_RETRY_BACKOFF_MAX)
+        logger.warning("Retrying analysis of document %s in %ss: %r", doc_id, countdown, exc)
+        raise task.retry(exc=exc, countdown=countdown, max_retries=settings.PDF_ANALYSIS_MAX_RETRIES)
+    PDFDocument.objects.filter(id=doc_id).update(
+        analysis_status='FAILURE',
+        analysis_error=f"{type(exc).__name__}: {exc}",
+    )
+
+
+def _save_analysis(pdf_doc, page_count):
+    # Page blocks live in PDFPage rows; the document keeps only the header.
+    pdf_doc.analysis_result = {
+        "id": str(pdf_doc.id),
+        "title": pdf_doc.title,
+        "totalPages": page_count,
+    }
+    pdf_doc.analysis_status = 'SUCCESS'
+    pdf_doc.pages_done = page_count
+    pdf_doc.pages_total = page_count
+    pdf_doc.analysis_error = ""
+    pdf_doc.analysis_version = F("analysis_version") + 1
+    # Only the analysis fields: a full save would roll back the annotation
+    # counters appended to (or assembled) since pdf_doc was loaded
+    pdf_doc.save(update_fields=[
+        "analysis_result", "analysis_status", "pages_done", "pages_total", "analysis_error",
+        "analysis_version", "updated_at",
+    ])
+    response_cache.invalidate(pdf_doc.id)
+
+
+@shared_task(bind=True)
+def analyze_pdf_task(self, doc_id):
+    """
+    Extract every page into PDFPage rows. The document moves PENDING ->
+    PROCESSING -> SUCCESS/FAILURE and counts pages_done as batches of
+    PDF_ANALYSIS_PROGRESS_BATCH pages (or whole page ranges) are stored.
+    """
+    logger.debug("analyze_pdf_task started for document %s", doc_id)
     try:
-        print("inside analyze_pdf_task")
         pdf_doc = PDFDocument.objects.get(id=doc_id)
-        doc=fitz.open(pdf_doc.file.path)
-        analysis_data =[]
-        for page_num, page in enumerate(doc):
-            page_data = page.get_text("dict")
-            page_blocks = []
-            for block in page_data.get("blocks", []):
-            # We only want to process text blocks (type 0)
-                if block['type'] == 0:
-                    block_lines = []
-                    # Iterate through the lines within the current block
-                    for line in block.get("lines", []):
-                        line_spans = []
-                        # A line is made of one or more spans with consistent styling
-                        for span in line.get("spans", []):
-                            # Append the detailed span information
-                            line_spans.append({
-                                "text": span['text'],
-                                "font": span['font'],
-                                "size": round(span['size'], 2),
-                                "color": span['color'],
-                                "bbox": [round(c, 2) for c in span['bbox']]
-                            })
-                        
-                        if line_spans:
-                            block_lines.append({
-                                "spans": line_spans,
-                                "bbox": [round(c, 2) for c in line['bbox']]
-                            })
-                    
-                    if block_lines:
-                        page_blocks.append({
-                            "lines": block_lines,
-                            "bbox": [round(c, 2) for c in block['bbox']]
-                        })
-
-            analysis_data.append({"page": page_num + 1, "blocks": page_blocks})
-        pdf_doc.analysis_result = {
-            "id": str(pdf_doc.id), 
-            "title": pdf_doc.title, 
-            "pages": analysis_data
-        }
-        pdf_doc.analysis_status = 'SUCCESS'
-        pdf_doc.save()
-        return f"Analysis complete for document {doc_id}"
     except PDFDocument.DoesNotExist:
         return f"Error with document id {doc_id}"
+    try:
+        with doc_cache.open_document(pdf_doc.current_file_path()) as doc:
+            page_count = len(doc)
+            _start_analysis(pdf_doc, page_count)
+            chunk_size = settings.PDF_ANALYSIS_CHUNK_SIZE
+            parallel = settings.PDF_ANALYSIS_PARALLEL and page_count > chunk_size
+            if not parallel:
+                for start, end in analysis.page_ranges(page_count, settings.PDF_ANALYSIS_PROGRESS_BATCH):
+                    PDFPage.objects.replace_pages(doc_id, analysis.extract_pages(doc, start, end))
+                    _record_pages_done(self.request.id, doc_id, end - start)
+        if not parallel:
+            PDFPage.objects.trim_pages(doc_id, page_count)
+            _save_analysis(pdf_doc, page_count)
+            generate_thumbnails_task.delay(doc_id)
+            return f"Analysis complete for document {doc_id}"
+    except Exception as e:
+        _retry_or_fail(self, doc_id, e)
+        raise
+
+    # Large document: fan the page ranges out to the worker pool and let
+    # finish_page_ranges_task mark the document analyzed once every range is stored.
+    header = [
+        analyze_page_range_task.s(doc_id, start, end)
+        for start, end in analysis.page_ranges(page_count, chunk_size)
+    ]
+    logger.info("Analyzing document %s: %s pages split into %s chunks", doc_id, page_count, len(header))
+    # replace() keeps this task id pointing at the merged result. In eager mode
+    # (tests, CELERY_TASK_ALWAYS_EAGER) it joins the chord inline.
+    with allow_join_result():
+        return self.replace(chord(header, finish_page_ranges_task.s(doc_id)))
+
+
+@shared_task(bind=True)
+def analyze_page_range_task(self, doc_id, start, end):
+    """Extract the half-open page range ``[start, end)`` of one document into PDFPage rows."""
+    try:
+        pdf_doc = PDFDocument.objects.get(id=doc_id)
+        # Range tasks of one document landing on the same worker share the open document
+        with doc_cache.open_document(pdf_doc.current_file_path()) as doc:
+            pages = analysis.extract_pages(doc, start, end)
+        stored = PDFPage.objects.replace_pages(doc_id, pages)
+    except Exception as e:
+        _retry_or_fail(self, doc_id, e)
+        raise
+    # The chord runs under the id of the analyze_pdf_task it replaced
+    _record_pages_done(self.request.root_id, doc_id, stored)
+    return stored
+
+
+@shared_task(bind=True)
+def finish_page_ranges_task(self, results, doc_id):
+    """Chord callback: every range has written its pages, record the document as analyzed."""
+    try:
+        pdf_doc = PDFDocument.objects.get(id=doc_id)
+    except PDFDocument.DoesNotExist:
+        return f"Error with document id {doc_id}"
+    try:
+        page_count = sum(results)
+        PDFPage.objects.trim_pages(doc_id, page_count)
+        _save_analysis(pdf_doc, page_count)
     except Exception as e:
-        return str(e)
\ No newline at end of file
+        _retry_or_fail(self, doc_id, e)
+        raise
+    generate_thumbnails_task.delay(doc_id)
+    return f"Analysis complete for document {doc_id}"
+
+
+@shared_task(bind=True)
+def reanalyze_pages_task(self, doc_id, page_numbers):
+    """
+    Re-extract only the given 1-based pages of the current (edited) file and
+    patch their PDFPage rows, leaving the rest of the analysis untouched.
+    Deferred while a full analysis of the document is pending or running.
+    """
+    pdf_doc = PDFDocument.objects.get(id=doc_id)
+    if pdf_doc.analysis_status in ('PENDING', 'PROCESSING'):
+        # Its page ranges may have read the file before this edit and would
+        # overwrite these pages; patch them once it has stored everything
+        raise self.retry(
+            countdown=settings.PDF_REANALYSIS_DEFER_SECONDS,
+            max_retries=settings.PDF_REANALYSIS_MAX_DEFERS,
+        )
+    with doc_cache.open_document(pdf_doc.current_file_path()) as doc:
+        page_count = len(doc)
+        pages = analysis.extract_page_numbers(doc, page_numbers)
+    PDFPage.objects.replace_pages(doc_id, pages)
+    result = pdf_doc.analysis_result or {}
+    if result.get("totalPages") != page_count:
+        PDFPage.objects.trim_pages(doc_id, page_count)
+        result["totalPages"] = page_count
+    PDFDocument.objects.filter(id=doc_id).update(
+        analysis_result=result,
+        analysis_version=F("analysis_version") + 1,
+    )
+    response_cache.invalidate(doc_id)
+    if any(page["page"] <= settings.PDF_THUMBNAIL_PAGES for page in pages):
+        generate_thumbnails_task.delay(doc_id)
+    return {"document_id": doc_id, "pages": [page["page"] for page in pages]}
+
+
+def _edit_working_copy(task, doc_id, edits, new_texts, stage="editing"):
+    """
+    Apply edits to the document's working copy (created on first edit), save
+    it, bump edit_version and queue re-analysis of the changed pages.
+    """
+    pdf_doc = PDFDocument.objects.get(id=doc_id)
+
+    def report(pages_done, pages_total, stage=stage):
+        _report_progress(task, {
+            "document_id": doc_id,
+            "stage": stage,
+            "pages_done": pages_done,
+            "pages_total": pages_total,
+        })
+
+    edited_name = pdf_doc.edited_file_name()
+    working_path = default_storage.path(edited_name)
+    editing.prepare_working_copy(pdf_doc.file.path, working_path)
+    # Edited and saved in place, so never shared through doc_cache
+    with metrics.timer("pdf_fitz_open_seconds", caller="edit"):
+        doc = fitz.open(working_path)
+    try:
+        # Must be checked before redacting, which always clears MuPDF's flag
+        incremental = settings.PDF_INCREMENTAL_SAVES and doc.can_save_incrementally()
+        summary = editing.apply_edits(doc, edits, new_texts, progress=report)
+        report(len(summary["pages"]), len(summary["pages"]), stage="saving")
+        save_stats = editing.save_working_copy(
+            doc, working_path, incremental=incremental, redacted=bool(summary["redactions"]),
+        )
+    finally:
+        doc.close()
+
+    pdf_doc.edited_file.name = edited_name
+    pdf_doc.edit_version = F("edit_version") + 1
+    pdf_doc.save(update_fields=["edited_file", "edit_version", "updated_at"])
+    pdf_doc.refresh_from_db(fields=["edit_version"])
+    response_cache.invalidate(doc_id)
+    changed_pages = summary["changed_pages"]
+    reanalysis = reanalyze_pages_task.delay(doc_id, changed_pages) if changed_pages else None
+    return {
+        "document_id": doc_id,
+        "edited_file": edited_name,
+        "edit_version": pdf_doc.edit_version,
+        **summary,
+        "save": save_stats,
+        "reanalysis_task_id": reanalysis.id if reanalysis else None,
+    }
+
+
+@shared_task(bind=True)
+def update_text_task(self, doc_id, edits, new_texts):
+    """
+    Apply update-text edits to the document's working copy in the background,
+    reporting PROGRESS (pages_done / pages_total) as each page is finished.
+    """
+    return _edit_working_copy(self, doc_id, edits, new_texts)
+
+
+@shared_task(bind=True)
+def bulk_replace_task(self, doc_id, replacements, first_page=None, last_page=None):
+    """
+    Replace every occurrence of each ``oldText`` with its ``newText`` on the
+    given 1-based page range (the whole document by default). Matches come
+    from the stored PDFPage spans, so the PDF is only opened to edit the
+    pages that actually contain one.
+    """
+    started = time.perf_counter()
+    pages = PDFPage.objects.filter(document_id=doc_id)
+    if first_page:
+        pages = pages.filter(page_number__gte=first_page)
+    if last_page:
+        pages = pages.filter(page_number__lte=last_page)
+    rows = pages.order_by("page_number").values_list("page_number", "blocks").iterator(chunk_size=100)
+    edits, counts = editing.locate_replacements(rows, replacements)
+    locate_ms = round((time.perf_counter() - started) * 1000, 2)
+    _report_progress(self, {"document_id": doc_id, "stage": "located", "matches": len(edits), "pages_total": len(counts)})
+
+    result = _edit_working_copy(self, doc_id, edits, [], stage="replacing") if edits else {"document_id": doc_id, "pages": []}
+    for page_stats in result["pages"]:
+        page_stats["matches"] = counts.get(page_stats["page"], {})
+    return {
+        **result,
+        "matches": len(edits),
+        "locate_ms": locate_ms,
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def _analyze_missing(doc_id, path, page_numbers):
+    """Extract the pages assemble_pages had no analyzed row to copy for."""
+    if page_numbers:
+        with doc_cache.open_document(path) as doc:
+            PDFPage.objects.replace_pages(doc_id, analysis.extract_page_numbers(doc, page_numbers))
+
+
+def _create_from_pages(title, page_map, paths):
+    """Write ``page_map`` into a new stored PDF and create its document, analysis copied over."""
+    file_name = pdf_upload_path(None, "document.pdf")
+    path = default_storage.path(file_name)
+    inserts = page_ops.write_pages(page_map, paths, path)
+    with default_storage.open(file_name, "rb") as handle:
+        content_hash = storage.file_sha256(handle)
+    pdf_doc = PDFDocument.objects.create(title=title, file=file_name, content_hash=content_hash)
+    _start_analysis(pdf_doc, len(page_map))
+    with transaction.atomic():
+        missing = PDFPage.objects.assemble_pages(pdf_doc.id, page_map)
+        annotations.assemble(pdf_doc.id, page_map)
+    _analyze_missing(pdf_doc.id, path, missing)
+    _save_analysis(pdf_doc, len(page_map))
+    generate_thumbnails_task.delay(pdf_doc.id)
+    return {
+        "document_id": pdf_doc.id,
+        "title": title,
+        "pages": len(page_map),
+        "insert_calls": inserts,
+        "pages_reused": len(page_map) - len(missing),
+        "pages_extracted": len(missing),
+    }
+
+
+def _source_paths(doc_ids):
+    return {
+        pdf_doc.id: pdf_doc.current_file_path()
+        for pdf_doc in PDFDocument.objects.filter(id__in=set(doc_ids)).defer("analysis_result")
+    }
+
+
+def _build_documents(task, doc_ids, outputs):
+    """Create one document per ``(title, page_map)`` output, reporting progress after each."""
+    started = time.perf_counter()
+    paths = _source_paths(doc_ids)
+    documents = []
+    for done, (title, page_map) in enumerate(outputs, start=1):
+        documents.append(_create_from_pages(title, page_map, paths))
+        _report_progress(task, {"stage": "writing", "documents_done": done, "documents_total": len(outputs)})
+    return {"documents": documents, "ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+@shared_task(bind=True)
+def merge_documents_task(self, sources, title):
+    """Merge ``[document_id, pages]`` sources, in order, into one new document."""
+    page_map = [(doc_id, page) for doc_id, pages in sources for page in pages]
+    return _build_documents(self, [doc_id for doc_id, _ in sources], [(title, page_map)])
+
+
+@shared_task(bind=True)
+def split_document_task(self, doc_id, ranges):
+    """Split a document into one new document per inclusive ``[first, last]`` page range."""
+    title = PDFDocument.objects.values_list("title", flat=True).get(id=doc_id)
+    outputs = [
+        (f"{title} (pages {first}-{last})", [(doc_id, page) for page in range(first, last + 1)])
+        for first, last in ranges
+    ]
+    return _build_documents(self, [doc_id], outputs)
+
+
+@shared_task(bind=True)
+def extract_pages_task(self, doc_id, pages, title):
+    """Copy the given pages of a document, in the given order, into a new document."""
+    return _build_documents(self, [doc_id], [(title, [(doc_id, page) for page in pages])])
+
+
+@shared_task(bind=True)
+def reorder_pages_task(self, doc_id, order):
+    """
+    Rearrange (or drop) pages of a document's working copy in place with
+    ``select``; the page analysis is renumbered rather than re-extracted.
+    """
+    started = time.perf_counter()
+    pdf_doc = PDFDocument.objects.get(id=doc_id)
+    edited_name = pdf_doc.edited_file_name()
+    working_path = default_storage.path(edited_name)
+    editing.prepare_working_copy(pdf_doc.file.path, working_path)
+    with metrics.timer("pdf_fitz_open_seconds", caller="edit"):
+        doc = fitz.open(working_path)
+    try:
+        page_ops.reorder(doc, order)
+        # select() rewrites the page tree, always save in full
+        save_stats = editing.save_working_copy(doc, working_path, incremental=False)
+    finally:
+        doc.close()
+
+    page_map = [(doc_id, page) for page in order]
+    with transaction.atomic():
+        missing = PDFPage.objects.assemble_pages(doc_id, page_map)
+        # Annotations are keyed by page: move them with their pages
+        annotations.assemble(doc_id, page_map)
+    _analyze_missing(doc_id, working_path, missing)
+    result = pdf_doc.analysis_result or {}
+    result["totalPages"] = len(order)
+    PDFDocument.objects.filter(id=doc_id).update(
+        edited_file=edited_name,
+        edit_version=F("edit_version") + 1,
+        analysis_version=F("analysis_version") + 1,
+        analysis_result=result,
+        pages_done=len(order),
+        pages_total=len(order),
+    )
+    response_cache.invalidate(doc_id)
+    generate_thumbnails_task.delay(doc_id)
+    return {
+        "document_id": doc_id,
+        "pages": len(order),
+        "pages_reused": len(order) - len(missing),
+        "pages_extracted": len(missing),
+        "save": save_stats,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+@shared_task
+def compact_annotations_task(doc_id):
+    """Merge a document's annotation log into its per-page snapshots."""
+    merged = annotations.compact(doc_id)
+    return {"document_id": doc_id, "merged": merged}
+
+
+@shared_task
+def compact_pdf_task(doc_id):
+    """Fully rewrite (garbage-collect and deflate) a document's working copy on demand."""
+    pdf_doc = PDFDocument.objects.get(id=doc_id)
+    if not pdf_doc.edited_file:
+        return {"document_id": doc_id, "compacted": False}
+    stats = editing.compact_file(pdf_doc.edited_file.path)
+    PDFDocument.objects.filter(id=doc_id).update(edit_version=F("edit_version") + 1)
+    response_cache.invalidate(doc_id)
+    return {"document_id": doc_id, "compacted": True, **stats}
+
+
+@shared_task
+def render_page_task(doc_id, page_number, dpi, tile, image_type):
+    """Rasterize one page/tile of the current file into the render cache."""
+    pdf_doc = PDFDocument.objects.defer("analysis_result").get(id=doc_id)
+    tile = tuple(tile) if tile else None
+    key = render_cache.cache_key(pdf_doc, page_number, dpi, tile, image_type)
+    if render_cache.get(key, image_type) is None:
+        with doc_cache.open_document(pdf_doc.current_file_path()) as doc:
+            try:
+                data = rendering.render_page(doc, page_number, dpi, tile, settings.PDF_RENDER_TILE_SIZE, image_type)
+            except (IndexError, ValueError) as e:
+                # Page or tile outside the document: answer retries of the URL with the error
+                render_cache.reject(key, image_type, str(e))
+                raise
+        render_cache.put(key, image_type, data)
+    return {"document_id": doc_id, "page": page_number, "key": key}
+
+
+@shared_task
+def generate_thumbnails_task(doc_id):
+    """
+    Render small JPEG previews of the first PDF_THUMBNAIL_PAGES pages of the
+    current file next to the uploads, so document lists never open the PDF.
+    """
+    pdf_doc = PDFDocument.objects.defer("analysis_result").get(id=doc_id)
+    with doc_cache.open_document(pdf_doc.current_file_path()) as doc:
+        count = min(len(doc), settings.PDF_THUMBNAIL_PAGES)
+        for page_number in range(1, count + 1):
+            data = rendering.render_thumbnail(doc, page_number, settings.PDF_THUMBNAIL_WIDTH)
+            path = default_storage.path(pdf_doc.thumbnail_name(page_number))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as handle:
+                handle.write(data)
+            os.replace(path + ".tmp", path)
+    PDFDocument.objects.filter(id=doc_id).update(thumbnail_pages=count)
+    return {"document_id": doc_id, "thumbnail_pages": count}
+
+
+@shared_task
+def expire_upload_sessions_task():
+    """Drop unfinished chunked uploads idle for PDF_UPLOAD_SESSION_TTL; schedule it with celery beat."""
+    return {"expired": uploads.expire_sessions(settings.PDF_UPLOAD_SESSION_TTL)}
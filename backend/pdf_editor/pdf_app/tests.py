@@ -1,3 +1,1604 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import fitz
+from asgiref.sync import sync_to_async
+from celery.exceptions import Retry
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from benchmarks import corpus, suite
+from pdf_editor.celery import app as celery_app
+
+from . import analysis, compression, doc_cache, editing, encoding, events, metrics, render_cache, response_cache, search, tasks
+from .models import PDFDocument, PDFPage, UploadSession
+from .serializers import PDFDocumentSerializer
+
+
+def make_pdf(pages, text="Page {page}"):
+    """Bytes of a small PDF with one line of text per page."""
+    doc = fitz.open()
+    for page in range(1, pages + 1):
+        doc.new_page().insert_text((50, 72), text.format(page=page), fontsize=12)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def page_text(page):
+    """The text of an extract-text page, spans joined."""
+    return "".join(span["text"] for block in page["blocks"] for line in block["lines"] for span in line["spans"])
+
+
+class PDFAppTestCase(TestCase):
+    """
+    Runs Celery tasks eagerly and stores uploads in a temporary MEDIA_ROOT,
+    so the tests need neither Redis nor a worker.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            MEDIA_ROOT=cls.media_root,
+            PDF_RENDER_CACHE_DIR=os.path.join(cls.media_root, "render_cache"),
+            PDF_EVENTS_BACKEND="memory",
+            PDF_METRICS_BACKEND="memory",
+            PDF_RESPONSE_CACHE_BACKEND="memory",
+            PDF_PROFILE_DIR=os.path.join(cls.media_root, "profiles"),
+        )
+        cls.settings_override.enable()
+        # The app reads Django's CELERY_ settings; the prefixed keys take precedence
+        eager = {
+            "CELERY_TASK_ALWAYS_EAGER": True,
+            "CELERY_TASK_EAGER_PROPAGATES": True,
+            "CELERY_TASK_STORE_EAGER_RESULT": True,
+            # Eager tasks still acquire a producer
+            "CELERY_BROKER_URL": "memory://",
+            "CELERY_RESULT_BACKEND": "cache+memory://",
+        }
+        cls.celery_conf = {key: celery_app.conf.get(key) for key in eager}
+        celery_app.conf.update(eager)
+        cls._reset_backends()
+
+    @classmethod
+    def tearDownClass(cls):
+        celery_app.conf.update(cls.celery_conf)
+        cls._reset_backends()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @staticmethod
+    def _reset_backends():
+        # Backends are chosen from the settings once per process
+        if hasattr(celery_app._local, "backend"):
+            del celery_app._local.backend
+        doc_cache.reset()
+        events._backend = None
+        metrics._backend = None
+        response_cache._backend = None
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def upload(self, data, title="doc"):
+        response = self.client.post(
+            "/pdf-documents/",
+            {"title": title, "file": SimpleUploadedFile(f"{title}.pdf", data, "application/pdf")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def task_status(self, task_id):
+        return self.client.get(f"/pdf-documents/{task_id}/get_task_status/").data
+
+    def update_text(self, pk, payload):
+        """Queue update-text (run eagerly) and return the task's result."""
+        response = self.client.post(f"/pdf-documents/{pk}/update-text/", payload, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        status = self.task_status(response.data["task_id"])
+        self.assertEqual(status["status"], "SUCCESS", status)
+        return status["result"]
+
+
+class ChunkedAnalysisTests(PDFAppTestCase):
+    def test_page_ranges_cover_every_page_once(self):
+        self.assertEqual(analysis.page_ranges(7, 3), [(0, 3), (3, 6), (6, 7)])
+        self.assertEqual(analysis.page_ranges(3, 3), [(0, 3)])
+        self.assertEqual(analysis.page_ranges(0, 3), [])
+
+    def test_small_document_is_analyzed_in_one_task(self):
+        pk = self.upload(make_pdf(3))["document_id"]
+
+        result = self.client.get(f"/pdf-documents/{pk}/extract-text/").json()
+
+        self.assertEqual(result["totalPages"], 3)
+        self.assertEqual([page["page"] for page in result["pages"]], [1, 2, 3])
+
+    @override_settings(PDF_ANALYSIS_CHUNK_SIZE=2)
+    def test_large_document_ranges_are_merged_in_page_order(self):
+        with self.assertLogs("pdf_app.tasks", "INFO") as logs:
+            pk = self.upload(make_pdf(7))["document_id"]
+
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+        result = self.client.get(f"/pdf-documents/{pk}/extract-text/").json()
+
+        self.assertEqual(pdf_doc.analysis_status, "SUCCESS")
+        self.assertEqual(result["totalPages"], 7)
+        self.assertEqual([page["page"] for page in result["pages"]], list(range(1, 8)))
+        self.assertEqual([page_text(page) for page in result["pages"]], [f"Page {page}" for page in range(1, 8)])
+        self.assertIn(f"Analyzing document {pk}: 7 pages split into 4 chunks", logs.output[0])
+
+    @override_settings(PDF_ANALYSIS_CHUNK_SIZE=2, PDF_ANALYSIS_PARALLEL=False)
+    def test_parallel_analysis_can_be_turned_off(self):
+        pk = self.upload(make_pdf(5))["document_id"]
+
+        result = self.client.get(f"/pdf-documents/{pk}/extract-text/").json()
+
+        self.assertEqual([page["page"] for page in result["pages"]], list(range(1, 6)))
+
+
+class PageStorageTests(PDFAppTestCase):
+    def test_pages_are_stored_as_rows(self):
+        pk = self.upload(make_pdf(3))["document_id"]
+
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+
+        self.assertEqual(list(pdf_doc.pages.values_list("page_number", flat=True)), [1, 2, 3])
+        self.assertEqual(pdf_doc.analysis_result, {"id": str(pk), "title": "doc", "totalPages": 3})
+        self.assertEqual(page_text(pdf_doc.pages.get(page_number=2).as_dict()), "Page 2")
+
+    def test_replace_pages_overwrites_only_given_pages(self):
+        pk = self.upload(make_pdf(3))["document_id"]
+
+        PDFPage.objects.replace_pages(pk, [{"page": 2, "blocks": []}])
+
+        self.assertEqual(PDFPage.objects.filter(document_id=pk).count(), 3)
+        self.assertEqual(PDFPage.objects.get(document_id=pk, page_number=2).blocks, [])
+        self.assertEqual(page_text(PDFPage.objects.get(document_id=pk, page_number=3).as_dict()), "Page 3")
+
+    def test_deleting_document_deletes_its_pages(self):
+        pk = self.upload(make_pdf(2))["document_id"]
+
+        PDFDocument.objects.filter(pk=pk).delete()
+
+        self.assertFalse(PDFPage.objects.filter(document_id=pk).exists())
+
+
+class PageSelectionTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.upload(make_pdf(5))["document_id"]
+        self.url = f"/pdf-documents/{self.pk}/extract-text/"
+
+    def pages(self, response):
+        return [page["page"] for page in response.json()["pages"]]
+
+    def test_single_page_and_range(self):
+        self.assertEqual(self.pages(self.client.get(self.url, {"page": 2})), [2])
+        self.assertEqual(self.pages(self.client.get(self.url, {"pages": "2-4"})), [2, 3, 4])
+        self.assertEqual(self.pages(self.client.get(self.url, {"pages": "4-"})), [4, 5])
+        # The end of a range is clamped to the document
+        self.assertEqual(self.pages(self.client.get(self.url, {"pages": "3-99"})), [3, 4, 5])
+
+    def test_header_still_has_total_pages(self):
+        response = self.client.get(self.url, {"page": 2})
+
+        self.assertEqual(response.json()["totalPages"], 5)
+
+    def test_cursor_pagination_walks_the_document(self):
+        response = self.client.get(self.url, {"limit": 2})
+        seen = self.pages(response)
+        while response.json()["next"]:
+            response = self.client.get(response.json()["next"])
+            seen += self.pages(response)
+
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+
+    def test_cursor_pagination_inside_a_range(self):
+        first = self.client.get(self.url, {"pages": "2-4", "limit": 2})
+        second = self.client.get(first.json()["next"])
+
+        self.assertEqual(self.pages(first), [2, 3])
+        self.assertEqual(self.pages(second), [4])
+        self.assertIsNone(second.json()["next"])
+
+    def test_invalid_selection_is_rejected(self):
+        for params in ({"page": "x"}, {"page": "2-3"}, {"pages": "4-2"}, {"pages": "0-2"},
+                       {"limit": 0}, {"limit": "x"}, {"cursor": "not-a-cursor"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_selection_past_the_last_page_is_rejected(self):
+        for params in ({"page": 10}, {"pages": "10-20"}, {"pages": "6-"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+class StreamingTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.upload(make_pdf(4))["document_id"]
+        self.url = f"/pdf-documents/{self.pk}/extract-text/"
+
+    def test_ndjson_sends_header_then_one_page_per_line(self):
+        response = self.client.get(self.url, {"stream": "ndjson"})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        chunks = list(response.streaming_content)
+        lines = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual(lines[0]["totalPages"], 4)
+        self.assertNotIn("pages", lines[0])
+        self.assertEqual([line["page"] for line in lines[1:]], [1, 2, 3, 4])
+        # Written a page at a time, not as one body
+        self.assertGreaterEqual(len(chunks), 5)
+
+    def test_accept_header_selects_ndjson(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="application/x-ndjson")
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b"".join(response.streaming_content).decode().splitlines()), 5)
+
+    def test_streamed_json_matches_regular_response(self):
+        regular = self.client.get(self.url, {"pages": "2-3"}).json()
+
+        response = self.client.get(self.url, {"pages": "2-3", "stream": "json"})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), regular)
+
+    @override_settings(PDF_STREAM_CHUNK_PAGES=2)
+    async def test_asgi_stream_reads_pages_as_it_sends_them(self):
+        response = await self.async_client.get(self.url, {"stream": "ndjson"})
+
+        self.assertTrue(response.is_async)
+        chunks = aiter(response.streaming_content)
+        header = json.loads(await anext(chunks))
+        first = [json.loads(line) for line in (await anext(chunks)).decode().splitlines()]
+        # Rows past the first chunk are only read once it has been sent
+        await PDFPage.objects.filter(document_id=self.pk, page_number=4).adelete()
+        rest = [json.loads(line) for chunk in [chunk async for chunk in chunks] for line in chunk.decode().splitlines()]
+
+        self.assertEqual(header["totalPages"], 4)
+        self.assertEqual([page["page"] for page in first], [1, 2])
+        self.assertEqual([page["page"] for page in rest], [3])
+
+    async def test_asgi_streamed_json_matches_regular_response(self):
+        regular = (await self.async_client.get(self.url)).json()
+
+        response = await self.async_client.get(self.url, {"stream": "json"})
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(json.loads(b"".join([chunk async for chunk in response.streaming_content])), regular)
+
+class DeduplicationTests(PDFAppTestCase):
+    def test_duplicate_upload_shares_file_and_analysis(self):
+        data = make_pdf(3)
+        first = self.upload(data, "first")
+        second = self.upload(data, "second")
+
+        self.assertTrue(second["deduplicated"])
+        self.assertIsNone(second["task_id"])
+        original = PDFDocument.objects.get(pk=first["document_id"])
+        duplicate = PDFDocument.objects.get(pk=second["document_id"])
+        self.assertEqual(duplicate.file.name, original.file.name)
+        self.assertEqual(duplicate.content_hash, hashlib.sha256(data).hexdigest())
+        self.assertEqual(duplicate.analysis_status, "SUCCESS")
+        self.assertEqual(duplicate.pages.count(), 3)
+
+    def test_different_content_is_stored_separately(self):
+        first = self.upload(make_pdf(2, "first {page}"), "first")
+        second = self.upload(make_pdf(2, "second {page}"), "second")
+
+        self.assertNotIn("deduplicated", second)
+        self.assertNotEqual(
+            PDFDocument.objects.get(pk=first["document_id"]).file.name,
+            PDFDocument.objects.get(pk=second["document_id"]).file.name,
+        )
+
+    def test_delete_keeps_file_of_remaining_duplicate(self):
+        data = make_pdf(2)
+        first = self.upload(data, "first")
+        second = self.upload(data, "second")
+        file_name = PDFDocument.objects.get(pk=first["document_id"]).file.name
+
+        response = self.client.delete(f"/pdf-documents/{first['document_id']}/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(default_storage.exists(file_name))
+        self.client.delete(f"/pdf-documents/{second['document_id']}/")
+        self.assertFalse(default_storage.exists(file_name))
+
+    def test_put_new_file_rehashes_and_reanalyzes(self):
+        original = make_pdf(2, "original {page}")
+        replacement = make_pdf(4, "replacement {page}")
+        pk = self.upload(original, "doc")["document_id"]
+        old_name = PDFDocument.objects.get(pk=pk).file.name
+
+        response = self.client.put(
+            f"/pdf-documents/{pk}/",
+            {"title": "doc", "file": SimpleUploadedFile("new.pdf", replacement, "application/pdf")},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+        self.assertEqual(pdf_doc.content_hash, hashlib.sha256(replacement).hexdigest())
+        self.assertEqual(pdf_doc.analysis_status, "SUCCESS")
+        self.assertEqual(pdf_doc.pages.count(), 4)
+        self.assertFalse(default_storage.exists(old_name))
+
+    def test_upload_after_put_is_not_matched_to_replaced_document(self):
+        original = make_pdf(2, "original {page}")
+        pk = self.upload(original, "doc")["document_id"]
+        self.client.put(
+            f"/pdf-documents/{pk}/",
+            {"title": "doc", "file": SimpleUploadedFile("new.pdf", make_pdf(1, "new {page}"), "application/pdf")},
+            format="multipart",
+        )
+
+        again = self.upload(original, "again")
+
+        self.assertNotIn("deduplicated", again)
+        pdf_doc = PDFDocument.objects.get(pk=again["document_id"])
+        with pdf_doc.file.open("rb") as handle:
+            self.assertEqual(handle.read(), original)
+
+
+class CompactEncodingTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.upload(make_pdf(3))["document_id"]
+        self.url = f"/pdf-documents/{self.pk}/extract-text/"
+
+    def test_decode_restores_legacy_page(self):
+        for page in PDFPage.objects.filter(document_id=self.pk):
+            legacy = json.loads(json.dumps(page.as_dict()))
+            self.assertEqual(encoding.decode_page(encoding.encode_page(legacy)), legacy)
+
+    def test_format_query_parameter_selects_compact(self):
+        legacy = self.client.get(self.url).json()
+        compact = self.client.get(self.url, {"format": "compact"}).json()
+
+        self.assertEqual(legacy["format"], "legacy")
+        self.assertEqual(compact["format"], "compact")
+        self.assertEqual(compact["pages"][0]["fonts"], ["Helvetica"])
+        self.assertEqual(
+            [encoding.decode_page(page) for page in compact["pages"]],
+            legacy["pages"],
+        )
+
+    def test_accept_header_selects_compact(self):
+        response = self.client.get(self.url, HTTP_ACCEPT=encoding.COMPACT_MEDIA_TYPE)
+
+        self.assertEqual(json.loads(response.content)["format"], "compact")
+
+    def test_compact_pages_can_be_streamed(self):
+        response = self.client.get(self.url, {"format": "compact", "stream": "ndjson"})
+
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[0]["format"], "compact")
+        self.assertEqual([page_text(encoding.decode_page(line)) for line in lines[1:]], ["Page 1", "Page 2", "Page 3"])
+
+
+class PartialReanalysisTests(PDFAppTestCase):
+    def test_only_edited_pages_are_reanalyzed(self):
+        pk = self.upload(make_pdf(3))["document_id"]
+        version = PDFDocument.objects.get(pk=pk).analysis_version
+        # Blank out two pages so a re-extraction shows up
+        PDFPage.objects.filter(document_id=pk, page_number__in=[1, 2]).update(blocks=[])
+
+        result = self.update_text(pk, {"edits": [{"page": 2, "oldText": "Page 2", "newText": "Edited 2"}]})
+
+        self.assertEqual(result["changed_pages"], [2])
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+        self.assertTrue(pdf_doc.edited_file)
+        self.assertEqual(pdf_doc.analysis_version, version + 1)
+        self.assertEqual(PDFPage.objects.get(document_id=pk, page_number=1).blocks, [])
+        self.assertEqual(page_text(PDFPage.objects.get(document_id=pk, page_number=2).as_dict()), "Edited 2")
+
+    def test_reanalysis_waits_for_a_running_full_analysis(self):
+        pk = self.upload(make_pdf(2))["document_id"]
+        PDFDocument.objects.filter(pk=pk).update(analysis_status="PROCESSING")
+
+        with (
+            mock.patch.object(tasks.reanalyze_pages_task, "retry", side_effect=Retry()) as retry,
+            mock.patch.object(PDFPage.objects, "replace_pages") as replace_pages,
+        ):
+            result = tasks.reanalyze_pages_task.apply((pk, [1]), throw=False)
+
+        self.assertEqual(result.state, "RETRY")
+        retry.assert_called_once_with(countdown=5, max_retries=120)
+        replace_pages.assert_not_called()
+
+    def test_reanalysis_runs_once_the_full_analysis_has_finished(self):
+        pk = self.upload(make_pdf(2))["document_id"]
+        PDFDocument.objects.filter(pk=pk).update(analysis_status="PROCESSING")
+        PDFPage.objects.filter(document_id=pk, page_number=1).update(blocks=[])
+        get = PDFDocument.objects.get
+
+        def finish_analysis(*args, **kwargs):
+            pdf_doc = get(*args, **kwargs)
+            PDFDocument.objects.filter(pk=pk).update(analysis_status="SUCCESS")
+            return pdf_doc
+
+        with mock.patch.object(PDFDocument.objects, "get", side_effect=finish_analysis) as lookup:
+            result = tasks.reanalyze_pages_task.apply((pk, [1]), throw=False)
+
+        self.assertTrue(result.successful())
+        self.assertEqual(lookup.call_count, 2)
+        self.assertEqual(page_text(PDFPage.objects.get(document_id=pk, page_number=1).as_dict()), "Page 1")
+
+    def test_edited_document_is_not_reused_by_duplicates(self):
+        data = make_pdf(2)
+        first = self.upload(data, "first")["document_id"]
+        self.update_text(first, {"newTexts": [{"page": 1, "text": "Added"}]})
+
+        second = self.upload(data, "second")
+
+        self.assertNotIn("deduplicated", second)
+        self.assertIsNotNone(second["task_id"])
+
+
+class BatchEditTests(PDFAppTestCase):
+    def test_edits_on_one_page_share_one_redaction_pass(self):
+        pk = self.upload(make_pdf(2, "Alpha {page} Beta"))["document_id"]
+
+        with mock.patch.object(fitz.Page, "apply_redactions", autospec=True,
+                               side_effect=fitz.Page.apply_redactions) as apply_redactions:
+            result = self.update_text(pk, {"edits": [
+                {"page": 1, "oldText": "Alpha", "newText": "One"},
+                {"page": 1, "oldText": "Beta", "newText": "Two"},
+            ]})
+
+        self.assertEqual(apply_redactions.call_count, 1)
+        self.assertEqual(result["changed_pages"], [1])
+        self.assertEqual(result["redactions"], 2)
+        with fitz.open(PDFDocument.objects.get(pk=pk).current_file_path()) as doc:
+            text = doc[0].get_text()
+            self.assertNotIn("Alpha", text)
+            self.assertIn("One", text)
+            self.assertIn("Two", text)
+            self.assertIn("Alpha 2 Beta", doc[1].get_text())
+
+    def test_new_text_is_added_without_redaction(self):
+        pk = self.upload(make_pdf(1))["document_id"]
+
+        result = self.update_text(pk, {"newTexts": [{"page": 1, "x": 50, "y": 200, "text": "Added", "color": "#ff0000"}]})
+
+        self.assertEqual(result["redactions"], 0)
+        self.assertEqual(result["new_texts_added"], 1)
+        with fitz.open(PDFDocument.objects.get(pk=pk).current_file_path()) as doc:
+            self.assertIn("Added", doc[0].get_text())
+
+    def test_parse_color(self):
+        self.assertEqual(editing.parse_color("#ff0000"), (1.0, 0.0, 0.0))
+        self.assertEqual(editing.parse_color(0x00ff00), (0.0, 1.0, 0.0))
+        self.assertEqual(editing.parse_color((0, 0, 255)), (0.0, 0.0, 1.0))
+        self.assertEqual(editing.parse_color("bogus"), editing.BLACK)
+
+
+class UpdateTextTaskTests(PDFAppTestCase):
+    def test_update_text_returns_task_and_reports_progress(self):
+        pk = self.upload(make_pdf(3))["document_id"]
+        states = []
+        original_update_state = celery_app.Task.update_state
+
+        def record(task, *args, **kwargs):
+            states.append(kwargs.get("meta"))
+            return original_update_state(task, *args, **kwargs)
+
+        with mock.patch.object(celery_app.Task, "update_state", record):
+            result = self.update_text(pk, {"newTexts": [
+                {"page": 1, "text": "One"},
+                {"page": 3, "text": "Three"},
+            ]})
+
+        self.assertEqual(
+            [(state["stage"], state["pages_done"], state["pages_total"]) for state in states],
+            [("editing", 1, 2), ("editing", 2, 2), ("saving", 2, 2)],
+        )
+        self.assertEqual(result["changed_pages"], [1, 3])
+        self.assertEqual(result["edited_file"], PDFDocument.objects.get(pk=pk).edited_file.name)
+        self.assertIsNotNone(result["reanalysis_task_id"])
+
+    def test_request_does_not_open_the_pdf(self):
+        pk = self.upload(make_pdf(1))["document_id"]
+
+        with mock.patch("pdf_app.tasks.update_text_task.delay") as delay:
+            delay.return_value.id = "queued"
+            response = self.client.post(
+                f"/pdf-documents/{pk}/update-text/", {"newTexts": [{"page": 1, "text": "x"}]}, format="json",
+            )
+
+        self.assertEqual(response.data["task_id"], "queued")
+        delay.assert_called_once_with(pk, [], [{"page": 1, "text": "x"}])
+
+    def test_malformed_edits_are_rejected(self):
+        pk = self.upload(make_pdf(2))["document_id"]
+
+        for payload in (
+            {"edits": []},
+            {"edits": {}},
+            {"edits": ["x"]},
+            {"newTexts": [{"page": 3, "text": "Too far"}]},
+            {"newTexts": [{"page": "one", "text": "x"}]},
+            {"edits": [{"page": 1, "bbox": [0, 0, 10], "newText": "x"}]},
+        ):
+            with self.subTest(payload=payload), mock.patch("pdf_app.tasks.update_text_task.delay") as delay:
+                response = self.client.post(f"/pdf-documents/{pk}/update-text/", payload, format="json")
+                self.assertEqual(response.status_code, 400)
+                delay.assert_not_called()
+
+
+class IncrementalSaveTests(PDFAppTestCase):
+    def test_insert_only_edits_are_saved_incrementally(self):
+        pk = self.upload(make_pdf(3))["document_id"]
+        self.update_text(pk, {"newTexts": [{"page": 1, "text": "First"}]})
+        size_before = os.path.getsize(PDFDocument.objects.get(pk=pk).edited_file.path)
+
+        result = self.update_text(pk, {"newTexts": [{"page": 2, "text": "Second"}]})
+
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+        self.assertEqual(result["save"]["mode"], "incremental")
+        self.assertEqual(result["save"]["bytes_written"], os.path.getsize(pdf_doc.edited_file.path) - size_before)
+        self.assertEqual(pdf_doc.edit_version, 2)
+        with fitz.open(pdf_doc.edited_file.path) as doc:
+            self.assertIn("First", doc[0].get_text())
+            self.assertIn("Second", doc[1].get_text())
+
+    def test_replaced_text_does_not_survive_in_the_file(self):
+        pk = self.upload(make_pdf(2, "Secret {page}"))["document_id"]
+        self.update_text(pk, {"newTexts": [{"page": 2, "text": "Added"}]})
+
+        result = self.update_text(pk, {"edits": [{"page": 1, "oldText": "Secret 1", "newText": "Public"}]})
+
+        self.assertEqual(result["save"]["mode"], "full")
+        with fitz.open(PDFDocument.objects.get(pk=pk).edited_file.path) as doc:
+            self.assertIn("Public", doc[0].get_text())
+            streams = b"".join(doc.xref_stream(xref) or b"" for xref in range(1, doc.xref_length()))
+        self.assertNotIn(b"Secret 1".hex().encode(), streams.lower())
+        self.assertIn(b"Secret 2".hex().encode(), streams.lower())
+
+    @override_settings(PDF_INCREMENTAL_SAVES=False)
+    def test_incremental_saves_can_be_turned_off(self):
+        pk = self.upload(make_pdf(1))["document_id"]
+
+        result = self.update_text(pk, {"newTexts": [{"page": 1, "text": "Added"}]})
+
+        self.assertEqual(result["save"]["mode"], "full")
+
+    def test_original_upload_is_never_modified(self):
+        data = make_pdf(1)
+        pk = self.upload(data)["document_id"]
+
+        self.update_text(pk, {"newTexts": [{"page": 1, "text": "Added"}]})
+
+        with open(PDFDocument.objects.get(pk=pk).file.path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_compact_rewrites_the_working_copy(self):
+        pk = self.upload(make_pdf(2))["document_id"]
+        for page in (1, 2, 1):
+            self.update_text(pk, {"newTexts": [{"page": page, "text": f"Added {page}"}]})
+
+        response = self.client.post(f"/pdf-documents/{pk}/compact/")
+
+        result = self.task_status(response.data["task_id"])["result"]
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+        self.assertTrue(result["compacted"])
+        self.assertLess(result["bytes_written"], result["bytes_before"])
+        self.assertEqual(pdf_doc.edit_version, 4)
+        with fitz.open(pdf_doc.edited_file.path) as doc:
+            self.assertIn("Added 1", doc[0].get_text())
+
+    def test_compact_without_edits_does_nothing(self):
+        pk = self.upload(make_pdf(1))["document_id"]
+
+        response = self.client.post(f"/pdf-documents/{pk}/compact/")
+
+        self.assertFalse(self.task_status(response.data["task_id"])["result"]["compacted"])
+
+
+class RenderPageTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.upload(make_pdf(2))["document_id"]
+        self.url = f"/pdf-documents/{self.pk}/pages/1/render/"
+
+    def test_page_is_rendered_and_then_served_from_cache(self):
+        response = self.client.get(self.url, {"dpi": 72})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"\x89PNG"))
+        with mock.patch("pdf_app.tasks.render_page_task.delay") as delay:
+            cached = self.client.get(self.url, {"dpi": 72})
+        delay.assert_not_called()
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached["ETag"], response["ETag"])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_miss_returns_202_while_rendering(self):
+        with mock.patch("pdf_app.tasks.render_page_task.delay") as delay:
+            delay.return_value.id = "queued"
+            delay.return_value.failed.return_value = False
+            response = self.client.get(self.url, {"dpi": 100})
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["task_id"], "queued")
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_tile_is_smaller_than_the_page(self):
+        page = fitz.Pixmap(b"".join(self.client.get(self.url, {"dpi": 144}).streaming_content))
+        tile = fitz.Pixmap(b"".join(self.client.get(self.url, {"dpi": 144, "tile": "0,0"}).streaming_content))
+
+        self.assertEqual((tile.width, tile.height), (512, 512))
+        self.assertGreater(page.height, tile.height)
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({"dpi": 5}, {"dpi": "x"}, {"tile": "a,b"}, {"tile": "-1,0"}, {"type": "gif"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+        self.assertEqual(self.client.get(f"/pdf-documents/{self.pk}/pages/3/render/").status_code, 404)
+
+    def test_tile_rejected_by_the_worker_is_reported_to_retries(self):
+        params = {"dpi": 72, "tile": "5,5"}
+        with (
+            mock.patch.object(doc_cache, "open_document", side_effect=AssertionError("opened in the request")),
+            mock.patch("pdf_app.tasks.render_page_task.delay") as delay,
+        ):
+            delay.return_value.id = "queued"
+            delay.return_value.failed.return_value = False
+            first = self.client.get(self.url, params)
+        # The worker picks up the queued render
+        with self.assertRaises(ValueError):
+            tasks.render_page_task(self.pk, 1, 72, [5, 5], "png")
+
+        with mock.patch("pdf_app.tasks.render_page_task.delay") as delay:
+            retry = self.client.get(self.url, params)
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(retry.status_code, 400)
+        self.assertIn("outside the page", retry.data["errorMSG"])
+        delay.assert_not_called()
+
+    def test_eviction_drops_least_recently_used_entries(self):
+        for dpi in (72, 96, 120):
+            self.client.get(self.url, {"dpi": dpi})
+        pdf_doc = PDFDocument.objects.get(pk=self.pk)
+        oldest = render_cache.entry_path(render_cache.cache_key(pdf_doc, 1, 72, None, "png"), "png")
+        newest = render_cache.entry_path(render_cache.cache_key(pdf_doc, 1, 120, None, "png"), "png")
+        os.utime(oldest, (0, 0))
+
+        render_cache.evict(os.path.getsize(newest) * 2)
+
+        self.assertFalse(os.path.exists(oldest))
+        self.assertTrue(os.path.exists(newest))
+
+
+class ThumbnailTests(PDFAppTestCase):
+    def test_first_pages_get_thumbnails_after_analysis(self):
+        pk = self.upload(make_pdf(5))["document_id"]
+
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+        data = self.client.get(f"/pdf-documents/{pk}/").data
+
+        self.assertEqual(pdf_doc.thumbnail_pages, 3)
+        self.assertEqual(len(data["preview_urls"]), 3)
+        self.assertTrue(data["thumbnail_url"].endswith(f"/page_1.jpeg?v={pdf_doc.edit_version}"))
+        thumbnail = fitz.Pixmap(default_storage.path(pdf_doc.thumbnail_name(1)))
+        self.assertEqual(thumbnail.width, 160)
+
+    @override_settings(PDF_ANALYSIS_CHUNK_SIZE=2)
+    def test_chunked_analysis_also_generates_thumbnails(self):
+        pk = self.upload(make_pdf(5))["document_id"]
+
+        self.assertEqual(PDFDocument.objects.get(pk=pk).thumbnail_pages, 3)
+
+    def test_duplicate_copies_thumbnails_and_delete_removes_them(self):
+        data = make_pdf(2)
+        self.upload(data, "first")
+        pk = self.upload(data, "second")["document_id"]
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+        thumbnail_dir = default_storage.path(pdf_doc.thumbnail_dir())
+
+        self.assertEqual(pdf_doc.thumbnail_pages, 2)
+        self.assertTrue(os.path.isdir(thumbnail_dir))
+        self.client.delete(f"/pdf-documents/{pk}/")
+        self.assertFalse(os.path.exists(thumbnail_dir))
+
+
+class DocumentCacheTests(PDFAppTestCase):
+    def write_pdf(self, name, pages):
+        path = os.path.join(self.media_root, name)
+        with open(path, "wb") as f:
+            f.write(make_pdf(pages))
+        return path
+
+    def test_open_documents_are_reused(self):
+        cache = doc_cache.DocumentCache(2)
+        path = self.write_pdf("reused.pdf", 1)
+
+        with cache.open(path) as first:
+            pass
+        with cache.open(path) as second:
+            self.assertIs(second, first)
+
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        cache.clear()
+
+    def test_changed_file_is_reopened(self):
+        cache = doc_cache.DocumentCache(2)
+        path = self.write_pdf("changed.pdf", 1)
+        with cache.open(path) as doc:
+            self.assertEqual(len(doc), 1)
+
+        self.write_pdf("changed.pdf", 3)
+
+        with cache.open(path) as doc:
+            self.assertEqual(len(doc), 3)
+        self.assertEqual(cache.stats()["misses"], 2)
+        cache.clear()
+
+    def test_least_recently_used_document_is_closed(self):
+        cache = doc_cache.DocumentCache(2)
+        paths = [self.write_pdf(f"lru{number}.pdf", 1) for number in range(3)]
+        with cache.open(paths[0]) as oldest:
+            pass
+        with cache.open(paths[1]):
+            pass
+
+        with cache.open(paths[2]):
+            pass
+
+        self.assertTrue(oldest.is_closed)
+        self.assertEqual(cache.stats()["open_documents"], 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.clear()
+
+    def test_size_zero_disables_caching(self):
+        cache = doc_cache.DocumentCache(0)
+        path = self.write_pdf("uncached.pdf", 1)
+
+        with cache.open(path) as doc:
+            pass
+
+        self.assertTrue(doc.is_closed)
+        self.assertEqual(cache.stats()["open_documents"], 0)
+
+
+def parse_sse(text):
+    """``[(event, data), ...]`` from Server-Sent Events frames, comments skipped."""
+    frames = []
+    for frame in text.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            frames.append((fields["event"], json.loads(fields["data"])))
+    return frames
+
+
+class TaskEventTests(PDFAppTestCase):
+    async def test_finished_task_sends_its_state_and_closes(self):
+        task_id = (await sync_to_async(self.upload)(make_pdf(1)))["task_id"]
+
+        response = await self.async_client.get(f"/pdf-documents/{task_id}/events/")
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        [(event, data)] = parse_sse(body)
+        self.assertEqual(event, "success")
+        self.assertEqual((data["task_id"], data["status"]), (task_id, "SUCCESS"))
+
+    async def test_running_task_streams_every_event_until_it_finishes(self):
+        stream = events.task_event_stream("running-task")
+        frames = [await anext(stream)]
+
+        events.publish("running-task", "PROGRESS", {"pages_done": 1, "pages_total": 2})
+        events.publish("running-task", "SUCCESS", {"done": True})
+        frames += [frame async for frame in stream]
+
+        self.assertEqual(
+            [(event, data.get("progress") or data.get("result")) for event, data in parse_sse("".join(frames))],
+            [("pending", None), ("progress", {"pages_done": 1, "pages_total": 2}), ("success", {"done": True})],
+        )
+        self.assertEqual(events.get_backend()._subscribers, {})
+
+    @override_settings(PDF_EVENTS_HEARTBEAT_SECONDS=0.01, PDF_EVENTS_MAX_SECONDS=0.05)
+    async def test_idle_stream_sends_heartbeats_and_is_capped(self):
+        frames = [frame async for frame in events.task_event_stream("idle-task")]
+
+        self.assertTrue(frames[0].startswith("retry: "))
+        self.assertIn(": keep-alive\n\n", frames[1:])
+
+    @override_settings(PDF_EVENTS_BACKEND="redis")
+    async def test_redis_backend_falls_back_to_memory_without_the_package(self):
+        events._backend = None
+        with mock.patch.object(events, "redis", None), self.assertLogs("pdf_app.events", "WARNING"):
+            stream = events.task_event_stream("fallback-task")
+            frames = [await anext(stream)]
+
+        events.publish("fallback-task", "SUCCESS", {"done": True})
+        frames += [frame async for frame in stream]
+
+        self.assertIsInstance(events.get_backend(), events.InMemoryEventBackend)
+        self.assertEqual([event for event, _ in parse_sse("".join(frames))], ["pending", "success"])
+
+    def test_publish_failure_is_logged_not_raised(self):
+        failing = mock.patch.object(events.InMemoryEventBackend, "publish", side_effect=RuntimeError("down"))
+        with failing, self.assertLogs("pdf_app.events", "WARNING") as logs:
+            events.publish("some-task", "STARTED")
+
+        self.assertIn("down", logs.output[0])
+
+    def test_task_signals_publish_states(self):
+        published = []
+        with mock.patch.object(events, "publish", side_effect=lambda *args: published.append(args[:2])):
+            task_id = self.upload(make_pdf(1))["task_id"]
+
+        self.assertIn((task_id, "STARTED"), published)
+        self.assertIn((task_id, "SUCCESS"), published)
+
+
+class AnalysisLifecycleTests(PDFAppTestCase):
+    def corrupt(self, pk):
+        with open(PDFDocument.objects.get(pk=pk).file.path, "wb") as f:
+            f.write(b"not a pdf")
+
+    @override_settings(PDF_ANALYSIS_PROGRESS_BATCH=2)
+    def test_status_reports_progress_from_the_document(self):
+        published = []
+        with mock.patch.object(events, "publish", side_effect=lambda *args: published.append(args)):
+            pk = self.upload(make_pdf(5))["document_id"]
+
+        response = self.client.get(f"/pdf-documents/{pk}/status/")
+
+        self.assertEqual(response.data["analysis_status"], "SUCCESS")
+        self.assertEqual((response.data["pages_done"], response.data["pages_total"]), (5, 5))
+        progress = [args[2]["pages_done"] for args in published if args[1] == "PROGRESS"]
+        self.assertEqual(progress, [2, 4, 5])
+
+    def test_corrupt_pdf_records_failure(self):
+        pk = self.upload(make_pdf(1))["document_id"]
+        self.corrupt(pk)
+
+        result = tasks.analyze_pdf_task.apply((pk,), throw=False)
+
+        self.assertTrue(result.failed())
+        status = self.client.get(f"/pdf-documents/{pk}/status/").data
+        self.assertEqual(status["analysis_status"], "FAILURE")
+        self.assertTrue(status["error"])
+        extracted = self.client.get(f"/pdf-documents/{pk}/extract-text/").data
+        self.assertEqual(extracted["status"], "FAILURE")
+        self.assertEqual(extracted["error"], status["error"])
+
+    @override_settings(PDF_ANALYSIS_RETRY_BACKOFF=0)
+    def test_transient_errors_are_retried(self):
+        replace_pages = PDFPage.objects.replace_pages
+        calls = []
+
+        def flaky(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return replace_pages(*args, **kwargs)
+
+        pk = self.upload(make_pdf(2))["document_id"]
+
+        # Eager tasks only re-run on retry when exceptions are not propagated
+        with (
+            mock.patch.object(PDFPage.objects, "replace_pages", side_effect=flaky),
+            self.assertLogs("pdf_app.tasks", "WARNING") as logs,
+        ):
+            result = tasks.analyze_pdf_task.apply((pk,), throw=False)
+
+        self.assertTrue(result.successful())
+        self.assertEqual(len(calls), 2)
+        self.assertIn(f"Retrying analysis of document {pk}", logs.output[0])
+        self.assertEqual(PDFDocument.objects.get(pk=pk).analysis_status, "SUCCESS")
+
+    def test_unknown_document_status_is_404(self):
+        self.assertEqual(self.client.get("/pdf-documents/999/status/").status_code, 404)
+
+
+class UploadSessionTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = make_pdf(4)
+        response = self.client.post(
+            "/pdf-documents/uploads/",
+            {"title": "chunked", "filename": "chunked.pdf", "total_size": len(self.data)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.upload_id = response.data["id"]
+
+    def put_chunk(self, start, end):
+        return self.client.put(
+            f"/pdf-documents/uploads/{self.upload_id}/chunk/",
+            self.data[start:end],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end - 1}/{len(self.data)}",
+        )
+
+    def send_all(self, start=0):
+        while start < len(self.data):
+            end = min(start + 256, len(self.data))
+            self.assertEqual(self.put_chunk(start, end).status_code, 200)
+            start = end
+
+    def test_chunk_after_gap_is_rejected(self):
+        self.assertEqual(self.put_chunk(0, 256).status_code, 200)
+
+        response = self.put_chunk(512, 768)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["received_bytes"], 256)
+        status = self.client.get(f"/pdf-documents/uploads/{self.upload_id}/")
+        self.assertEqual(status.data["received_bytes"], 256)
+
+    def test_complete_before_all_bytes_is_rejected(self):
+        self.put_chunk(0, 256)
+
+        response = self.client.post(f"/pdf-documents/uploads/{self.upload_id}/complete/")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(PDFDocument.objects.exists())
+
+    def test_resumed_upload_completes(self):
+        self.put_chunk(0, 256)
+        # Resending an already received range is accepted
+        self.assertEqual(self.put_chunk(128, 384).status_code, 200)
+        self.send_all(384)
+
+        response = self.client.post(f"/pdf-documents/uploads/{self.upload_id}/complete/")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        pdf_doc = PDFDocument.objects.get(pk=response.data["document_id"])
+        self.assertEqual(pdf_doc.content_hash, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(pdf_doc.analysis_status, "SUCCESS")
+        self.assertEqual(pdf_doc.pages.count(), 4)
+        repeated = self.client.post(f"/pdf-documents/uploads/{self.upload_id}/complete/")
+        self.assertEqual(repeated.data["document_id"], pdf_doc.pk)
+
+    @override_settings(PDF_UPLOAD_CHUNK_SIZE=128)
+    def test_oversized_chunk_is_rejected(self):
+        self.assertEqual(self.put_chunk(0, 256).status_code, 413)
+
+    def test_duplicate_upload_reuses_analysis_and_drops_its_copy(self):
+        original = PDFDocument.objects.get(pk=self.upload(self.data)["document_id"])
+        self.send_all()
+        uploaded_copy = UploadSession.objects.get(pk=self.upload_id).file_name
+
+        response = self.client.post(f"/pdf-documents/uploads/{self.upload_id}/complete/")
+
+        self.assertTrue(response.data["deduplicated"])
+        self.assertEqual(PDFDocument.objects.get(pk=response.data["document_id"]).file.name, original.file.name)
+        self.assertFalse(default_storage.exists(uploaded_copy))
+
+    def test_abort_removes_session_and_file(self):
+        self.put_chunk(0, 256)
+        partial_file = UploadSession.objects.get(pk=self.upload_id).file_name
+
+        self.assertEqual(self.client.delete(f"/pdf-documents/uploads/{self.upload_id}/").status_code, 200)
+
+        self.assertEqual(self.client.get(f"/pdf-documents/uploads/{self.upload_id}/").status_code, 404)
+        self.assertFalse(default_storage.exists(partial_file))
+
+
+class DocumentListTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pks = [self.upload(make_pdf(1, f"doc {number} {{page}}"), f"doc{number}")["document_id"] for number in range(5)]
+
+    def walk(self, params):
+        response = self.client.get("/pdf-documents/", params)
+        seen = [row["id"] for row in response.data["data"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen += [row["id"] for row in response.data["data"]]
+        return seen
+
+    def test_list_is_newest_first_and_walks_every_document(self):
+        self.assertEqual(self.walk({"limit": 2}), list(reversed(self.pks)))
+
+    def test_rows_with_equal_timestamps_are_not_skipped(self):
+        PDFDocument.objects.update(uploaded_at=PDFDocument.objects.first().uploaded_at)
+
+        self.assertEqual(self.walk({"limit": 2}), list(reversed(self.pks)))
+
+    def test_filters(self):
+        PDFDocument.objects.filter(pk=self.pks[0]).update(analysis_status="FAILURE")
+
+        self.assertEqual(self.walk({"status": "failure"}), [self.pks[0]])
+        self.assertEqual(self.walk({"title": "DOC3"}), [self.pks[3]])
+
+    def test_last_page_has_no_cursor(self):
+        response = self.client.get("/pdf-documents/", {"limit": 5})
+
+        self.assertIsNone(response.data["next_cursor"])
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_cursor_or_limit_is_rejected(self):
+        for params in ({"cursor": "bogus"}, {"limit": 0}, {"limit": "x"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/pdf-documents/", params).status_code, 400)
+
+
+class SearchTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.upload(make_pdf(3, "apple banana {page}"), "fruit")["document_id"]
+        self.second = self.upload(make_pdf(2, "cherry banana {page}"), "more fruit")["document_id"]
+
+    def search(self, q, pk=None):
+        url = f"/pdf-documents/{pk}/search/" if pk else "/pdf-documents/search/"
+        return self.client.get(url, {"q": q})
+
+    def test_hits_have_document_page_and_bbox(self):
+        results = self.search("cherry").data["results"]
+
+        self.assertEqual(sorted((hit["document_id"], hit["page"]) for hit in results), [(self.second, 1), (self.second, 2)])
+        self.assertEqual(results[0]["title"], "more fruit")
+        self.assertEqual(len(results[0]["bbox"]), 4)
+
+    def test_last_word_matches_as_prefix(self):
+        self.assertEqual(len(self.search("apple ban").data["results"]), 3)
+
+    def test_document_search_is_in_page_order(self):
+        results = self.search("banana", self.first).data["results"]
+
+        self.assertEqual([hit["page"] for hit in results], [1, 2, 3])
+
+    def test_index_follows_reanalysis(self):
+        self.update_text(self.first, {"edits": [{"page": 2, "oldText": "apple", "newText": "grape"}]})
+
+        self.assertEqual([hit["page"] for hit in self.search("apple", self.first).data["results"]], [1, 3])
+        self.assertEqual([hit["page"] for hit in self.search("grape").data["results"]], [2])
+
+    def test_deleted_document_leaves_the_index(self):
+        self.client.delete(f"/pdf-documents/{self.second}/")
+
+        self.assertEqual(self.search("cherry").data["results"], [])
+
+    def test_like_fallback_matches_the_same_lines(self):
+        with mock.patch.object(search, "_has_fts5", return_value=False):
+            results = self.search("banana", self.first).data["results"]
+
+        self.assertEqual([hit["page"] for hit in results], [1, 2, 3])
+
+    def test_invalid_query_and_unknown_document(self):
+        self.assertEqual(self.search("").status_code, 400)
+        self.assertEqual(self.search("!!!").status_code, 400)
+        self.assertEqual(self.search("apple", 999).status_code, 404)
+
+
+class BulkReplaceTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.upload(make_pdf(4, "Hello world {page} hello"))["document_id"]
+
+    def replace(self, payload):
+        return self.client.post(f"/pdf-documents/{self.pk}/replace/", payload, format="json")
+
+    def test_located_rects_match_search_for(self):
+        pdf_doc = PDFDocument.objects.get(pk=self.pk)
+        rows = pdf_doc.pages.order_by("page_number").values_list("page_number", "blocks")
+
+        edits, counts = editing.locate_replacements(rows, [{"oldText": "world", "newText": "there"}])
+
+        self.assertEqual(counts, {page: {"world": 1} for page in range(1, 5)})
+        with fitz.open(pdf_doc.file.path) as doc:
+            expected = doc[0].search_for("world")[0]
+        located = fitz.Rect(edits[0]["bbox"])
+        for actual, wanted in zip(located, expected):
+            self.assertAlmostEqual(actual, wanted, delta=1)
+        self.assertEqual(edits[0]["fontFamily"], "Helvetica")
+
+    def test_matching_is_case_insensitive(self):
+        rows = PDFPage.objects.filter(document_id=self.pk, page_number=1).values_list("page_number", "blocks")
+
+        _edits, counts = editing.locate_replacements(rows, [{"oldText": "HELLO", "newText": "Bye"}])
+
+        self.assertEqual(counts, {1: {"HELLO": 2}})
+
+    def test_replaces_every_match_in_the_page_range(self):
+        response = self.replace({"replacements": [{"oldText": "world", "newText": "there"}], "pageStart": 2, "pageEnd": 3})
+
+        result = self.task_status(response.data["task_id"])["result"]
+        self.assertEqual(result["matches"], 2)
+        self.assertEqual([page["page"] for page in result["pages"]], [2, 3])
+        with fitz.open(PDFDocument.objects.get(pk=self.pk).current_file_path()) as doc:
+            self.assertEqual(["world" in page.get_text() for page in doc], [True, False, False, True])
+            self.assertIn("there", doc[1].get_text())
+        self.assertEqual(page_text(PDFPage.objects.get(document_id=self.pk, page_number=2).as_dict()).count("there"), 1)
+
+    def test_no_match_leaves_the_document_unedited(self):
+        response = self.replace({"replacements": [{"oldText": "absent", "newText": "x"}]})
+
+        self.assertEqual(self.task_status(response.data["task_id"])["result"]["matches"], 0)
+        self.assertFalse(PDFDocument.objects.get(pk=self.pk).edited_file)
+
+    def test_invalid_requests(self):
+        for payload in ({}, {"replacements": []}, {"replacements": [{"newText": "x"}]},
+                        {"replacements": [{"oldText": "a"}], "pageStart": 3, "pageEnd": 2}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.replace(payload).status_code, 400)
+        PDFDocument.objects.filter(pk=self.pk).update(analysis_status="PROCESSING")
+        self.assertEqual(self.replace({"replacements": [{"oldText": "a"}]}).status_code, 409)
+
+
+class PageOperationTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.upload(make_pdf(4, "first {page}"), "first")["document_id"]
+        self.second = self.upload(make_pdf(2, "second {page}"), "second")["document_id"]
+
+    def run_operation(self, url, payload):
+        response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        status = self.task_status(response.data["task_id"])
+        self.assertEqual(status["status"], "SUCCESS", status)
+        return status["result"]
+
+    def texts(self, pk):
+        pdf_doc = PDFDocument.objects.get(pk=pk)
+        stored = [page_text(page.as_dict()) for page in pdf_doc.pages.order_by("page_number")]
+        with fitz.open(pdf_doc.current_file_path()) as doc:
+            self.assertEqual([page.get_text().strip() for page in doc], stored)
+        return stored
+
+    def test_merge_reuses_the_stored_analysis(self):
+        result = self.run_operation("/pdf-documents/merge/", {
+            "documents": [{"id": self.first, "pages": "3-4"}, self.second],
+        })
+
+        [merged] = result["documents"]
+        self.assertEqual(self.texts(merged["document_id"]), ["first 3", "first 4", "second 1", "second 2"])
+        self.assertEqual(merged["pages_reused"], 4)
+        self.assertEqual(merged["insert_calls"], 2)
+        pdf_doc = PDFDocument.objects.get(pk=merged["document_id"])
+        self.assertEqual((pdf_doc.title, pdf_doc.analysis_status), ("first + second", "SUCCESS"))
+
+    def test_split_into_ranges_and_every_n_pages(self):
+        ranges = self.run_operation(f"/pdf-documents/{self.first}/split/", {"ranges": ["1-1", "2-"]})
+        every = self.run_operation(f"/pdf-documents/{self.first}/split/", {"every": 3})
+
+        self.assertEqual([self.texts(part["document_id"]) for part in ranges["documents"]],
+                         [["first 1"], ["first 2", "first 3", "first 4"]])
+        self.assertEqual([part["pages"] for part in every["documents"]], [3, 1])
+        self.assertEqual(self.texts(self.first), ["first 1", "first 2", "first 3", "first 4"])
+
+    def test_extract_keeps_the_requested_order(self):
+        result = self.run_operation(f"/pdf-documents/{self.first}/extract-pages/", {"pages": "4,1-2"})
+
+        self.assertEqual(self.texts(result["documents"][0]["document_id"]), ["first 4", "first 1", "first 2"])
+
+    def test_reorder_in_place_renumbers_pages_and_search(self):
+        result = self.run_operation(f"/pdf-documents/{self.first}/reorder/", {"order": [3, 1]})
+
+        self.assertEqual(result["pages_reused"], 2)
+        self.assertEqual(self.texts(self.first), ["first 3", "first 1"])
+        pdf_doc = PDFDocument.objects.get(pk=self.first)
+        self.assertEqual(pdf_doc.analysis_result["totalPages"], 2)
+        hits = self.client.get(f"/pdf-documents/{self.first}/search/", {"q": "first"}).data["results"]
+        self.assertEqual([hit["text"] for hit in hits], ["first 3", "first 1"])
+
+    def test_invalid_operations(self):
+        self.assertEqual(self.client.post("/pdf-documents/merge/", {"documents": []}, format="json").status_code, 400)
+        self.assertEqual(self.client.post("/pdf-documents/merge/", {"documents": [999]}, format="json").status_code, 404)
+        self.assertEqual(self.client.post(f"/pdf-documents/{self.first}/extract-pages/", {"pages": "5"}, format="json").status_code, 400)
+        PDFDocument.objects.filter(pk=self.first).update(analysis_status="PROCESSING")
+        self.assertEqual(self.client.post(f"/pdf-documents/{self.first}/reorder/", {"order": [1]}, format="json").status_code, 409)
+
+
+class BenchmarkCorpusTests(PDFAppTestCase):
+    def test_corpus_is_deterministic(self):
+        paths = [os.path.join(self.media_root, f"corpus{number}.pdf") for number in range(3)]
+        corpus.build(paths[0], "spans", 2, seed=1)
+        corpus.build(paths[1], "spans", 2, seed=1)
+        corpus.build(paths[2], "spans", 2, seed=2)
+
+        contents = []
+        for path in paths:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        self.assertEqual(contents[0], contents[1])
+        self.assertNotEqual(contents[0], contents[2])
+
+    def test_every_kind_goes_through_the_pipeline(self):
+        for kind in corpus.KINDS:
+            with self.subTest(kind=kind):
+                path = corpus.build(os.path.join(self.media_root, f"{kind}.pdf"), kind, 3)
+                with open(path, "rb") as f:
+                    pk = self.upload(f.read(), kind)["document_id"]
+                self.assertEqual(self.client.get(f"/pdf-documents/{pk}/extract-text/").json()["totalPages"], 3)
+
+    def test_percentiles(self):
+        samples = list(range(1, 101))
+
+        self.assertEqual(suite.percentile(samples, 0.5), 51)
+        self.assertEqual(suite.percentile(samples, 0.99), 99)
+        self.assertEqual(suite.latency_stats([5.0]), {"n": 1, "p50_ms": 5.0, "p99_ms": 5.0})
+
+
+class MetricsTests(PDFAppTestCase):
+    def metric(self, series):
+        """Value of one sample line of /metrics, 0 when absent."""
+        for line in self.client.get("/metrics").content.decode().splitlines():
+            if line.startswith(series + " "):
+                return float(line.rsplit(" ", 1)[1])
+        return 0
+
+    def test_requests_are_timed_by_endpoint_and_document_size(self):
+        pk = self.upload(make_pdf(2))["document_id"]
+        series = 'pdf_http_request_seconds_count{endpoint="extract-text",method="GET",size="<=10",status="2xx"}'
+        before = self.metric(series)
+
+        self.client.get(f"/pdf-documents/{pk}/extract-text/")
+
+        self.assertEqual(self.metric(series), before + 1)
+        self.assertGreater(self.metric('pdf_response_render_seconds_count{endpoint="extract-text",format="json"}'), 0)
+
+    def test_document_size_comes_without_an_extra_query(self):
+        pk = self.upload(make_pdf(12))["document_id"]
+        series = 'pdf_http_request_seconds_count{endpoint="document-status",method="GET",size="<=100",status="2xx"}'
+        before = self.metric(series)
+
+        with self.assertNumQueries(1):
+            self.client.get(f"/pdf-documents/{pk}/status/")
+
+        self.assertEqual(self.metric(series), before + 1)
+
+    def test_requests_leave_flushing_to_a_background_thread(self):
+        backend = mock.Mock()
+        with (
+            mock.patch.object(metrics, "get_backend", return_value=backend),
+            mock.patch.object(metrics, "_flusher", None),
+            mock.patch.object(metrics.threading, "Thread") as thread,
+            mock.patch.object(metrics.atexit, "register"),
+        ):
+            for _ in range(3):
+                self.client.get("/pdf-documents/")
+
+        backend.flush.assert_not_called()
+        thread.assert_called_once_with(target=metrics._flush_periodically, name="metrics-flush", daemon=True)
+
+    def test_worker_side_timings_are_recorded(self):
+        self.upload(make_pdf(2))
+
+        self.assertGreater(self.metric('pdf_fitz_open_seconds_count{caller="document_cache"}'), 0)
+        self.assertGreater(self.metric("pdf_page_get_text_seconds_count"), 0)
+        self.assertGreater(self.metric('pdf_document_cache_total{result="miss"}'), 0)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = metrics.Registry()
+
+        registry.observe("pdf_doc_save_seconds", 0.02, mode="full")
+
+        values = registry.snapshot()
+        self.assertNotIn('pdf_doc_save_seconds_bucket{le="0.01",mode="full"}', values)
+        self.assertEqual(values['pdf_doc_save_seconds_bucket{le="0.025",mode="full"}'], 1)
+        self.assertEqual(values['pdf_doc_save_seconds_bucket{le="+Inf",mode="full"}'], 1)
+        self.assertEqual(values['pdf_doc_save_seconds_count{mode="full"}'], 1)
+
+    @override_settings(PDF_METRICS_BACKEND="redis")
+    def test_redis_backend_falls_back_to_memory_without_the_package(self):
+        metrics._backend = None
+        with mock.patch.object(metrics, "redis", None), self.assertLogs("pdf_app.metrics", "WARNING"):
+            backend = metrics.get_backend()
+
+        self.assertIsInstance(backend, metrics.InMemoryMetricsBackend)
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(PDF_PROFILE_ENABLED=True)
+    def test_profile_header_writes_a_report(self):
+        pk = self.upload(make_pdf(1))["document_id"]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.get(f"/pdf-documents/{pk}/extract-text/", HTTP_X_PDF_PROFILE="1")
+
+        report = os.path.join(self.media_root, "profiles", response["X-PDF-Profile"])
+        self.assertTrue(os.path.exists(report))
+        self.assertTrue(os.path.exists(report[:-len(".txt")] + ".prof"))
+        self.assertNotIn("X-PDF-Profile", self.client.get(f"/pdf-documents/{pk}/extract-text/"))
+
+    @override_settings(PDF_PROFILE_ENABLED=True)
+    async def test_asgi_request_is_profiled_including_the_view(self):
+        pk = (await sync_to_async(self.upload)(make_pdf(1)))["document_id"]
+        url = f"/pdf-documents/{pk}/extract-text/"
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = await self.async_client.get(url, headers={"X-PDF-Profile": "1"})
+            streamed = await self.async_client.get(url, {"stream": "ndjson"}, headers={"X-PDF-Profile": "1"})
+
+        with open(os.path.join(self.media_root, "profiles", response["X-PDF-Profile"])) as report:
+            self.assertIn("extract_text_middleware", report.read())
+        self.assertNotIn("X-PDF-Profile", streamed)
+
+class ConditionalGetTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = make_pdf(3)
+        self.pk = self.upload(self.data)["document_id"]
+
+    def test_detail_revalidates_with_304(self):
+        response = self.client.get(f"/pdf-documents/{self.pk}/")
+        etag = response["ETag"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f"/pdf-documents/{self.pk}/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        weak = self.client.get(f"/pdf-documents/{self.pk}/", HTTP_IF_NONE_MATCH=f"W/{etag}")
+        self.assertEqual(weak.status_code, 304)
+        self.assertEqual(weak["ETag"], etag)
+
+    def test_detail_etag_changes_with_document(self):
+        etag = self.client.get(f"/pdf-documents/{self.pk}/")["ETag"]
+        # Same bytes: only the title changes, the analysis is kept
+        self.client.put(
+            f"/pdf-documents/{self.pk}/",
+            {"title": "renamed", "file": SimpleUploadedFile("doc.pdf", self.data, "application/pdf")},
+            format="multipart",
+        )
+
+        response = self.client.get(f"/pdf-documents/{self.pk}/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["title"], "renamed")
+        self.assertEqual(response.data["analysis_status"], "SUCCESS")
+
+    def test_extract_text_etag_depends_on_query(self):
+        whole = self.client.get(f"/pdf-documents/{self.pk}/extract-text/")
+        page = self.client.get(f"/pdf-documents/{self.pk}/extract-text/?page=2")
+
+        self.assertNotEqual(whole["ETag"], page["ETag"])
+        revalidated = self.client.get(f"/pdf-documents/{self.pk}/extract-text/?page=2", HTTP_IF_NONE_MATCH=page["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+        other = self.client.get(f"/pdf-documents/{self.pk}/extract-text/", HTTP_IF_NONE_MATCH=page["ETag"])
+        self.assertEqual(other.status_code, 200)
+
+    def test_edit_changes_extract_text_etag(self):
+        etag = self.client.get(f"/pdf-documents/{self.pk}/extract-text/")["ETag"]
+
+        self.update_text(self.pk, {"newTexts": [{"page": 1, "text": "Added"}]})
+
+        self.assertEqual(self.client.get(f"/pdf-documents/{self.pk}/extract-text/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(PDF_COMPRESS_MIN_BYTES=200)
+class CompressionTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.upload(make_pdf(5))["document_id"]
+        self.url = f"/pdf-documents/{self.pk}/extract-text/"
+
+    def test_large_json_is_gzipped_with_a_weak_etag(self):
+        plain = self.client.get(self.url)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["ETag"], "W/" + plain["ETag"])
+        # A compressed response's tag still revalidates
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_streamed_pages_are_compressed_as_they_stream(self):
+        response = self.client.get(self.url, {"stream": "ndjson"}, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+
+    def test_refused_or_unlisted_content_is_not_compressed(self):
+        refused = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        image = self.client.get(f"/pdf-documents/{self.pk}/pages/1/render/", HTTP_ACCEPT_ENCODING="gzip")
+        small = self.client.get(f"/pdf-documents/{self.pk}/status/", HTTP_ACCEPT_ENCODING="gzip")
+
+        for response in (refused, image, small):
+            self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_choose_coding(self):
+        with mock.patch.object(compression, "brotli", object()):
+            self.assertEqual(compression.choose_coding("gzip, br"), "br")
+            self.assertEqual(compression.choose_coding("gzip, br;q=0.5"), "gzip")
+        with mock.patch.object(compression, "brotli", None):
+            self.assertEqual(compression.choose_coding("br, *;q=0.1"), "gzip")
+        self.assertIsNone(compression.choose_coding("identity"))
+
+
+class ResponseCacheTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        response_cache._backend = None
+        self.pk = self.upload(make_pdf(3))["document_id"]
+        self.url = f"/pdf-documents/{self.pk}/extract-text/"
+
+    def test_second_request_is_served_without_reading_pages(self):
+        first = self.client.get(self.url)
+
+        with mock.patch.object(PDFPage, "as_dict", side_effect=AssertionError("pages were read")):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertEqual(second["Content-Type"], first["Content-Type"])
+
+    def test_formats_and_windows_are_cached_separately(self):
+        whole = json.loads(self.client.get(self.url).content)
+        compact = json.loads(self.client.get(self.url, {"format": "compact"}).content)
+        window = json.loads(self.client.get(self.url, {"page": 2}).content)
+
+        self.assertEqual((whole["format"], len(whole["pages"])), ("legacy", 3))
+        self.assertEqual(compact["format"], "compact")
+        self.assertEqual([page["page"] for page in window["pages"]], [2])
+
+    def test_edit_invalidates_the_document_entries(self):
+        self.client.get(self.url)
+
+        self.update_text(self.pk, {"edits": [{"page": 1, "oldText": "Page 1", "newText": "Changed"}]})
+
+        self.assertEqual(response_cache.get_backend().invalidate(self.pk), 0)
+        pages = json.loads(self.client.get(self.url).content)["pages"]
+        self.assertEqual(page_text(pages[0]), "Changed")
+
+    def test_lru_is_bounded_by_size(self):
+        cache = response_cache.InMemoryResponseCache(max_bytes=10)
+        cache.put("1:a", "application/json", b"12345")
+        cache.put("1:b", "application/json", b"12345")
+        cache.get("1:a")
+
+        evicted = cache.put("2:c", "application/json", b"12345")
+
+        self.assertEqual(evicted, 1)
+        self.assertIsNone(cache.get("1:b"))
+        self.assertIsNotNone(cache.get("1:a"))
+        self.assertEqual(cache.invalidate(1), 1)
+
+    @override_settings(PDF_RESPONSE_CACHE_MAX_ENTRY_BYTES=10)
+    def test_large_bodies_are_not_stored(self):
+        self.client.get(self.url)
+
+        self.assertEqual(response_cache.get_backend().invalidate(self.pk), 0)
+
+    @override_settings(PDF_RESPONSE_CACHE_BACKEND="redis")
+    def test_redis_backend_falls_back_to_memory_without_the_package(self):
+        response_cache._backend = None
+        with mock.patch.object(response_cache, "redis", None), self.assertLogs("pdf_app.response_cache", "WARNING"):
+            self.client.get(self.url)
+
+        self.assertIsInstance(response_cache._backend, response_cache.InMemoryResponseCache)
+        with mock.patch.object(PDFPage, "as_dict", side_effect=AssertionError("pages were read")):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+class AnnotationSyncTests(PDFAppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pk = self.upload(make_pdf(3))["document_id"]
+
+    def save(self, operations):
+        response = self.client.post(f"/pdf-documents/{self.pk}/save-edits/", {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data["seq"]
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params["since"] = since
+        response = self.client.get(f"/pdf-documents/{self.pk}/annotations/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_delta_since_last_seen_seq(self):
+        seq = self.save([{"op": "put", "page": 1, "id": "a", "annotation": {"text": "one"}}])
+        self.save([
+            {"op": "put", "page": 2, "id": "b", "annotation": {"text": "two"}},
+            {"op": "delete", "page": 1, "id": "a"},
+        ])
+
+        delta = self.sync(seq)
+
+        self.assertFalse(delta["reset"])
+        self.assertEqual([(op["op"], op["id"]) for op in delta["operations"]], [("put", "b"), ("delete", "a")])
+        self.assertEqual(self.sync(delta["seq"])["operations"], [])
+        self.assertEqual(self.sync()["annotations"], {"2": {"b": {"text": "two"}}})
+
+    def test_delta_is_paginated(self):
+        self.save([{"op": "put", "page": 1, "id": str(i), "annotation": {"i": i}} for i in range(5)])
+
+        first = self.sync(0, limit=2)
+        rest = self.sync(first["seq"], limit=10)
+
+        self.assertTrue(first["more"])
+        self.assertEqual(len(first["operations"]), 2)
+        self.assertFalse(rest["more"])
+        self.assertEqual(len(rest["operations"]), 3)
+
+    def test_full_page_save_logs_only_changes(self):
+        page = [{"id": "a", "text": "one"}, {"id": "b", "text": "two"}]
+        url = f"/pdf-documents/{self.pk}/save-edits/"
+        self.client.post(url, {"pageNumber": 1, "annotations": page}, format="json")
+        page[1]["text"] = "changed"
+
+        response = self.client.post(url, {"pageNumber": 1, "annotations": page}, format="json")
+
+        self.assertEqual(response.data["saved"], 1)
+
+    def test_since_before_compaction_gets_full_state(self):
+        seq = self.save([{"op": "put", "page": 1, "id": "a", "annotation": {"v": 1}}])
+        with override_settings(PDF_ANNOTATION_COMPACT_AFTER=2):
+            self.save([{"op": "put", "page": 1, "id": "a", "annotation": {"v": 2}}])
+
+        delta = self.sync(seq - 1)
+
+        self.assertTrue(delta["reset"])
+
+    def test_reorder_moves_annotations_with_pages(self):
+        seq = self.save([
+            {"op": "put", "page": 1, "id": "a", "annotation": {"v": 1}},
+            {"op": "put", "page": 3, "id": "c", "annotation": {"v": 3}},
+        ])
+
+        response = self.client.post(f"/pdf-documents/{self.pk}/reorder/", {"order": [3, 2]}, format="json")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        delta = self.sync(seq)
+        self.assertTrue(delta["reset"])
+        self.assertEqual(delta["annotations"], {"1": {"c": {"v": 3}}})
+
+    def test_put_of_a_new_file_resets_delta_sync(self):
+        seq = self.save([{"op": "put", "page": 1, "id": "a", "annotation": {"v": 1}}])
+
+        response = self.client.put(
+            f"/pdf-documents/{self.pk}/",
+            {"title": "doc", "file": SimpleUploadedFile("new.pdf", make_pdf(2, "new {page}"), "application/pdf")},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        delta = self.sync(seq)
+        self.assertTrue(delta["reset"])
+        self.assertEqual(delta["annotations"], {})
+        self.assertGreater(delta["seq"], seq)
+
+    def test_title_update_keeps_the_annotation_log(self):
+        pdf_doc = PDFDocument.objects.get(pk=self.pk)
+        seq = self.save([{"op": "put", "page": 1, "id": "a", "annotation": {"v": 1}}])
+        serializer = PDFDocumentSerializer(pdf_doc, data={"title": "renamed"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        serializer.save()
+
+        self.assertEqual(PDFDocument.objects.get(pk=self.pk).annotation_seq, seq)
+        self.assertFalse(self.sync(seq - 1)["reset"])
+
+    def test_invalid_requests(self):
+        url = f"/pdf-documents/{self.pk}/save-edits/"
+        self.assertEqual(self.client.post(url, {"operations": [{"op": "move", "page": 1, "id": "a"}]}, format="json").status_code, 400)
+        self.assertEqual(self.client.get(f"/pdf-documents/{self.pk}/annotations/", {"since": "x"}).status_code, 400)
+        with override_settings(PDF_ANNOTATION_MAX_OPERATIONS=1):
+            operations = [{"op": "delete", "page": 1, "id": str(i)} for i in range(2)]
+            self.assertEqual(self.client.post(url, {"operations": operations}, format="json").status_code, 400)
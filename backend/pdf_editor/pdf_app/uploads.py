@@ -0,0 +1,169 @@
+"""
+Resumable chunked uploads.
+
+A client opens an UploadSession, PUTs the file in chunks of at most
+``PDF_UPLOAD_CHUNK_SIZE`` bytes and completes the session. Every chunk is
+streamed from the request in small reads straight into the PDF's final
+storage location, so a web process holds at most one read buffer per
+upload whatever the file size. After a dropped connection the client asks
+for ``received_bytes`` and continues from there.
+
+The SHA-256 used for deduplication is computed while the chunks stream in.
+Hash state cannot outlive the process that holds it, so when the chunks of
+one upload were spread over several processes the completed file is hashed
+from disk instead (still in bounded reads).
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import PDFDocument, UploadSession, pdf_upload_path
+from . import storage
+
+READ_SIZE = 64 * 1024
+MAX_RUNNING_HASHES = 256
+
+
+class UploadConflict(Exception):
+    """The request does not fit the session's state, e.g. a chunk past ``received_bytes``."""
+
+
+class _RunningHash:
+    def __init__(self):
+        self.offset = 0
+        self.sha256 = hashlib.sha256()
+
+    def feed(self, position, data):
+        if self.sha256 is None or position > self.offset:
+            # A chunk this process never saw: fall back to hashing the file on completion
+            self.sha256 = None
+            return
+        end = position + len(data)
+        if end > self.offset:
+            # Re-sent chunks overlap bytes that are already hashed
+            self.sha256.update(data[self.offset - position:])
+            self.offset = end
+
+
+_running_hashes = OrderedDict()
+_running_hashes_lock = threading.Lock()
+
+
+def _running_hash(session_id):
+    with _running_hashes_lock:
+        running = _running_hashes.get(session_id)
+        if running is None:
+            running = _running_hashes[session_id] = _RunningHash()
+            while len(_running_hashes) > MAX_RUNNING_HASHES:
+                _running_hashes.popitem(last=False)
+        _running_hashes.move_to_end(session_id)
+        return running
+
+
+def _pop_running_hash(session_id):
+    with _running_hashes_lock:
+        return _running_hashes.pop(session_id, None)
+
+
+def create_session(title, filename, total_size):
+    """Reserve the final storage name and create the (empty) file the chunks are written into."""
+    file_name = pdf_upload_path(None, filename)
+    path = default_storage.path(file_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return UploadSession.objects.create(title=title, file_name=file_name, total_size=total_size)
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Copy ``length`` bytes from ``stream`` into the session's file at ``offset``.
+    Chunks may overlap what was already received but not leave a gap.
+    Returns the number of bytes written; a client that disconnects mid-chunk
+    keeps whatever arrived.
+    """
+    if offset > session.received_bytes:
+        raise UploadConflict(f"Expected a chunk starting at or before byte {session.received_bytes}")
+    if offset + length > session.total_size:
+        raise ValueError("Chunk extends past the declared upload size")
+    running = _running_hash(session.id)
+    position = offset
+    with open(default_storage.path(session.file_name), "r+b") as handle:
+        handle.seek(offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            handle.write(data)
+            running.feed(position, data)
+            position += len(data)
+            remaining -= len(data)
+    # Only ever move received_bytes forward, concurrent chunks may finish out of order
+    UploadSession.objects.filter(pk=session.pk, received_bytes__lt=position).update(
+        received_bytes=position,
+        updated_at=timezone.now(),
+    )
+    session.refresh_from_db(fields=["received_bytes", "updated_at"])
+    return position - offset
+
+
+def content_hash(session):
+    running = _pop_running_hash(session.id)
+    if running is not None and running.sha256 is not None and running.offset == session.total_size:
+        return running.sha256.hexdigest()
+    with default_storage.open(session.file_name, "rb") as handle:
+        return storage.file_sha256(handle)
+
+
+def complete(session):
+    """
+    Turn a fully received session into a PDFDocument. Returns the document
+    and the duplicate it shares a file with, if any (see storage.find_duplicate).
+    """
+    if not session.is_complete():
+        raise UploadConflict(f"Only {session.received_bytes} of {session.total_size} bytes received")
+    # Claim the session so a repeated complete request cannot create a second document
+    if not UploadSession.objects.filter(pk=session.pk, status='ACTIVE').update(status='COMPLETE'):
+        raise UploadConflict("Upload already completed")
+    try:
+        digest = content_hash(session)
+        duplicate = storage.find_duplicate(digest)
+        file_name = session.file_name
+        pdf_doc = PDFDocument.objects.create(
+            title=session.title,
+            file=duplicate.file.name if duplicate else file_name,
+            content_hash=digest,
+        )
+    except Exception:
+        UploadSession.objects.filter(pk=session.pk).update(status='ACTIVE')
+        raise
+    if duplicate:
+        # Same bytes already stored: the document uses that file, drop the uploaded copy
+        default_storage.delete(file_name)
+    session.status = 'COMPLETE'
+    session.document = pdf_doc
+    session.save(update_fields=["status", "document", "updated_at"])
+    return pdf_doc, duplicate
+
+
+def abort(session):
+    _pop_running_hash(session.id)
+    if session.status == 'ACTIVE':
+        default_storage.delete(session.file_name)
+    session.delete()
+
+
+def expire_sessions(max_age_seconds):
+    """Delete unfinished sessions (and their partial files) idle for longer than ``max_age_seconds``."""
+    cutoff = timezone.now() - timedelta(seconds=max_age_seconds)
+    expired = 0
+    for session in UploadSession.objects.filter(status='ACTIVE', updated_at__lt=cutoff).iterator():
+        abort(session)
+        expired += 1
+    return expired
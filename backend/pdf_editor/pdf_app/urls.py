@@ -2,10 +2,27 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path("metrics", views.metrics, name="metrics"),
     path("pdf-documents/", views.pdf_document_list, name="pdf-document-list"),
-    path("pdf-documents/<int:pk>/", views.pdf_document_list, name="pdf-document-detail"),
+    path("pdf-documents/merge/", views.merge_documents, name="merge-documents"),
+    path("pdf-documents/search/", views.search, name="search"),
+    path("pdf-documents/uploads/", views.upload_session_list, name="upload-session-list"),
+    path("pdf-documents/uploads/<uuid:upload_id>/", views.upload_session_detail, name="upload-session-detail"),
+    path("pdf-documents/uploads/<uuid:upload_id>/chunk/", views.upload_chunk, name="upload-chunk"),
+    path("pdf-documents/uploads/<uuid:upload_id>/complete/", views.upload_complete, name="upload-complete"),
+    path("pdf-documents/<int:pk>/", views.pdf_document_detail, name="pdf-document-detail"),
+    path("pdf-documents/<int:pk>/status/", views.document_status, name="document-status"),
+    path("pdf-documents/<int:pk>/search/", views.document_search, name="document-search"),
     path("pdf-documents/<int:pk>/extract-text/", views.extract_text, name="extract-text"),
     path("pdf-documents/<int:pk>/save-edits/", views.save_edits, name="save-edits"),
+    path("pdf-documents/<int:pk>/annotations/", views.annotations, name="annotations"),
     path("pdf-documents/<int:pk>/update-text/", views.update_text, name="update-text"),
+    path("pdf-documents/<int:pk>/replace/", views.bulk_replace, name="bulk-replace"),
+    path("pdf-documents/<int:pk>/split/", views.split_document, name="split-document"),
+    path("pdf-documents/<int:pk>/extract-pages/", views.extract_pages, name="extract-pages"),
+    path("pdf-documents/<int:pk>/reorder/", views.reorder_pages, name="reorder-pages"),
+    path("pdf-documents/<int:pk>/compact/", views.compact, name="compact"),
+    path("pdf-documents/<int:pk>/pages/<int:page_number>/render/", views.render_page, name="render-page"),
     path("pdf-documents/<str:task_id>/get_task_status/", views.get_task_status, name="get_task_status"),
+    path("pdf-documents/<str:task_id>/events/", views.task_events, name="task-events"),
 ]
@@ -297,9 +297,12 @@
 #         )
 
 
-from rest_framework.decorators import api_view, permission_classes
+from django.views.decorators.http import require_GET
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import AllowAny
+from rest_framework.settings import api_settings
 from . import middleware
+from .renderers import NDJSONRenderer, CompactJSONRenderer
 
 @api_view(["GET", "POST"])
 @permission_classes([AllowAny])
@@ -319,6 +322,7 @@ def pdf_document_detail(request, pk):
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer, CompactJSONRenderer])
 def extract_text(request, pk):
     return middleware.extract_text_middleware(request, pk)
 
@@ -330,4 +334,89 @@ def save_edits(request, pk):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def update_text(request, pk):
-    return middleware.update_text_middleware(request, pk)
\ No newline at end of file
+    return middleware.update_text_middleware(request, pk)
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def annotations(request, pk):
+    return middleware.annotations_middleware(request, pk)
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def bulk_replace(request, pk):
+    return middleware.bulk_replace_middleware(request, pk)
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def merge_documents(request):
+    return middleware.merge_documents_middleware(request)
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def split_document(request, pk):
+    return middleware.split_document_middleware(request, pk)
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def extract_pages(request, pk):
+    return middleware.extract_pages_middleware(request, pk)
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def reorder_pages(request, pk):
+    return middleware.reorder_pages_middleware(request, pk)
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def compact(request, pk):
+    return middleware.compact_middleware(request, pk)
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def render_page(request, pk, page_number):
+    return middleware.render_page_middleware(request, pk, page_number)
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def document_status(request, pk):
+    return middleware.document_status_middleware(request, pk)
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def search(request):
+    return middleware.search_middleware(request)
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def document_search(request, pk):
+    return middleware.document_search_middleware(request, pk)
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def upload_session_list(request):
+    return middleware.upload_session_list_middleware(request)
+
+@api_view(["GET", "DELETE"])
+@permission_classes([AllowAny])
+def upload_session_detail(request, upload_id):
+    return middleware.upload_session_detail_middleware(request, upload_id)
+
+@api_view(["PUT"])
+@permission_classes([AllowAny])
+def upload_chunk(request, upload_id):
+    return middleware.upload_chunk_middleware(request, upload_id)
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def upload_complete(request, upload_id):
+    return middleware.upload_complete_middleware(request, upload_id)
+
+@require_GET
+async def task_events(request, task_id):
+    # Plain async Django view: DRF views are synchronous and would hold a thread per open stream
+    return middleware.task_events_middleware(request, task_id)
+
+@require_GET
+def metrics(request):
+    # Plain Django view: Prometheus wants text/plain, not DRF content negotiation
+    return middleware.metrics_middleware(request)
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,6 +54,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "pdf_app.metrics.MetricsMiddleware",
+    "pdf_app.profiling.ProfilingMiddleware",
+    "pdf_app.compression.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -143,6 +148,13 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 10,
 }
 
+# Upload handlers: hash uploads while they stream in so duplicates can be detected
+FILE_UPLOAD_HANDLERS = [
+    "pdf_app.storage.HashingUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
 # Media files configuration
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
@@ -150,3 +162,117 @@ MEDIA_ROOT = BASE_DIR / "media"
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 CORS_ALLOW_CREDENTIALS = True
+
+# PDF analysis settings
+# Documents with more pages than PDF_ANALYSIS_CHUNK_SIZE are split into page
+# ranges that are extracted by separate Celery tasks and merged in page order.
+PDF_ANALYSIS_PARALLEL = True
+PDF_ANALYSIS_CHUNK_SIZE = 50
+# pages_done is written once per this many pages on the single-task path
+PDF_ANALYSIS_PROGRESS_BATCH = 10
+# Transient errors (database/file store unavailable) are retried with
+# exponential backoff: RETRY_BACKOFF * 2**attempt seconds, capped at RETRY_BACKOFF_MAX
+PDF_ANALYSIS_MAX_RETRIES = 3
+PDF_ANALYSIS_RETRY_BACKOFF = 2
+PDF_ANALYSIS_RETRY_BACKOFF_MAX = 60
+# Re-analysis of edited pages waits for a running full analysis of the
+# document, checking every DEFER_SECONDS, at most MAX_DEFERS times
+PDF_REANALYSIS_DEFER_SECONDS = 5
+PDF_REANALYSIS_MAX_DEFERS = 120
+
+# Default and maximum number of documents per document list page (?limit=)
+PDF_LIST_PAGE_LIMIT = 50
+PDF_LIST_MAX_PAGE_LIMIT = 200
+
+# Default and maximum number of pages per extract-text cursor page (?limit=)
+PDF_EXTRACT_PAGE_LIMIT = 10
+PDF_EXTRACT_MAX_PAGE_LIMIT = 100
+
+# Number of PDFPage rows fetched per database round trip when streaming extract-text
+PDF_STREAM_CHUNK_PAGES = 20
+
+# Append edits to the working copy with PyMuPDF incremental saves instead of
+# rewriting the whole file; POST /pdf-documents/<pk>/compact/ rewrites it on demand.
+# Edits that replace text are always rewritten in full so the old text is dropped.
+PDF_INCREMENTAL_SAVES = True
+
+# Server-side page rendering (GET /pdf-documents/<pk>/pages/<n>/render/)
+PDF_RENDER_DEFAULT_DPI = 96
+PDF_RENDER_MAX_DPI = 300
+PDF_RENDER_TILE_SIZE = 512  # pixels per tile edge
+PDF_RENDER_CACHE_DIR = MEDIA_ROOT / "render_cache"
+PDF_RENDER_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+PDF_RENDER_CACHE_EVICT_INTERVAL = 60  # seconds between LRU sweeps per process
+
+# Thumbnails of the first pages, rendered after analysis for document lists
+PDF_THUMBNAIL_PAGES = 3
+PDF_THUMBNAIL_WIDTH = 160  # pixels
+
+# Open PyMuPDF documents kept per worker process for read-only work (pdf_app/doc_cache.py)
+PDF_DOCUMENT_CACHE_SIZE = 8
+
+# Task state events for GET /pdf-documents/<task_id>/events/ (pdf_app/events.py).
+# "redis" shares events between worker and ASGI processes; "memory" is in-process only.
+PDF_EVENTS_BACKEND = "redis"
+PDF_EVENTS_REDIS_URL = CELERY_BROKER_URL
+PDF_EVENTS_HEARTBEAT_SECONDS = 15
+PDF_EVENTS_MAX_SECONDS = 300  # clients reconnect after this
+PDF_EVENTS_RETRY_MS = 2000
+
+# Resumable chunked uploads (POST /pdf-documents/uploads/, see pdf_app/uploads.py)
+PDF_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # largest chunk accepted per PUT
+PDF_UPLOAD_MAX_BYTES = 2 * 1024 * 1024 * 1024
+PDF_UPLOAD_SESSION_TTL = 24 * 60 * 60  # seconds an unfinished upload may sit idle
+
+# Full-text search over extracted lines (pdf_app/search.py): SQLite FTS5 or a
+# Postgres tsvector index, kept up to date whenever pages are (re-)analyzed
+PDF_SEARCH_INDEX = True
+PDF_SEARCH_RESULT_LIMIT = 50
+PDF_SEARCH_MAX_RESULT_LIMIT = 200
+
+# Merge / split / extract / reorder jobs (pdf_app/page_ops.py)
+PDF_PAGE_OPS_MAX_PAGES = 10000  # pages in one merged, extracted or reordered document
+PDF_PAGE_OPS_MAX_OUTPUTS = 1000  # documents created by one split
+
+# Hot-path timings and counters at GET /metrics (pdf_app/metrics.py). With the
+# redis backend worker processes flush into one shared hash, so Celery-side
+# timings show up too; "memory" only reports the process answering /metrics
+# (and is what "redis" falls back to without the redis package).
+PDF_METRICS_ENABLED = True
+PDF_METRICS_BACKEND = "redis"
+PDF_METRICS_REDIS_URL = CELERY_BROKER_URL
+PDF_METRICS_FLUSH_SECONDS = 5  # web processes; Celery workers flush after every task
+
+# cProfile a single request sent with this header (pdf_app/profiling.py).
+# Reports go outside the source tree unless PDF_PROFILE_DIR says otherwise.
+PDF_PROFILE_ENABLED = DEBUG
+PDF_PROFILE_HEADER = "X-PDF-Profile"
+PDF_PROFILE_DIR = os.environ.get("PDF_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "pdf_editor_profiles"))
+PDF_PROFILE_TOP = 40
+
+# Response compression (pdf_app/compression.py); brotli is used when the
+# brotli package is installed and the client prefers it, gzip otherwise
+PDF_COMPRESS_ENABLED = True
+PDF_COMPRESS_MIN_BYTES = 1024
+PDF_COMPRESS_CONTENT_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/vnd.pdfeditor.compact+json",
+    "text/plain",
+)
+PDF_BROTLI_QUALITY = 5  # 0-11; higher is smaller but slower per response
+
+# Encoded extract-text responses (pdf_app/response_cache.py), shared by the
+# web processes with the redis backend; "memory" is a per-process LRU (and is
+# what "redis" falls back to without the redis package)
+PDF_RESPONSE_CACHE_ENABLED = True
+PDF_RESPONSE_CACHE_BACKEND = "redis"
+PDF_RESPONSE_CACHE_REDIS_URL = CELERY_BROKER_URL
+PDF_RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PDF_RESPONSE_CACHE_MAX_ENTRY_BYTES = 16 * 1024 * 1024  # larger bodies are rendered every time
+
+# Annotation operation log behind save-edits (pdf_app/annotations.py)
+PDF_ANNOTATION_COMPACT_AFTER = 500  # logged operations that trigger a compaction
+PDF_ANNOTATION_MAX_OPERATIONS = 5000  # per save-edits request
+PDF_ANNOTATION_DELTA_LIMIT = 1000  # operations per ?since= response
+PDF_ANNOTATION_MAX_DELTA_LIMIT = 10000
@@ -4,12 +4,14 @@ import PDFUpload from "./components/PDFUpload";
 import PDFList from "./components/PDFList";
 import CanvasPDFEditor from "./components/CanvasPDFEditor";
 import "./App.css";
+import { chunkedUpload, CHUNKED_UPLOAD_THRESHOLD } from "./chunkedUpload";
 import { ToastContainer, toast } from "react-toastify";
 
 function App() {
   const [pdfs, setPdfs] = useState([]);
   const [selectedPDF, setSelectedPDF] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [nextPage, setNextPage] = useState(null);
 
   const API_BASE_URL = process.env.REACT_APP_API_URL;
 
@@ -22,6 +24,22 @@ function App() {
       setLoading(true);
       const response = await axios.get(`${API_BASE_URL}/pdf-documents/`);
       setPdfs(response.data.data || response.data);
+      setNextPage(response.data.next || null);
+    } catch (error) {
+      console.error("Error fetching PDFs:", error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // The list is keyset paginated: follow the server's next link
+  const fetchMorePDFs = async () => {
+    if (!nextPage) return;
+    try {
+      setLoading(true);
+      const response = await axios.get(nextPage);
+      setPdfs((current) => [...current, ...response.data.data]);
+      setNextPage(response.data.next || null);
     } catch (error) {
       console.error("Error fetching PDFs:", error);
     } finally {
@@ -33,24 +51,37 @@ function App() {
     try {
       console.log("inside handlePDFUpload");
       setLoading(true);
-      const formData = new FormData();
-      console.log("form data is: ", formData);
-      formData.append("file", file);
-      formData.append("title", file.name);
+      let response;
+      if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        response = { data: await chunkedUpload(API_BASE_URL, file) };
+      } else {
+        const formData = new FormData();
+        formData.append("file", file);
+        formData.append("title", file.name);
 
-      const response = await axios.post(
-        `${API_BASE_URL}/pdf-documents/`,
-        formData,
-        {
-          headers: {
-            "Content-Type": "multipart/form-data",
-          },
-        }
-      );
+        response = await axios.post(
+          `${API_BASE_URL}/pdf-documents/`,
+          formData,
+          {
+            headers: {
+              "Content-Type": "multipart/form-data",
+            },
+          }
+        );
+      }
       console.log("response is: ", response);
       const { document_id, task_id } = response.data;
       const pdfData = response.data.data || response.data;
-      pollTaskStatus(task_id, document_id);
+      if (task_id) {
+        watchTaskStatus(task_id, document_id);
+      } else {
+        // Duplicate upload: the existing analysis was reused, nothing to wait for
+        const pdfResponse = await axios.get(
+          `${API_BASE_URL}/pdf-documents/${document_id}/`
+        );
+        setPdfs([pdfResponse.data, ...pdfs]);
+        setSelectedPDF(pdfResponse.data);
+      }
     } catch (error) {
       console.error("Error uploading PDF:", error);
       toast.error("Error uploading PDF. Please try again.");
@@ -72,27 +103,69 @@ function App() {
     }
   };
 
+  const handleTaskStatus = async (data, documentId) => {
+    const { status } = data;
+    if (status === "SUCCESS") {
+      const pdfResponse = await axios.get(
+        `${API_BASE_URL}/pdf-documents/${documentId}/`
+      );
+      const pdfData = pdfResponse.data;
+      setPdfs((current) => [pdfData, ...current]);
+      setSelectedPDF(pdfData);
+    } else if (status === "FAILURE") {
+      console.error("Task Failed", data);
+      toast.error("PDF processing failed");
+    }
+  };
+
+  // Task state is pushed over Server-Sent Events; browsers without
+  // EventSource (or a stream that cannot connect) fall back to polling.
+  const watchTaskStatus = (taskId, documentId) => {
+    if (!window.EventSource) {
+      pollTaskStatus(taskId, documentId);
+      return;
+    }
+    const source = new EventSource(
+      `${API_BASE_URL}/pdf-documents/${taskId}/events/`
+    );
+    let received = false;
+    const onEvent = (event) => {
+      received = true;
+      const data = JSON.parse(event.data);
+      if (data.status === "SUCCESS" || data.status === "FAILURE") {
+        source.close();
+        handleTaskStatus(data, documentId);
+      }
+    };
+    ["success", "failure"].forEach((name) =>
+      source.addEventListener(name, onEvent)
+    );
+    ["pending", "started", "progress"].forEach((name) =>
+      source.addEventListener(name, () => {
+        received = true;
+      })
+    );
+    source.onerror = () => {
+      if (!received) {
+        source.close();
+        pollTaskStatus(taskId, documentId);
+      }
+      // Otherwise EventSource reconnects by itself
+    };
+  };
+
+  // Fallback: poll the document's own status, which is served from the
+  // database rather than the Celery result backend
   const pollTaskStatus = async (taskId, documentId) => {
     const pollInterval = setInterval(async () => {
       try {
         const response = await axios.get(
-          `${API_BASE_URL}/pdf-documents/${taskId}/get_task_status/`
+          `${API_BASE_URL}/pdf-documents/${documentId}/status/`
         );
-        const { status } = response.data;
-        if (status === "SUCCESS") {
-          clearInterval(pollInterval);
-          console.log("before calling document id");
-          const pdfResponse = await axios.get(
-            `${API_BASE_URL}/pdf-documents/${documentId}/`
-          );
-          const pdfData = pdfResponse.data;
-          console.log("response of pdf data is: ", pdfData);
-          setPdfs([pdfData, ...pdfs]);
-          setSelectedPDF(pdfData);
-        } else if (status === "FAILURE") {
+        const status = response.data.analysis_status;
+        if (status === "SUCCESS" || status === "FAILURE") {
           clearInterval(pollInterval);
-          console.error("Task Failed", response.data);
-          toast.error("PDF processing failed");
+          handleTaskStatus({ ...response.data, status }, documentId);
         }
       } catch (error) {
         console.error("Error polling task");
@@ -120,6 +193,7 @@ function App() {
               selectedPDF={selectedPDF}
               onSelectPDF={setSelectedPDF}
               onDeletePDF={handlePDFDelete}
+              onLoadMore={nextPage ? fetchMorePDFs : null}
               loading={loading}
             />
           </div>
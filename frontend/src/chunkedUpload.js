@@ -0,0 +1,50 @@
+import axios from "axios";
+
+// Files above this size go through the resumable chunked upload API
+export const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+
+const MAX_RETRIES = 5;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Upload `file` in chunks, resuming from the server's received_bytes after
+// a failed request. Resolves with the same body as a single-request upload
+// ({ document_id, task_id, ... }).
+export const chunkedUpload = async (apiBaseUrl, file, onProgress) => {
+  const { data: session } = await axios.post(
+    `${apiBaseUrl}/pdf-documents/uploads/`,
+    { title: file.name, filename: file.name, total_size: file.size }
+  );
+  const sessionUrl = `${apiBaseUrl}/pdf-documents/uploads/${session.id}/`;
+  let offset = session.received_bytes;
+  let retries = 0;
+
+  while (offset < file.size) {
+    const end = Math.min(offset + session.chunk_size, file.size);
+    try {
+      const { data } = await axios.put(
+        `${sessionUrl}chunk/`,
+        file.slice(offset, end),
+        {
+          headers: {
+            "Content-Type": "application/octet-stream",
+            "Content-Range": `bytes ${offset}-${end - 1}/${file.size}`,
+          },
+        }
+      );
+      offset = data.received_bytes;
+      retries = 0;
+      if (onProgress) onProgress(offset / file.size);
+    } catch (error) {
+      if (retries >= MAX_RETRIES) throw error;
+      retries += 1;
+      await sleep(1000 * 2 ** retries);
+      // Ask the server how much arrived before resuming
+      const { data } = await axios.get(sessionUrl);
+      offset = data.received_bytes;
+    }
+  }
+
+  const { data } = await axios.post(`${sessionUrl}complete/`);
+  return data;
+};
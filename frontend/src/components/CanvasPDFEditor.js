@@ -2,6 +2,7 @@ import React, { useEffect, useRef, useState } from "react";
 import { fabric } from "fabric";
 import axios from "axios";
 import "./CanvasPDFEditor.css";
+import { waitForEdit } from "../taskStatus";
 
 const API_BASE_URL = process.env.REACT_APP_API_URL;
 
@@ -76,9 +77,10 @@ export default function CanvasPDFEditor({ pdf, onSave }) {
       const pdfUrl = `${API_BASE_URL}${pdf.file_url}`;
       const pdfImage = await loadPDFAsImage(pdfUrl, pageNumber);
 
-      // Load text data
+      // Load text data for the visible page only
       const response = await axios.get(
-        `${API_BASE_URL}/pdf-documents/${pdf.id}/extract-text/`
+        `${API_BASE_URL}/pdf-documents/${pdf.id}/extract-text/`,
+        { params: { page: pageNumber } }
       );
       const pageData = response.data.pages.find((p) => p.page === pageNumber);
 
@@ -335,10 +337,11 @@ export default function CanvasPDFEditor({ pdf, onSave }) {
       });
 
       const payload = { edits, newTexts };
-      await axios.post(
+      const { data } = await axios.post(
         `${API_BASE_URL}/pdf-documents/${pdf.id}/update-text/`,
         payload
       );
+      await waitForEdit(API_BASE_URL, data.task_id);
 
       alert("Changes saved successfully!");
       if (onSave) onSave();
@@ -3,6 +3,7 @@ import React, { useEffect, useRef, useState } from "react";
 import { Document, Page, pdfjs } from "react-pdf";
 import axios from "axios";
 import "./PDFEditor.css";
+import { waitForEdit } from "../taskStatus";
 
 pdfjs.GlobalWorkerOptions.workerSrc = `//cdnjs.cloudflare.com/ajax/libs/pdf.js/${pdfjs.version}/pdf.worker.min.js`;
 const API_BASE_URL = process.env.REACT_APP_API_URL;
@@ -203,9 +204,10 @@ export default function PDFEditor({ pdf, onSave }) {
         });
       });
 
-      await axios.post(`${API_BASE_URL}/pdf-documents/${pdf.id}/update-text/`, {
+      const { data } = await axios.post(`${API_BASE_URL}/pdf-documents/${pdf.id}/update-text/`, {
         edits,
       });
+      await waitForEdit(API_BASE_URL, data.task_id);
       alert("Saved");
       if (onSave) onSave();
     } catch (err) {
@@ -1,7 +1,14 @@
 import React from "react";
 import "./PDFList.css";
 
-const PDFList = ({ pdfs, selectedPDF, onSelectPDF, onDeletePDF, loading }) => {
+const PDFList = ({
+  pdfs,
+  selectedPDF,
+  onSelectPDF,
+  onDeletePDF,
+  onLoadMore,
+  loading,
+}) => {
   const formatDate = (dateString) => {
     return new Date(dateString).toLocaleDateString();
   };
@@ -40,7 +47,16 @@ const PDFList = ({ pdfs, selectedPDF, onSelectPDF, onDeletePDF, loading }) => {
               onClick={() => onSelectPDF(pdf)}
             >
               <div className="pdf-info">
-                <div className="pdf-icon">📄</div>
+                {pdf.thumbnail_url ? (
+                  <img
+                    className="pdf-thumbnail"
+                    src={pdf.thumbnail_url}
+                    alt=""
+                    loading="lazy"
+                  />
+                ) : (
+                  <div className="pdf-icon">📄</div>
+                )}
                 <div className="pdf-details">
                   <h4>{pdf.title}</h4>
                   <p>Uploaded: {formatDate(pdf.uploaded_at)}</p>
@@ -55,6 +71,15 @@ const PDFList = ({ pdfs, selectedPDF, onSelectPDF, onDeletePDF, loading }) => {
               </button>
             </div>
           ))}
+          {onLoadMore && (
+            <button
+              className="btn load-more-btn"
+              onClick={onLoadMore}
+              disabled={loading}
+            >
+              {loading ? "Loading..." : "Load more"}
+            </button>
+          )}
         </div>
       )}
     </div>
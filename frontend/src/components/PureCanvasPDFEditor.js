@@ -1,6 +1,7 @@
 import React, { useEffect, useRef, useState } from "react";
 import axios from "axios";
 import "./PureCanvasPDFEditor.css";
+import { waitForEdit } from "../taskStatus";
 
 const API_BASE_URL = process.env.REACT_APP_API_URL;
 
@@ -288,10 +289,11 @@ export default function PureCanvasPDFEditor({ pdf, onSave }) {
       });
 
       const payload = { edits, newTexts: [] };
-      await axios.post(
+      const { data } = await axios.post(
         `${API_BASE_URL}/pdf-documents/${pdf.id}/update-text/`,
         payload
       );
+      await waitForEdit(API_BASE_URL, data.task_id);
 
       alert("Changes saved successfully!");
       if (onSave) onSave();
@@ -0,0 +1,71 @@
+import axios from "axios";
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const FINISHED = ["SUCCESS", "FAILURE", "REVOKED"];
+
+// Fallback: poll get_task_status, backing off from 1 s to 5 s between requests
+const pollTask = async (apiBaseUrl, taskId, deadline) => {
+  let interval = 1000;
+  while (Date.now() < deadline) {
+    const { data } = await axios.get(`${apiBaseUrl}/pdf-documents/${taskId}/get_task_status/`);
+    if (FINISHED.includes(data.status)) return data;
+    await sleep(interval);
+    interval = Math.min(interval * 2, 5000);
+  }
+  throw new Error(`Task ${taskId} did not finish in time`);
+};
+
+// Task state is pushed over Server-Sent Events, like App.js watchTaskStatus;
+// browsers without EventSource (or a stream that cannot connect) fall back
+// to polling. Resolves with the final get_task_status payload.
+const watchTask = (apiBaseUrl, taskId, deadline) =>
+  new Promise((resolve, reject) => {
+    if (!window.EventSource) {
+      pollTask(apiBaseUrl, taskId, deadline).then(resolve, reject);
+      return;
+    }
+    const source = new EventSource(`${apiBaseUrl}/pdf-documents/${taskId}/events/`);
+    let received = false;
+    const timer = setTimeout(() => {
+      source.close();
+      reject(new Error(`Task ${taskId} did not finish in time`));
+    }, deadline - Date.now());
+    const finish = (event) => {
+      clearTimeout(timer);
+      source.close();
+      resolve(JSON.parse(event.data));
+    };
+    FINISHED.forEach((status) => source.addEventListener(status.toLowerCase(), finish));
+    ["pending", "started", "progress"].forEach((name) =>
+      source.addEventListener(name, () => {
+        received = true;
+      })
+    );
+    source.onerror = () => {
+      if (!received) {
+        clearTimeout(timer);
+        source.close();
+        pollTask(apiBaseUrl, taskId, deadline).then(resolve, reject);
+      }
+      // Otherwise EventSource reconnects by itself
+    };
+  });
+
+// Wait for a Celery task to finish. Resolves with the task result, rejects
+// if the task fails or does not finish in time.
+export const waitForTask = async (apiBaseUrl, taskId, { timeout = 300000 } = {}) => {
+  const data = await watchTask(apiBaseUrl, taskId, Date.now() + timeout);
+  if (data.status === "SUCCESS") return data.result;
+  throw new Error(data.error || `Task ${taskId} failed`);
+};
+
+// update-text only queues the edit; wait for it and for the re-analysis of
+// the changed pages it starts, so reloading shows the edited text.
+export const waitForEdit = async (apiBaseUrl, taskId) => {
+  const result = await waitForTask(apiBaseUrl, taskId);
+  if (result && result.reanalysis_task_id) {
+    await waitForTask(apiBaseUrl, result.reanalysis_task_id);
+  }
+  return result;
+};